@@ -5,6 +5,7 @@ from app.database import get_db
 from app.api.deps import get_current_user
 from app.models.activation_code import ActivationCode, ActivationCodeStatus
 from app.models.user import User
+from app.services.user_cache import invalidate_user
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 
@@ -58,6 +59,7 @@ async def redeem_code(
             current_user.vip_expire_at = now + timedelta(days=days)
             
         await db.commit()
+        await invalidate_user(current_user.id)
         await db.refresh(current_user)
         
         return {
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.api.admin import dashboard, users, images, settings, audit, blacklist, backup, gallery, orders, activation, diagnosis, files
+from app.api.admin import dashboard, users, images, settings, audit, blacklist, backup, gallery, orders, activation, diagnosis, files, storage_migration
 
 router = APIRouter(prefix="/admin", tags=["Admin"])
 
@@ -15,3 +15,4 @@ router.include_router(gallery.router)
 router.include_router(orders.router)
 router.include_router(activation.router)
 router.include_router(diagnosis.router)
+router.include_router(storage_migration.router)
@@ -11,6 +11,7 @@ from app.models.user import User
 from app.models.blacklist import Blacklist, ViolationLog, BanAppeal, BanType, AppealStatus
 from app.api.deps import get_admin_user
 from app.services.security import create_ban, remove_ban
+from app.services.ban_index import publish_ban_change
 
 router = APIRouter(prefix="/blacklist")
 
@@ -466,6 +467,7 @@ async def extend_ban(
         ban.expires_at = datetime.utcnow() + timedelta(minutes=minutes)
     
     await db.commit()
+    await publish_ban_change(ban)
     
     return {"message": f"Ban extended by {minutes} minutes", "new_expires_at": ban.expires_at}
 
@@ -491,5 +493,6 @@ async def make_permanent(
     ban.ban_type = BanType.PERMANENT
     ban.expires_at = None
     await db.commit()
+    await publish_ban_change(ban)
     
     return {"message": "Ban is now permanent"}
@@ -243,3 +243,29 @@ async def check_system_status(
                      })
 
     return results
+
+
+@router.get("/diagnosis/storage")
+async def get_storage_io_metrics(
+    current_user = Depends(deps.get_admin_user)
+):
+    """Per-backend storage I/O pool usage and latency (avg/p50/p95/p99 per SDK operation), disk cache stats and circuit breaker health."""
+    from app.services.storage.executor import get_storage_io_stats
+    from app.services.storage.cache import get_storage_cache_stats
+    from app.services.storage.breaker import get_breaker_stats
+    return {"backends": get_storage_io_stats(), "cache": get_storage_cache_stats(), "breakers": get_breaker_stats()}
+
+
+@router.get("/diagnosis/audit")
+async def get_audit_metrics(
+    current_user = Depends(deps.get_admin_user)
+):
+    """Content moderation throughput and latency per provider and request batching (this worker), and audit queue depth."""
+    from app.services.moderation import get_moderation_stats
+    from app.services.audit import get_audit_batch_stats
+    from app.services.audit_queue import get_audit_queue_stats
+    return {
+        "providers": get_moderation_stats(),
+        "batches": get_audit_batch_stats(),
+        "queue": await get_audit_queue_stats(),
+    }
@@ -8,7 +8,7 @@ from app.database import get_db
 from app.models.user import User
 from app.models.file import File
 from app.api.deps import get_admin_user
-from app.services.storage import get_storage_backend_async
+from app.services.storage import get_storage_backend_async, delete_stored_files
 from app.api.admin.audit import create_audit_log
 from app.utils.rate_limit import get_real_ip
 
@@ -182,13 +182,12 @@ async def batch_delete_files(
     if not files:
         return
 
-    storage = await get_storage_backend_async()
-    
-    for file_obj in files:
-        if file_obj.file_path:
-            await storage.delete(file_obj.file_path)
-        if file_obj.thumbnail_path:
-            await storage.delete(file_obj.thumbnail_path)
+    # One bulk request per backend for files and their thumbnails
+    await delete_stored_files(
+        (file_obj.storage_type, path)
+        for file_obj in files
+        for path in (file_obj.file_path, file_obj.thumbnail_path)
+    )
     
     # Delete from database
     await db.execute(delete(File).where(File.id.in_([f.id for f in files])))
@@ -8,8 +8,9 @@ from app.database import get_db
 from app.models.user import User
 from app.models.image import Image, ImageStatus
 from app.api.deps import get_admin_user
-from app.services.storage import get_storage_backend, get_storage_backend_async
+from app.services.storage import get_storage_backend, get_storage_backend_async, delete_stored_files
 from app.api.admin.audit import create_audit_log
+from app.services.audit_cache import forget_audit_results
 from app.utils.rate_limit import get_real_ip
 
 router = APIRouter(prefix="/images")
@@ -176,6 +177,9 @@ async def update_image_status(
     image.status = data.status
     await db.commit()
     await db.refresh(image)
+    if old_status != data.status:
+        # The cached verdict was wrong for this image: audit its duplicates again
+        await forget_audit_results([image])
     
     # 记录审计日志
     ip = get_real_ip(request)
@@ -204,10 +208,12 @@ async def batch_approve_images(
     result = await db.execute(select(Image).where(Image.id.in_(image_ids)))
     images = result.scalars().all()
     
+    overridden = [image for image in images if image.status != ImageStatus.APPROVED]
     for image in images:
         image.status = ImageStatus.APPROVED
     
     await db.commit()
+    await forget_audit_results(overridden)
     
     return {"message": f"Approved {len(images)} images"}
 
@@ -222,10 +228,12 @@ async def batch_reject_images(
     result = await db.execute(select(Image).where(Image.id.in_(image_ids)))
     images = result.scalars().all()
     
+    overridden = [image for image in images if image.status != ImageStatus.REJECTED]
     for image in images:
         image.status = ImageStatus.REJECTED
     
     await db.commit()
+    await forget_audit_results(overridden)
     
     return {"message": f"Rejected {len(images)} images"}
 
@@ -285,12 +293,11 @@ async def batch_delete_images(
     result = await db.execute(select(Image).where(Image.id.in_(image_ids)))
     images = result.scalars().all()
     
-    # Delete from storage - use file_path for date-based paths
-    # Delete from storage - use file_path for date-based paths
-    storage = await get_storage_backend_async()
-    for image in images:
-        file_path = image.file_path if image.file_path else image.full_filename
-        await storage.delete(file_path)
+    # Delete from storage - use file_path for date-based paths (one bulk request per backend)
+    await delete_stored_files(
+        (image.storage_type, image.file_path if image.file_path else image.full_filename)
+        for image in images
+    )
     
     # Delete from database
     await db.execute(delete(Image).where(Image.id.in_([img.id for img in images])))
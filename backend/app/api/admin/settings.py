@@ -349,7 +349,7 @@ async def update_setting(
     db: AsyncSession = Depends(get_db),
 ):
     """Update a setting value."""
-    from app.services.settings import invalidate_cache
+    from app.services.settings import notify_settings_changed
     
     # Parse category from key
     parts = key.split("_", 1)
@@ -386,8 +386,8 @@ async def update_setting(
     await db.commit()
     await db.refresh(setting)
     
-    # Invalidate settings cache so changes take effect immediately
-    invalidate_cache()
+    # Apply to this worker's settings cache and notify the other workers
+    await notify_settings_changed([key])
     
     return SettingResponse(
         key=setting.key,
@@ -405,7 +405,7 @@ async def batch_update_settings(
     db: AsyncSession = Depends(get_db),
 ):
     """Update multiple settings at once."""
-    from app.services.settings import invalidate_cache
+    from app.services.settings import notify_settings_changed
     from app.api.admin.audit import create_audit_log
     from app.utils.rate_limit import get_real_ip
     import logging
@@ -458,17 +458,10 @@ async def batch_update_settings(
         await db.rollback()
         raise
     
-    # Invalidate settings cache
-    invalidate_cache()
-    
-    # Refresh IP header settings if security settings were updated
-    if any(key.startswith("security_") for key in settings_data.keys()):
-        try:
-            from app.utils.rate_limit import refresh_ip_header_settings
-            await refresh_ip_header_settings()
-            logger.info("IP header settings refreshed")
-        except Exception as e:
-            logger.warning(f"Failed to refresh IP header settings: {e}")
+    # Apply to every worker's settings cache (also refreshes IP header / timezone caches)
+    await notify_settings_changed(
+        key for key in settings_data if key.split("_", 1)[0] in DEFAULT_SETTINGS
+    )
     
     # Verify the save by reading back
     verify_result = await db.execute(select(SystemSettings).where(SystemSettings.category == "security"))
@@ -0,0 +1,132 @@
+"""
+Admin API endpoints for migrating objects between storage backends.
+"""
+from fastapi import APIRouter, Depends, HTTPException, status
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import get_db
+from app.models.user import User
+from app.models.storage_migration import StorageMigrationJob
+from app.api.deps import get_admin_user
+from app.schemas.storage_migration import (
+    STORAGE_TYPES, StorageMigrationCreate, StorageMigrationJobResponse,
+    StorageMigrationJobListResponse, StorageMigrationFailureResponse,
+)
+from app.services.storage.migration import (
+    MigrationError, create_migration_job, start_migration_job, resume_migration_job,
+    pause_migration_job, get_live_progress, list_recent_failures,
+)
+
+router = APIRouter(prefix="/storage-migration", tags=["storage-migration"])
+
+
+async def _job_response(db: AsyncSession, job: StorageMigrationJob, with_failures: bool = False) -> StorageMigrationJobResponse:
+    response = StorageMigrationJobResponse.model_validate(job)
+    response.status = job.status.value if hasattr(job.status, "value") else str(job.status)
+    for key, value in get_live_progress(job).items():
+        setattr(response, key, value)
+    if with_failures:
+        failures = await list_recent_failures(db, job.id)
+        response.recent_failures = [StorageMigrationFailureResponse.model_validate(f) for f in failures]
+    return response
+
+
+@router.post("/jobs", response_model=StorageMigrationJobResponse, status_code=status.HTTP_201_CREATED)
+async def create_job(
+    data: StorageMigrationCreate,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Create a migration job and start it in the background."""
+    for storage_type in (data.source_type, data.target_type):
+        if storage_type.lower() not in STORAGE_TYPES:
+            raise HTTPException(status_code=400, detail=f"Unsupported storage type: {storage_type}")
+    try:
+        job = await create_migration_job(
+            db,
+            source_type=data.source_type,
+            target_type=data.target_type,
+            concurrency=data.concurrency,
+            max_bandwidth=data.max_bandwidth,
+            verify_checksum=data.verify_checksum,
+            include_files=data.include_files,
+            triggered_by=admin.id,
+        )
+    except MigrationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    start_migration_job(job.id)
+    return await _job_response(db, job)
+
+
+@router.get("/jobs", response_model=StorageMigrationJobListResponse)
+async def list_jobs(
+    limit: int = 20,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """List migration jobs, newest first."""
+    result = await db.execute(
+        select(StorageMigrationJob).order_by(StorageMigrationJob.id.desc()).limit(limit)
+    )
+    jobs = result.scalars().all()
+    total = await db.scalar(select(func.count(StorageMigrationJob.id)))
+    return StorageMigrationJobListResponse(
+        jobs=[await _job_response(db, job) for job in jobs],
+        total=total or 0,
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=StorageMigrationJobResponse)
+async def get_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Job progress, live throughput and the most recent failed objects."""
+    job = await db.get(StorageMigrationJob, job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Migration job not found")
+    return await _job_response(db, job, with_failures=True)
+
+
+@router.post("/jobs/{job_id}/resume", response_model=StorageMigrationJobResponse)
+async def resume_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Resume a paused, failed or crashed job from its last checkpoint."""
+    try:
+        job = await resume_migration_job(db, job_id)
+    except MigrationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _job_response(db, job)
+
+
+@router.post("/jobs/{job_id}/pause", response_model=StorageMigrationJobResponse)
+async def pause_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Pause a job after its current batch."""
+    try:
+        job = await pause_migration_job(db, job_id)
+    except MigrationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _job_response(db, job)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=StorageMigrationJobResponse)
+async def cancel_job(
+    job_id: int,
+    db: AsyncSession = Depends(get_db),
+    admin: User = Depends(get_admin_user),
+):
+    """Cancel a job. Already migrated rows keep pointing at the target."""
+    try:
+        job = await pause_migration_job(db, job_id, cancel=True)
+    except MigrationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return await _job_response(db, job)
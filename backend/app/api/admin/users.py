@@ -7,6 +7,7 @@ from datetime import datetime
 from app.database import get_db
 from app.models.user import User, UserStatus, UserRole
 from app.api.deps import get_admin_user
+from app.services.user_cache import invalidate_user
 
 router = APIRouter(prefix="/users")
 
@@ -150,6 +151,7 @@ async def update_user(
         user.email_verified = True
     
     await db.commit()
+    await invalidate_user(user.id)
     await db.refresh(user)
     
     logger.info(f"User {user_id} updated. VIP expire: {user.vip_expire_at}")
@@ -182,6 +184,7 @@ async def delete_user(
     
     await db.delete(user)
     await db.commit()
+    await invalidate_user(user_id)
 
 
 @router.post("/{user_id}/unlock")
@@ -14,8 +14,10 @@ from app.schemas.user import (
     PasswordReset, PasswordResetConfirm, RESERVED_USERNAMES
 )
 from app.utils.security import (
-    get_password_hash, 
-    verify_password, 
+    get_password_hash_async,
+    verify_password_async,
+    password_needs_rehash,
+    PasswordHashingBusy,
     create_access_token, 
     create_refresh_token,
     decode_token,
@@ -30,6 +32,7 @@ from app.utils.rate_limit import (
 )
 from app.utils.captcha import create_captcha_redis, verify_captcha_redis
 from app.services.email import send_verification_email, send_password_reset_email
+from app.services.user_cache import invalidate_user
 from app.config import get_settings
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
@@ -263,6 +266,7 @@ async def oauth_callback(
             user.status = UserStatus.ACTIVE
             user.email_verified = True
         await db.commit()
+        await invalidate_user(user.id)
 
     # 6. Generate JWT Tokens
     access_token = create_access_token(data={"sub": str(user.id)})
@@ -448,7 +452,7 @@ async def register(
     user = User(
         username=user_data.username,
         email=user_data.email.lower(),  # Normalize email to lowercase
-        hashed_password=get_password_hash(user_data.password),
+        hashed_password=await get_password_hash_async(user_data.password),
         role=UserRole.USER,
         status=UserStatus.PENDING,
         email_verify_token=verify_token,
@@ -530,7 +534,7 @@ async def login(
             detail="此账号通过第三方登录创建，请使用对应的第三方平台登录。"
         )
     
-    if not user or not verify_password(user_data.password, user.hashed_password):
+    if not user or not await verify_password_async(user_data.password, user.hashed_password):
         await record_failed_login(ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -560,6 +564,13 @@ async def login(
     # Clear failed login attempts
     await clear_login_attempts(ip)
     
+    # Upgrade the hash when BCRYPT_ROUNDS changed
+    if password_needs_rehash(user.hashed_password):
+        try:
+            user.hashed_password = await get_password_hash_async(user_data.password)
+        except PasswordHashingBusy:
+            pass
+    
     # Reset failed attempts counter
     user.failed_login_attempts = 0
     user.last_login_at = datetime.utcnow()
@@ -666,6 +677,7 @@ async def verify_email(
     user.email_verify_token_expires = None
     
     await db.commit()
+    await invalidate_user(user.id)
     
     return {"message": "Email verified successfully"}
 
@@ -781,7 +793,7 @@ async def reset_password(
             detail="密码必须包含数字"
         )
     
-    user.hashed_password = get_password_hash(data.new_password)
+    user.hashed_password = await get_password_hash_async(data.new_password)
     user.password_reset_token = None
     user.password_reset_token_expires = None
     # 重置密码后清除登录失败计数
@@ -789,6 +801,7 @@ async def reset_password(
     user.locked_until = None
     
     await db.commit()
+    await invalidate_user(user.id)
     
     logger.info(f"Password reset successful for user {user.username} from IP {ip}")
     
@@ -30,20 +30,16 @@ logger = logging.getLogger(__name__)
 CHUNK_TEMP_DIR = os.path.join(settings.upload_path, "temp_chunks")
 os.makedirs(CHUNK_TEMP_DIR, exist_ok=True)
 
-@router.post("/init")
-async def init_upload(
+async def authorize_upload(
     request: Request,
-    filename: str = Body(..., embed=True),
-    file_size: int = Body(..., embed=True),
-    mime_type: str = Body(..., embed=True),
-    total_chunks: int = Body(..., embed=True),
-    upload_mode: str = Body("file", embed=True), # 'image', 'video', 'file'
-    user: Optional[User] = Depends(get_current_user_optional),
-    db: AsyncSession = Depends(get_db),
-):
+    user: Optional[User],
+    db: AsyncSession,
+    mime_type: str,
+    file_size: int,
+) -> str:
     """
-    Initialize a chunked upload session.
-    Returns upload_id.
+    Run the ban, guest, rate-limit and size checks shared by every resumable upload protocol.
+    Returns the client IP, raises HTTPException when the upload is not allowed.
     """
     ip = get_real_ip(request)
     user_id = user.id if user else None
@@ -53,7 +49,8 @@ async def init_upload(
     if is_banned:
         raise HTTPException(status_code=403, detail=f"Upload banned: {ban_reason}")
     
-    if not user and not await settings_service.is_guest_upload_enabled():
+    snapshot = await settings_service.get_settings_snapshot()
+    if not user and not snapshot.guest_upload_enabled:
         raise HTTPException(status_code=403, detail="Guest upload disabled")
 
     # 2. Determine limits
@@ -67,25 +64,39 @@ async def init_upload(
         
     # Rate limit check (count initialization as 1 upload attempt? Or check concurrency?)
     # For now, we check standard rate limit for 'init' to prevent spamming sessions
-    is_allowed, _, _ = await security_service.check_rate_limit_multi(
+    is_allowed, _, _, retry_after = await security_service.check_rate_limit_multi(
         ip, user_id, is_user=bool(user), is_vip=is_vip, limit_type=limit_type
     )
     if not is_allowed:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers={"Retry-After": str(retry_after)})
         
     # Size check
-    if limit_type == 'video':
-        if is_vip: max_size = await settings_service.get_max_video_upload_size_vip()
-        elif user: max_size = await settings_service.get_max_video_upload_size_user()
-        else: max_size = await settings_service.get_max_video_upload_size_guest()
-    else:
-        if is_vip: max_size = await settings_service.get_max_file_upload_size_vip()
-        elif user: max_size = await settings_service.get_max_file_upload_size_user()
-        else: max_size = await settings_service.get_max_file_upload_size_guest()
+    max_size = snapshot.max_upload_size[(settings_service.rate_tier(bool(user), is_vip), limit_type)]
         
     if file_size > max_size:
         raise HTTPException(status_code=413, detail=f"File too large (Limit: {max_size})")
 
+    return ip
+
+
+@router.post("/init")
+async def init_upload(
+    request: Request,
+    filename: str = Body(..., embed=True),
+    file_size: int = Body(..., embed=True),
+    mime_type: str = Body(..., embed=True),
+    total_chunks: int = Body(..., embed=True),
+    upload_mode: str = Body("file", embed=True), # 'image', 'video', 'file'
+    user: Optional[User] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Initialize a chunked upload session.
+    Returns upload_id.
+    """
+    ip = await authorize_upload(request, user, db, mime_type, file_size)
+    user_id = user.id if user else None
+
     # 3. Create Session
     upload_id = secrets.token_urlsafe(16)
     session_dir = os.path.join(CHUNK_TEMP_DIR, upload_id)
@@ -176,11 +187,6 @@ async def complete_upload(
         
     total_chunks = meta["total_chunks"]
     filename = meta["filename"]
-    user_id = meta["user_id"]
-    mime_type = meta["mime_type"]
-    file_size_meta = meta["file_size"]
-    upload_mode = meta.get("upload_mode", "file")
-    ip = meta.get("ip")
     
     # Check all chunks present
     for i in range(total_chunks):
@@ -198,56 +204,58 @@ async def complete_upload(
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"Merge failed: {str(e)}")
     
+    response = await finalize_upload(
+        request, db, background_tasks, meta, merged_path,
+        password=password, expire_days=expire_days, download_limit=download_limit,
+    )
+
+    # Cleanup Session
+    try:
+        shutil.rmtree(session_dir)
+    except:
+        pass 
+    
+    return response
+
+
+async def finalize_upload(
+    request: Request,
+    db: AsyncSession,
+    background_tasks: Optional[BackgroundTasks],
+    meta: dict,
+    merged_path: str,
+    password: Optional[str] = None,
+    expire_days: Optional[int] = None,
+    download_limit: Optional[int] = None,
+) -> dict:
+    """
+    Move a fully assembled upload into storage and create its Image/File record.
+    Shared by the chunk API and the tus endpoint; the caller owns the session directory.
+    """
+    filename = meta["filename"]
+    mime_type = meta["mime_type"]
+    file_size_meta = meta["file_size"]
+    upload_mode = meta.get("upload_mode", "file")
+    
     # Validate Size
     real_size = os.path.getsize(merged_path)
     if real_size != file_size_meta:
         # Warning but persist? Or strict? Strict for security.
         pass
-    
-    # Process User & Expiration
-    expire_at = None
-    
-    # 只有 'file' 模式才设置有效期
-    if upload_mode == 'file':
-        if user_id:
-            from sqlalchemy import select
-            result = await db.execute(select(User).where(User.id == user_id))
-            user = result.scalar_one_or_none()
-            
-            # 登录用户：如果没传 expire_days，默认 30 天
-            if not expire_days: 
-                expire_days = 30
-        else:
-            # 游客模式：强制 1 天
-            expire_days = 1
-            
-        if expire_days:
-            from datetime import timedelta
-            expire_at = datetime.utcnow() + timedelta(days=expire_days)
-    else:
-        # 图片和视频不设置有效期
-        expire_at = None
 
     # Save to Storage (Efficiently)
     storage = await get_storage_backend_async()
-    from app.utils.date_path import get_date_path
-    date_path = await get_date_path()
-    full_path_prefix = f"files/{date_path}"
-    
     ext = filename.split(".")[-1].lower() if "." in filename else "bin"
     file_id_name = secrets.token_hex(4)
     final_full_filename = f"{file_id_name}.{ext}"
-    unique_code = secrets.token_urlsafe(5)
+    
+    from app.utils.date_path import get_storage_dir
+    date_path = await get_storage_dir(final_full_filename)
+    full_path_prefix = f"files/{date_path}"
 
     try:
         # Use save_from_path to avoid memory constraints
-        if hasattr(storage, 'save_from_path'):
-            file_path = await storage.save_from_path(merged_path, final_full_filename, full_path_prefix)
-        else:
-            # Fallback (risky for 2GB) or implement naive save_from_path in base?
-            # We implemented it in base, so it should exist!
-            file_path = await storage.save_from_path(merged_path, final_full_filename, full_path_prefix)
-            
+        file_path = await storage.save_from_path(merged_path, final_full_filename, full_path_prefix)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Storage saving failed: {str(e)}")
 
@@ -274,11 +282,10 @@ async def complete_upload(
         except Exception as e:
             print(f"Thumbnail generation failed: {e}")
 
-    # DB Entry
-    
     # Handle Image Logic specifically
+    content = None
+    width = height = None
     if upload_mode == 'image':
-        from app.models.image import Image as ImageModel, ImageStatus
         from app.services.image import process_image
         import aiofiles
         
@@ -289,6 +296,77 @@ async def complete_upload(
         # Extract dimensions (we don't compress in chunk mode to preserve quality of large files)
         # but we use process_image to get info
         _, width, height, final_ext = process_image(content, ext, quality=100)
+
+    return await create_upload_record(
+        request, db, background_tasks, meta, storage,
+        file_path=file_path,
+        file_id_name=file_id_name,
+        ext=ext,
+        real_size=real_size,
+        thumbnail_path=thumbnail_path,
+        width=width,
+        height=height,
+        password=password,
+        expire_days=expire_days,
+        download_limit=download_limit,
+        details=f"Chunked upload complete: {filename} ({upload_mode})",
+    )
+
+
+async def create_upload_record(
+    request: Request,
+    db: AsyncSession,
+    background_tasks: Optional[BackgroundTasks],
+    meta: dict,
+    storage,
+    file_path: str,
+    file_id_name: str,
+    ext: str,
+    real_size: int,
+    thumbnail_path: Optional[str] = None,
+    width: Optional[int] = None,
+    height: Optional[int] = None,
+    password: Optional[str] = None,
+    expire_days: Optional[int] = None,
+    download_limit: Optional[int] = None,
+    details: Optional[str] = None,
+) -> dict:
+    """
+    Create the Image/File record for an object already in storage, write the audit log,
+    queue content moderation and build the unified upload response.
+    Shared by chunk/tus finalization and browser-direct uploads (app.api.direct_upload).
+    """
+    filename = meta["filename"]
+    user_id = meta["user_id"]
+    mime_type = meta["mime_type"]
+    upload_mode = meta.get("upload_mode", "file")
+    ip = meta.get("ip")
+    unique_code = secrets.token_urlsafe(5)
+    
+    # Process User & Expiration
+    expire_at = None
+    
+    # 只有 'file' 模式才设置有效期
+    if upload_mode == 'file':
+        if user_id:
+            # 登录用户：如果没传 expire_days，默认 30 天
+            if not expire_days: 
+                expire_days = 30
+        else:
+            # 游客模式：强制 1 天
+            expire_days = 1
+            
+        if expire_days:
+            from datetime import timedelta
+            expire_at = datetime.utcnow() + timedelta(days=expire_days)
+    else:
+        # 图片和视频不设置有效期
+        expire_at = None
+
+    # DB Entry
+    audit_enabled = False
+    if upload_mode == 'image':
+        from app.models.image import Image as ImageModel, ImageStatus
         
         audit_enabled = await settings_service.is_audit_enabled()
         initial_status = ImageStatus.PENDING if audit_enabled else ImageStatus.APPROVED
@@ -343,43 +421,21 @@ async def complete_upload(
             resource_type="image" if upload_mode == 'image' else "file",
             resource_id=new_record.id,
             user_agent=request.headers.get("User-Agent"),
-            details=f"Chunked upload complete: {filename} ({upload_mode})",
+            details=details,
             log_status="success"
         )
     except Exception as e:
         logger.warning(f"Failed to create audit log for chunked upload: {e}")
 
-    # Image Audit if needed
-    if upload_mode == 'image' and audit_enabled and background_tasks:
+    # Image Audit if needed (the queue reads the image back from storage)
+    if upload_mode == 'image' and audit_enabled:
         try:
-            from app.services.audit import get_audit_service, run_audit_in_background
-            audit_service = await get_audit_service()
-            if audit_service.enabled:
-                # Build public URL
-                if new_record.storage_url:
-                    public_url = new_record.storage_url
-                else:
-                    site_url = await settings_service.get_site_url()
-                    site_url = site_url.rstrip('/') if site_url else ''
-                    # Use the model's url property which handles proxy path
-                    public_url = f"{site_url}{new_record.url}"
-                
-                background_tasks.add_task(
-                    run_audit_in_background,
-                    new_record.id,
-                    content,
-                    audit_service,
-                    public_url
-                )
+            from app.services.audit_queue import enqueue_audit
+            await enqueue_audit(db, new_record)
+            await db.commit()
         except Exception as e:
-            logger.warning(f"Failed to start audit for chunked image: {e}")
+            logger.warning(f"Failed to queue audit for chunked image: {e}")
 
-    # Cleanup Session
-    try:
-        shutil.rmtree(session_dir)
-    except:
-        pass 
-    
     # Unified Response
     if upload_mode == 'image':
         from app.schemas.image import ImageResponse
@@ -392,6 +448,7 @@ async def complete_upload(
             "markdown": f"![{new_record.original_filename}]({image_url})",
         }
     
+    site_url = (await settings_service.get_site_url() or "").rstrip('/')
     return {
         "success": True,
         "type": "file",
@@ -407,7 +464,7 @@ async def complete_upload(
         "access_password": new_record.access_password,
         "expire_at": new_record.expire_at.isoformat() if new_record.expire_at else None,
         "download_limit": new_record.download_limit,
-        "shareLink": f"{settings.site_url.rstrip('/')}/s/{new_record.unique_code}" if settings.site_url else f"/s/{new_record.unique_code}"
+        "shareLink": f"{site_url}/s/{new_record.unique_code}"
     }
 
 
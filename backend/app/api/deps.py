@@ -1,12 +1,11 @@
 from fastapi import Depends, HTTPException, status, Request
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
 from typing import Optional
 from app.database import get_db
 from app.models.user import User, UserRole, UserStatus
-from app.utils.security import decode_token
-from app.utils.rate_limit import get_real_ip, is_blacklisted
+from app.services.user_cache import get_cached_user
+from app.utils.request_context import check_ip_blacklisted, get_token_payload
 
 security = HTTPBearer(auto_error=False)
 
@@ -17,9 +16,8 @@ async def get_current_user_optional(
     db: AsyncSession = Depends(get_db),
 ) -> Optional[User]:
     """Get current user if authenticated, None otherwise."""
-    # Check IP blacklist
-    ip = get_real_ip(request)
-    if await is_blacklisted(ip):
+    # Check IP blacklist (already resolved by the security middleware)
+    if await check_ip_blacklisted(request):
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Your IP has been temporarily blocked"
@@ -29,7 +27,7 @@ async def get_current_user_optional(
         return None
     
     token = credentials.credentials
-    payload = decode_token(token)
+    payload = get_token_payload(request, token)
     
     if not payload:
         return None
@@ -41,13 +39,13 @@ async def get_current_user_optional(
     if not user_id:
         return None
     
-    result = await db.execute(select(User).where(User.id == int(user_id)))
-    user = result.scalar_one_or_none()
+    user = await get_cached_user(int(user_id))
     
     if not user or user.status != UserStatus.ACTIVE:
         return None
     
-    return user
+    # Attach a copy to the request session (no SELECT) so endpoints can modify it
+    return await db.merge(user, load=False)
 
 
 async def get_current_user(
@@ -0,0 +1,240 @@
+"""
+Browser-direct Upload API
+浏览器直传：服务器签发预签名 PUT，客户端直接上传到对象存储（S3 兼容 / OSS / COS）
+
+1. POST /direct/init: usual ban, guest, rate-limit, size and extension checks, then a
+   presigned PUT URL plus an upload_token describing the pending object.
+2. The client PUTs the file to the returned URL with the returned headers.
+3. POST /direct/complete: HEAD the object, verify its size and content type and create
+   the Image/File record (shared with the chunk and tus APIs).
+
+The bucket needs a CORS rule allowing PUT from the site origin. Local storage (or a
+cloud backend whose circuit breaker is open) answers 400, and clients fall back to
+the chunk/tus upload.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request, Body, BackgroundTasks
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+from datetime import datetime, timedelta
+import time
+from jose import JWTError, jwt
+import io
+import secrets
+import logging
+
+from app.database import get_db
+from app.models.user import User
+from app.api.deps import get_current_user_optional
+from app.api.chunk import authorize_upload, create_upload_record
+from app.services import settings as settings_service
+from app.services.storage import get_storage_backend_async, get_storage_backend_for
+from app.redis import get_redis
+from app.utils.security import ALGORITHM
+from app.config import get_settings
+
+router = APIRouter(prefix="/direct", tags=["DirectUpload"])
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+TOKEN_TYPE = "direct_upload"
+# Bytes read back from the bucket to sniff the content type / image dimensions
+SNIFF_SIZE = 64 * 1024
+
+
+def _allowed_extensions(upload_mode: str, mime_type: str) -> tuple:
+    if upload_mode == "image":
+        media = "image"
+    else:
+        media = "video" if mime_type.startswith("video/") else "file"
+    # authorize_upload() has just refreshed the settings snapshot
+    return settings_service.current_settings().allowed_extensions[media]
+
+
+@router.post("/init")
+async def init_direct_upload(
+    request: Request,
+    filename: str = Body(..., embed=True),
+    file_size: int = Body(..., embed=True),
+    mime_type: str = Body(..., embed=True),
+    upload_mode: str = Body("file", embed=True),  # 'image', 'video', 'file'
+    user: Optional[User] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Authorize an upload and presign a direct PUT to the active storage bucket.
+    """
+    if upload_mode not in ("image", "video", "file"):
+        raise HTTPException(status_code=400, detail="Invalid upload mode")
+    if upload_mode == "image" and not mime_type.startswith("image/"):
+        raise HTTPException(status_code=400, detail="Invalid image type")
+    if file_size <= 0:
+        raise HTTPException(status_code=400, detail="Empty file")
+
+    ip = await authorize_upload(request, user, db, mime_type, file_size)
+
+    ext = filename.rsplit(".", 1)[-1].lower() if "." in filename else "bin"
+    allowed_extensions = _allowed_extensions(upload_mode, mime_type)
+    if allowed_extensions and ext not in allowed_extensions:
+        raise HTTPException(status_code=400, detail=f"File extension not allowed. Allowed: {', '.join(allowed_extensions)}")
+
+    file_id_name = secrets.token_hex(4)
+    final_full_filename = f"{file_id_name}.{ext}"
+    from app.utils.date_path import get_storage_dir
+    date_path = await get_storage_dir(final_full_filename)
+    file_path = f"files/{date_path}/{final_full_filename}"
+
+    storage = await get_storage_backend_async()
+    expires = settings.direct_upload_expires
+    try:
+        presigned = storage.create_presigned_upload(file_path, mime_type, expires)
+    except NotImplementedError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    token = jwt.encode({
+        "type": TOKEN_TYPE,
+        "exp": datetime.utcnow() + timedelta(seconds=expires * 2),
+        "storage_type": storage.storage_type,
+        "file_path": file_path,
+        "file_id_name": file_id_name,
+        "ext": ext,
+        "filename": filename,
+        "file_size": file_size,
+        "mime_type": mime_type,
+        "upload_mode": upload_mode,
+        "user_id": user.id if user else None,
+        "ip": ip,
+    }, settings.jwt_secret_key, algorithm=ALGORITHM)
+
+    return {
+        "upload_token": token,
+        "method": presigned["method"],
+        "url": presigned["url"],
+        "headers": presigned["headers"],
+        "expires_in": expires,
+    }
+
+
+@router.post("/complete")
+async def complete_direct_upload(
+    request: Request,
+    background_tasks: BackgroundTasks,
+    upload_token: str = Body(..., embed=True),
+    password: Optional[str] = Body(None, embed=True),
+    expire_days: Optional[int] = Body(None, embed=True),
+    download_limit: Optional[int] = Body(None, embed=True),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Verify the object uploaded to the bucket and create its record.
+    """
+    try:
+        meta = jwt.decode(upload_token, settings.jwt_secret_key, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(status_code=400, detail="Invalid or expired upload token")
+    if meta.get("type") != TOKEN_TYPE:
+        raise HTTPException(status_code=400, detail="Invalid upload token")
+
+    file_path = meta["file_path"]
+    upload_mode = meta["upload_mode"]
+
+    # A token finalizes one object only
+    from sqlalchemy import select
+    from app.models.image import Image as ImageModel
+    from app.models.file import File as FileModel
+    model = ImageModel if upload_mode == "image" else FileModel
+    existing = await db.execute(select(model.id).where(model.file_path == file_path))
+    if existing.first():
+        raise HTTPException(status_code=409, detail="Upload already completed")
+
+    # Claim the object atomically: two concurrent completes with the same token would
+    # otherwise both pass the check above and create two records for one object
+    redis = get_redis()
+    claim_key = f"direct_upload:claim:{file_path}"
+    # Kept until the token expires; after that the token is rejected anyway
+    claim_ttl = max(60, int(meta.get("exp", 0) - time.time()) + 60)
+    if redis and not await redis.set(claim_key, "1", ex=claim_ttl, nx=True):
+        raise HTTPException(status_code=409, detail="Upload already completed")
+    try:
+        return await _finalize_direct_upload(
+            request, db, background_tasks, meta,
+            password=password,
+            expire_days=expire_days,
+            download_limit=download_limit,
+        )
+    except BaseException:
+        # Not completed (e.g. storage unavailable): the client may retry
+        if redis:
+            await redis.delete(claim_key)
+        raise
+
+
+async def _finalize_direct_upload(
+    request: Request,
+    db: AsyncSession,
+    background_tasks: BackgroundTasks,
+    meta: dict,
+    password: Optional[str],
+    expire_days: Optional[int],
+    download_limit: Optional[int],
+):
+    """Verify the uploaded object (size, content type) and create its record."""
+    file_path = meta["file_path"]
+    upload_mode = meta["upload_mode"]
+
+    storage = await get_storage_backend_for(meta["storage_type"])
+
+    # HEAD: the object must exist with exactly the authorized size
+    try:
+        real_size = await storage.get_size(file_path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=400, detail="Object not uploaded")
+    except Exception as e:
+        logger.error(f"Direct upload HEAD failed for {file_path}: {e}")
+        raise HTTPException(status_code=502, detail="Storage unavailable")
+
+    async def reject(detail: str):
+        await storage.delete(file_path)
+        raise HTTPException(status_code=400, detail=detail)
+
+    if real_size != meta["file_size"]:
+        await reject("Uploaded size does not match")
+
+    # Sniff the real content type from the first bytes
+    import magic
+    head = b""
+    async for chunk in storage.open_read(file_path, (0, SNIFF_SIZE - 1)):
+        head += chunk
+    try:
+        detected_mime = magic.from_buffer(head, mime=True)
+    except Exception:
+        detected_mime = "application/octet-stream"
+
+    width = height = None
+    if upload_mode == "image":
+        from app.utils.validators import ALLOWED_MIME_TYPES
+        if detected_mime not in ALLOWED_MIME_TYPES:
+            await reject(f"File type '{detected_mime}' is not allowed")
+        try:
+            from PIL import Image as PILImage
+            width, height = PILImage.open(io.BytesIO(head)).size
+        except Exception:
+            # Header larger than SNIFF_SIZE (e.g. big EXIF block): dimensions stay unknown
+            pass
+    elif meta["mime_type"].startswith("video/") and not detected_mime.startswith("video/"):
+        await reject(f"File type '{detected_mime}' is not a video")
+
+    await storage.register_direct_upload(file_path)
+
+    return await create_upload_record(
+        request, db, background_tasks, meta, storage,
+        file_path=file_path,
+        file_id_name=meta["file_id_name"],
+        ext=meta["ext"],
+        real_size=real_size,
+        width=width,
+        height=height,
+        password=password,
+        expire_days=expire_days,
+        download_limit=download_limit,
+        details=f"Direct upload complete: {meta['filename']} ({upload_mode})",
+    )
@@ -53,15 +53,14 @@ async def batch_download(
         )
     
     # Generate ZIP
-    zip_buffer = await service.create_zip_stream(images)
+    zip_stream = service.create_zip_stream(images)
     filename = service.generate_zip_filename()
     
     return StreamingResponse(
-        zip_buffer,
+        zip_stream,
         media_type="application/zip",
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"',
-            "Content-Length": str(zip_buffer.getbuffer().nbytes),
         }
     )
 
@@ -92,14 +91,13 @@ async def download_album(
         )
     
     # Generate ZIP
-    zip_buffer = await service.create_zip_stream(images)
+    zip_stream = service.create_zip_stream(images)
     filename = service.generate_album_zip_filename(album.name)
     
     return StreamingResponse(
-        zip_buffer,
+        zip_stream,
         media_type="application/zip",
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"',
-            "Content-Length": str(zip_buffer.getbuffer().nbytes),
         }
     )
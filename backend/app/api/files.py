@@ -37,13 +37,14 @@ async def upload_file(
     """
     ip = get_real_ip(request)
     user_id = user.id if user else None
+    snapshot = await settings_service.get_settings_snapshot()
     
     # Check permissions and bans
     is_banned, ban_reason = await security_service.is_banned(ip, user_id, db)
     if is_banned:
         raise HTTPException(status_code=403, detail=f"Upload banned: {ban_reason}")
         
-    if not user and not await settings_service.is_guest_upload_enabled():
+    if not user and not snapshot.guest_upload_enabled:
         raise HTTPException(status_code=403, detail="Guest upload disabled")
 
     # Determine upload type (video vs generic file)
@@ -57,45 +58,26 @@ async def upload_file(
     if user and user.vip_expire_at and user.vip_expire_at > datetime.utcnow():
         is_vip = True
         
-    is_allowed, _, _ = await security_service.check_rate_limit_multi(
+    is_allowed, _, _, retry_after = await security_service.check_rate_limit_multi(
         ip, user_id, is_user=bool(user), is_vip=is_vip, limit_type=limit_type
     )
     if not is_allowed:
-        raise HTTPException(status_code=429, detail="Rate limit exceeded")
+        raise HTTPException(status_code=429, detail="Rate limit exceeded", headers={"Retry-After": str(retry_after)})
 
     # Calculate max size logic (separate file limits)
-    # Calculate max size logic
+    max_size = snapshot.max_upload_size[(settings_service.rate_tier(bool(user), is_vip), limit_type)]
     if limit_type == 'video':
-        if is_vip:
-            max_size = await settings_service.get_max_video_upload_size_vip()
-        elif user:
-            max_size = await settings_service.get_max_video_upload_size_user()
-        else:
-            max_size = await settings_service.get_max_video_upload_size_guest()
-        
         # 视频默认不设置有效期
         if expire_at is None:
             expire_at = None
     else:
-        # Generic File Limits
-        if is_vip:
-            max_size = await settings_service.get_max_file_upload_size_vip()
-        elif user:
-            max_size = await settings_service.get_max_file_upload_size_user()
-            if expire_at is None:
-                from datetime import timedelta
-                expire_at = datetime.utcnow() + timedelta(days=30)
-        else:
-            max_size = await settings_service.get_max_file_upload_size_guest()
-            if expire_at is None:
-                from datetime import timedelta
-                expire_at = datetime.utcnow() + timedelta(days=1)
+        # Generic files: users keep 30 days, guests 1 day, VIP no default expiry
+        if expire_at is None and not is_vip:
+            from datetime import timedelta
+            expire_at = datetime.utcnow() + timedelta(days=30 if user else 1)
         
     # Validate extension
-    if limit_type == 'video':
-        allowed_extensions = await settings_service.get_video_allowed_extensions()
-    else:
-        allowed_extensions = await settings_service.get_file_allowed_extensions()
+    allowed_extensions = snapshot.allowed_extensions[limit_type]
         
     original_filename = file.filename or "unnamed_file"
     ext = original_filename.split(".")[-1].lower() if "." in original_filename else "bin"
@@ -115,11 +97,11 @@ async def upload_file(
     # Save to storage
     # We use a separate folder 'files' to check against image uploads
     # Date path is still good for organization
-    from app.utils.date_path import get_date_path
-    date_path = await get_date_path()
-    full_path_prefix = f"files/{date_path}"
-    
     final_full_filename = f"{filename}.{ext}"
+    
+    from app.utils.date_path import get_storage_dir
+    date_path = await get_storage_dir(final_full_filename)
+    full_path_prefix = f"files/{date_path}"
 
     storage = await get_storage_backend_async()
     try:
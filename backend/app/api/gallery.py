@@ -221,27 +221,18 @@ async def download_public_album(
     Rate limited to 5 downloads per hour per IP.
     """
     from app.services.download import DownloadService
-    from app.utils.rate_limit import get_real_ip
-    from app.redis import get_redis
+    from app.utils.rate_limit import get_real_ip, hit_rate_limit, RateWindow
     
     ip = get_real_ip(request)
     
     # Rate limiting: 5 downloads per hour per IP
-    redis = get_redis()
-    if redis:
-        rate_key = f"gallery_download:{ip}"
-        current = await redis.get(rate_key)
-        if current and int(current) >= 5:
-            raise HTTPException(
-                status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Rate limit exceeded. Maximum 5 downloads per hour. Please try again later."
-            )
-        
-        # Increment counter
-        pipe = redis.pipeline()
-        pipe.incr(rate_key)
-        pipe.expire(rate_key, 3600)  # 1 hour expiry
-        await pipe.execute()
+    result = await hit_rate_limit(f"gallery_download:{ip}", (RateWindow("hour", 5, 3600),))
+    if not result.allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Maximum 5 downloads per hour. Please try again later.",
+            headers={"Retry-After": str(result.retry_after)}
+        )
     
     service = DownloadService(db)
     album, images = await service.get_album_images(album_id, public_only=True)
@@ -263,14 +254,13 @@ async def download_public_album(
         )
     
     # Generate ZIP
-    zip_buffer = await service.create_zip_stream(approved_images)
+    zip_stream = service.create_zip_stream(approved_images)
     filename = service.generate_album_zip_filename(album.name)
     
     return StreamingResponse(
-        zip_buffer,
+        zip_stream,
         media_type="application/zip",
         headers={
             "Content-Disposition": f'attachment; filename="{filename}"',
-            "Content-Length": str(zip_buffer.getbuffer().nbytes),
         }
     )
@@ -4,12 +4,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete
 from typing import Optional
 import os
+from datetime import datetime
 from app.database import get_db
 from app.models.user import User
 from app.models.image import Image, ImageStatus
 from app.schemas.image import ImageResponse, ImageListResponse, ImageMoveRequest, ImageBatchMoveRequest, ImageUpdateRequest
 from app.api.deps import get_current_user
-from app.services.storage import get_storage_backend, get_storage_backend_async
+from app.services.storage import get_storage_backend, get_storage_backend_async, get_storage_backend_for, delete_stored_files
 from app.utils.sanitizer import validate_and_sanitize_title
 from app.config import get_settings
 from app.api.admin.audit import create_audit_log
@@ -332,12 +333,11 @@ async def delete_multiple_images(
             detail="No images found"
         )
     
-    # Delete from storage - use file_path for date-based paths
-    # Delete from storage - use file_path for date-based paths
-    storage = await get_storage_backend_async()
-    for image in images:
-        file_path = image.file_path if image.file_path else image.full_filename
-        await storage.delete(file_path)
+    # Delete from storage - use file_path for date-based paths (one bulk request per backend)
+    await delete_stored_files(
+        (image.storage_type, image.file_path if image.file_path else image.full_filename)
+        for image in images
+    )
     
     # Delete from database
     await db.execute(
@@ -485,8 +485,8 @@ async def apply_watermark_to_image(
     if not is_vip:
         raise HTTPException(status_code=403, detail="只有 VIP 用户可以使用水印功能")
 
-    # 2. Get file content
-    storage = await get_storage_backend_async()
+    # 2. Get file content (from the backend that actually holds this image)
+    storage = await get_storage_backend_for(image.storage_type)
     
     # Resolve actual path (handle legacy images where file_path might be None)
     current_file_path = image.file_path if image.file_path else image.full_filename
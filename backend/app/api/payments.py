@@ -6,6 +6,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
 from app.api.deps import get_db, get_current_user
 from app.models.user import User
+from app.services.user_cache import invalidate_user
 from app.models.payment import PaymentTransaction, PaymentStatus
 from app.services.settings import (
     is_stripe_enabled,
@@ -184,6 +185,7 @@ async def handle_checkout_completed(session, db: AsyncSession):
         print(f"VIP Granted to User {user.username} until {new_expire} (Plan: {plan})")
     
     await db.commit()
+    await invalidate_user(user_id)
 
 
 # ==========================================
@@ -510,3 +512,4 @@ async def handle_epay_success(out_trade_no: str, db: AsyncSession):
             logger.info(f"Epay VIP Granted to User {user.username} (Plan: {plan})")
             
         await db.commit()
+        await invalidate_user(transaction.user_id)
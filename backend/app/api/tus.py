@@ -0,0 +1,344 @@
+"""
+tus Resumable Upload API
+tus 1.0.0 断点续传协议 (https://tus.io/protocols/resumable-upload)
+
+Supported extensions: creation, checksum, termination.
+Permission checks, storage and record creation are shared with the chunk API (app.api.chunk).
+PATCH requests on one upload are serialized with a lock file in its session directory
+(flock, so it is shared by all workers and released if a worker dies); a PATCH that
+arrives while another one is running gets 423 Locked.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Request, BackgroundTasks
+from fastapi.responses import Response, JSONResponse
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+import os
+import fcntl
+import json
+import base64
+import hashlib
+import secrets
+import shutil
+import logging
+from contextlib import contextmanager
+from datetime import datetime
+import aiofiles
+
+from app.database import get_db
+from app.models.user import User
+from app.api.deps import get_current_user_optional
+from app.api.chunk import CHUNK_TEMP_DIR, authorize_upload, finalize_upload
+
+router = APIRouter(prefix="/tus", tags=["TusUpload"])
+logger = logging.getLogger(__name__)
+
+TUS_VERSION = "1.0.0"
+TUS_EXTENSIONS = "creation,checksum,termination"
+TUS_CHECKSUM_ALGORITHMS = ("sha1", "md5", "sha256")
+
+# tus sessions live next to the chunk sessions but in their own namespace
+TUS_TEMP_DIR = os.path.join(CHUNK_TEMP_DIR, "tus")
+os.makedirs(TUS_TEMP_DIR, exist_ok=True)
+
+
+def _tus_headers(**extra) -> dict:
+    headers = {"Tus-Resumable": TUS_VERSION, "Cache-Control": "no-store"}
+    headers.update({k.replace("_", "-"): str(v) for k, v in extra.items()})
+    return headers
+
+
+def _tus_error(status_code: int, detail: str) -> HTTPException:
+    return HTTPException(status_code=status_code, detail=detail, headers=_tus_headers())
+
+
+def _check_tus_version(request: Request):
+    if request.headers.get("Tus-Resumable") != TUS_VERSION:
+        raise HTTPException(
+            status_code=412,
+            detail="Unsupported tus version",
+            headers={"Tus-Version": TUS_VERSION},
+        )
+
+
+def _parse_metadata(header_value: Optional[str]) -> dict:
+    """Parse the Upload-Metadata header: comma-separated `key base64value` pairs."""
+    metadata = {}
+    if not header_value:
+        return metadata
+    for pair in header_value.split(","):
+        parts = pair.strip().split(" ", 1)
+        if not parts[0]:
+            continue
+        value = ""
+        if len(parts) == 2:
+            try:
+                value = base64.b64decode(parts[1]).decode("utf-8")
+            except Exception:
+                raise _tus_error(400, "Invalid Upload-Metadata")
+        metadata[parts[0]] = value
+    return metadata
+
+
+def _get_session(upload_id: str) -> tuple[str, dict]:
+    # upload_id comes from secrets.token_urlsafe, anything else is a probe
+    if not upload_id or not all(c.isalnum() or c in "-_" for c in upload_id):
+        raise _tus_error(404, "Upload not found")
+    session_dir = os.path.join(TUS_TEMP_DIR, upload_id)
+    meta_path = os.path.join(session_dir, "meta.json")
+    if not os.path.exists(meta_path):
+        raise _tus_error(404, "Upload not found")
+    with open(meta_path, "r") as f:
+        meta = json.load(f)
+    return session_dir, meta
+
+
+def _current_offset(session_dir: str) -> int:
+    data_path = os.path.join(session_dir, "data")
+    return os.path.getsize(data_path) if os.path.exists(data_path) else 0
+
+
+@contextmanager
+def _session_lock(session_dir: str):
+    """Exclusive lock on an upload for the duration of one PATCH."""
+    try:
+        fd = os.open(os.path.join(session_dir, ".lock"), os.O_RDWR | os.O_CREAT, 0o600)
+    except FileNotFoundError:
+        # Terminated meanwhile
+        raise _tus_error(404, "Upload not found")
+    try:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise _tus_error(423, "Another PATCH is in progress for this upload")
+        yield
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+@router.options("")
+@router.options("/{upload_id}")
+async def tus_options(upload_id: Optional[str] = None):
+    """Server capability discovery."""
+    from app.services import settings as settings_service
+    max_size = await settings_service.get_max_video_upload_size_vip()
+    return Response(status_code=204, headers={
+        "Tus-Resumable": TUS_VERSION,
+        "Tus-Version": TUS_VERSION,
+        "Tus-Extension": TUS_EXTENSIONS,
+        "Tus-Max-Size": str(max_size),
+        "Tus-Checksum-Algorithm": ",".join(TUS_CHECKSUM_ALGORITHMS),
+    })
+
+
+@router.post("")
+async def tus_create(
+    request: Request,
+    user: Optional[User] = Depends(get_current_user_optional),
+    db: AsyncSession = Depends(get_db),
+):
+    """
+    Creation extension: register a new upload and return its URL in Location.
+    Metadata keys: filename, filetype, upload_mode, password, expire_days, download_limit.
+    """
+    _check_tus_version(request)
+
+    if request.headers.get("Upload-Defer-Length"):
+        raise _tus_error(400, "Upload-Defer-Length is not supported")
+    try:
+        upload_length = int(request.headers.get("Upload-Length", ""))
+    except ValueError:
+        raise _tus_error(400, "Missing or invalid Upload-Length")
+    if upload_length < 0:
+        raise _tus_error(400, "Missing or invalid Upload-Length")
+
+    metadata = _parse_metadata(request.headers.get("Upload-Metadata"))
+    filename = os.path.basename(metadata.get("filename") or metadata.get("name") or "upload.bin")
+    mime_type = metadata.get("filetype") or metadata.get("type") or "application/octet-stream"
+    upload_mode = metadata.get("upload_mode")
+    if upload_mode not in ("image", "video", "file"):
+        if mime_type.startswith("image/"):
+            upload_mode = "image"
+        elif mime_type.startswith("video/"):
+            upload_mode = "video"
+        else:
+            upload_mode = "file"
+
+    ip = await authorize_upload(request, user, db, mime_type, upload_length)
+
+    upload_id = secrets.token_urlsafe(16)
+    session_dir = os.path.join(TUS_TEMP_DIR, upload_id)
+    os.makedirs(session_dir, exist_ok=True)
+    open(os.path.join(session_dir, "data"), "wb").close()
+
+    meta = {
+        "upload_id": upload_id,
+        "filename": filename,
+        "file_size": upload_length,
+        "mime_type": mime_type,
+        "upload_mode": upload_mode,
+        "user_id": user.id if user else None,
+        "ip": ip,
+        "password": metadata.get("password") or None,
+        "expire_days": int(metadata["expire_days"]) if metadata.get("expire_days", "").isdigit() else None,
+        "download_limit": int(metadata["download_limit"]) if metadata.get("download_limit", "").isdigit() else None,
+        "created_at": datetime.utcnow().isoformat()
+    }
+    with open(os.path.join(session_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    location = f"{request.url.path.rstrip('/')}/{upload_id}"
+    return Response(status_code=201, headers=_tus_headers(Location=location, Upload_Offset=0))
+
+
+@router.head("/{upload_id}")
+async def tus_head(upload_id: str, request: Request):
+    """Return the current offset so the client can resume at byte granularity."""
+    _check_tus_version(request)
+    session_dir, meta = _get_session(upload_id)
+    offset = meta["file_size"] if meta.get("result") else _current_offset(session_dir)
+    return Response(status_code=200, headers=_tus_headers(
+        Upload_Offset=offset,
+        Upload_Length=meta["file_size"],
+    ))
+
+
+@router.patch("/{upload_id}")
+async def tus_patch(
+    upload_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession = Depends(get_db),
+):
+    """Append bytes at Upload-Offset; the last PATCH finalizes the upload like /chunk/complete."""
+    _check_tus_version(request)
+    if request.headers.get("Content-Type") != "application/offset+octet-stream":
+        raise _tus_error(415, "Content-Type must be application/offset+octet-stream")
+
+    session_dir, _ = _get_session(upload_id)
+    with _session_lock(session_dir):
+        return await _apply_patch(upload_id, request, background_tasks, db)
+
+
+async def _apply_patch(
+    upload_id: str,
+    request: Request,
+    background_tasks: BackgroundTasks,
+    db: AsyncSession,
+) -> Response:
+    # Re-read under the lock: the previous PATCH may have completed the upload
+    session_dir, meta = _get_session(upload_id)
+    if meta.get("result"):
+        raise _tus_error(409, "Upload already completed")
+
+    try:
+        client_offset = int(request.headers.get("Upload-Offset", ""))
+    except ValueError:
+        raise _tus_error(400, "Missing or invalid Upload-Offset")
+
+    offset = _current_offset(session_dir)
+    if client_offset != offset:
+        raise _tus_error(409, f"Offset mismatch (server offset: {offset})")
+
+    # Checksum extension
+    hasher = None
+    expected_digest = None
+    checksum_header = request.headers.get("Upload-Checksum")
+    if checksum_header:
+        try:
+            algorithm, encoded = checksum_header.strip().split(" ", 1)
+            expected_digest = base64.b64decode(encoded)
+        except Exception:
+            raise _tus_error(400, "Invalid Upload-Checksum")
+        if algorithm.lower() not in TUS_CHECKSUM_ALGORITHMS:
+            raise _tus_error(400, f"Unsupported checksum algorithm: {algorithm}")
+        hasher = hashlib.new(algorithm.lower())
+
+    upload_length = meta["file_size"]
+    data_path = os.path.join(session_dir, "data")
+    written = 0
+    try:
+        async with aiofiles.open(data_path, "ab") as f:
+            async for chunk in request.stream():
+                if not chunk:
+                    continue
+                if offset + written + len(chunk) > upload_length:
+                    raise _tus_error(413, "Upload exceeds declared Upload-Length")
+                await f.write(chunk)
+                if hasher:
+                    hasher.update(chunk)
+                written += len(chunk)
+    except HTTPException:
+        _truncate(data_path, offset)
+        raise
+    except Exception as e:
+        # Client disconnected mid-PATCH: keep what was written, the next HEAD reports it
+        logger.warning(f"[tus] PATCH interrupted for {upload_id} at offset {offset + written}: {e}")
+        if hasher:
+            _truncate(data_path, offset)
+        raise _tus_error(400, "Upload interrupted")
+
+    if hasher and hasher.digest() != expected_digest:
+        _truncate(data_path, offset)
+        raise _tus_error(460, "Checksum mismatch")
+
+    new_offset = offset + written
+    headers = _tus_headers(Upload_Offset=new_offset)
+
+    if new_offset == upload_length:
+        try:
+            result = await finalize_upload(
+                request, db, background_tasks, meta, data_path,
+                password=meta.get("password"),
+                expire_days=meta.get("expire_days"),
+                download_limit=meta.get("download_limit"),
+            )
+        except HTTPException as e:
+            raise _tus_error(e.status_code, e.detail)
+
+        # Keep only the metadata so clients can fetch the result with GET
+        os.remove(data_path)
+        meta["result"] = jsonable_encoder(result)
+        with open(os.path.join(session_dir, "meta.json"), "w") as f:
+            json.dump(meta, f)
+
+        url = meta["result"].get("url") or meta["result"].get("shareLink")
+        if url:
+            headers["Upload-Result-Url"] = url
+
+    return Response(status_code=204, headers=headers)
+
+
+@router.get("/{upload_id}")
+async def tus_result(upload_id: str):
+    """Return the finalized record (same payload as /chunk/complete) once the upload is done."""
+    session_dir, meta = _get_session(upload_id)
+    if not meta.get("result"):
+        return JSONResponse(
+            status_code=202,
+            content={"upload_id": upload_id, "offset": _current_offset(session_dir), "length": meta["file_size"]},
+            headers=_tus_headers(),
+        )
+    return JSONResponse(content=meta["result"], headers=_tus_headers())
+
+
+@router.delete("/{upload_id}")
+async def tus_terminate(upload_id: str, request: Request):
+    """Termination extension: discard an upload and free its temporary storage."""
+    _check_tus_version(request)
+    session_dir, _ = _get_session(upload_id)
+    try:
+        shutil.rmtree(session_dir)
+    except Exception as e:
+        logger.warning(f"[tus] Failed to remove session {upload_id}: {e}")
+    return Response(status_code=204, headers=_tus_headers())
+
+
+def _truncate(path: str, size: int):
+    """Roll a partially written PATCH back to the last acknowledged offset."""
+    try:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+    except Exception as e:
+        logger.error(f"[tus] Failed to truncate {path} to {size}: {e}")
@@ -14,10 +14,10 @@ from app.api.deps import get_current_user_optional
 from app.utils.validators import validate_image_file, validate_image_content
 from app.utils.rate_limit import get_real_ip
 from app.utils.security import generate_random_string
-from app.utils.date_path import get_date_path
+from app.utils.date_path import get_storage_dir
 from app.services.image import process_image
 from app.services.storage import get_storage_backend_async
-from app.services.audit import get_audit_service, run_audit_in_background
+from app.services.audit_queue import enqueue_audit
 
 from app.services.watermark import apply_watermark
 from app.services.ai_service import gemini_service
@@ -27,7 +27,6 @@ from app.config import get_settings
 from app.api.admin.audit import create_audit_log
 import logging
 from datetime import datetime
-import os
 from sqlalchemy import select
 
 router = APIRouter(prefix="/upload", tags=["Upload"])
@@ -59,6 +58,7 @@ async def upload_image(
     """
     ip = get_real_ip(request)
     user_id = user.id if user else None
+    snapshot = await settings_service.get_settings_snapshot()
     
     # ========== 权限检查 ==========
     is_banned, ban_reason = await security_service.is_banned(ip, user_id, db)
@@ -68,7 +68,7 @@ async def upload_image(
             detail=f"上传功能已被暂时禁用。原因: {ban_reason}"
         )
     
-    if not user and not await settings_service.is_guest_upload_enabled():
+    if not user and not snapshot.guest_upload_enabled:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="游客上传已禁用"
@@ -81,7 +81,7 @@ async def upload_image(
             is_vip = True
     
     # ========== 速率限制 ==========
-    is_allowed, limit_type, _ = await security_service.check_rate_limit_multi(
+    is_allowed, limit_type, _, retry_after = await security_service.check_rate_limit_multi(
         ip, user_id, is_user=bool(user), is_vip=is_vip
     )
     if not is_allowed:
@@ -94,16 +94,16 @@ async def upload_image(
             "hour": "已达到每小时上传限制",
             "day": "已达到每日上传限制"
         }
-        raise HTTPException(status_code=429, detail=messages.get(limit_type, "请求过于频繁"))
+        raise HTTPException(
+            status_code=429,
+            detail=messages.get(limit_type, "请求过于频繁"),
+            headers={"Retry-After": str(retry_after)}
+        )
     
     # ========== 文件验证 ==========
-    if is_vip:
-        max_size = await settings_service.get_max_upload_size_vip()
-    elif user:
-        max_size = await settings_service.get_max_upload_size_user()
-    else:
-        max_size = await settings_service.get_max_upload_size_guest()
-    allowed_extensions = await settings_service.get_allowed_extensions()
+    tier = settings_service.rate_tier(bool(user), is_vip)
+    max_size = snapshot.max_upload_size[(tier, "image")]
+    allowed_extensions = list(snapshot.allowed_extensions["image"])
     logger.info(f"[Upload] File: {file.filename}, max_size: {max_size}, allowed_ext: {allowed_extensions}")
     
     try:
@@ -129,7 +129,7 @@ async def upload_image(
     logger.info(f"[Upload] Validated: mime_type={mime_type}, extension={extension}")
     
     # ========== 图片处理 ==========
-    compression_quality = await settings_service.get_compression_quality()
+    compression_quality = snapshot.compression_quality
     processed_content, width, height, final_extension = process_image(
         content, extension, quality=compression_quality
     )
@@ -167,8 +167,8 @@ async def upload_image(
     
     full_filename = f"{filename}.{final_extension}"
     
-    # ========== 生成日期路径 ==========
-    date_path = await get_date_path()
+    # ========== 生成存储目录（日期 / 哈希分散，见 STORAGE_LAYOUT） ==========
+    date_path = await get_storage_dir(full_filename)
     logger.info(f"[Upload] Date path: {date_path}")
     
     # ========== 保存到存储 ==========
@@ -182,7 +182,7 @@ async def upload_image(
         raise HTTPException(status_code=500, detail="图片保存失败")
     
     # ========== 确定初始状态 ==========
-    audit_enabled = await settings_service.is_audit_enabled()
+    audit_enabled = snapshot.audit_enabled
     initial_status = ImageStatus.PENDING if audit_enabled else ImageStatus.APPROVED
     
     # ========== 创建数据库记录 ==========
@@ -215,41 +215,12 @@ async def upload_image(
     await db.refresh(image)
     
     # ========== 后台异步审核 ==========
-    if audit_enabled:
-        audit_service = await get_audit_service()
-        if audit_service.enabled:
-            # 获取图片公网URL（腾讯云审核需要完整的公网URL）
-            # 如果是云存储，storage_url 已经是完整URL
-            # 如果是本地存储，需要拼接站点URL
-            if image.storage_url:
-                image_public_url = image.storage_url
-            else:
-                # Generic fallback using site_url + image.url
-                site_url = await settings_service.get_site_url()
-                site_url = site_url.rstrip('/') if site_url else ''
-                
-                if not site_url:
-                    logger.warning(f"[Upload] site_url not configured, skipping audit for image {image.id}")
-                    image_public_url = None
-                else:
-                    # image.url is the relative path (e.g. /uploads/... or /img/images/...)
-                    image_public_url = f"{site_url}{image.url}"
-            
-            # 添加后台任务 - 不阻塞响应（仅当有有效URL时）
-            if image_public_url:
-                background_tasks.add_task(
-                    run_audit_in_background,
-                    image.id,
-                    processed_content,
-                    audit_service,
-                    image_public_url  # 传递完整公网URL给审核服务
-                )
-                logger.info(f"Scheduled background audit for image {image.id}, url={image_public_url}")
-            else:
-                # 无法审核时，直接设置为 approved（避免图片永远处于 pending 状态）
-                image.status = ImageStatus.APPROVED
-                await db.commit()
-                logger.warning(f"[Upload] Image {image.id} auto-approved due to missing audit URL")
+    # 持久化审核队列只保存图片ID，审核时再从存储读取图片
+    # （腾讯云需要公网URL，未配置站点URL时审核会被跳过并自动通过）
+    if audit_enabled and image.status == ImageStatus.PENDING:
+        await enqueue_audit(db, image)
+        await db.commit()
+        logger.info(f"Queued audit for image {image.id}")
     
     # ========== 记录审计日志 ==========
     await create_audit_log(
@@ -283,13 +254,12 @@ async def upload_image(
     # Trigger AI Analysis in Background
     if image and image.id:
         # Check if Gemini is configured before setting status and adding task
-        gemini_keys = await settings_service.get_gemini_api_keys()
-        if gemini_keys:
+        if snapshot.gemini_api_keys:
             image.ai_analysis_status = "pending"
             await db.commit()
             
             # Define the background task wrapper
-            async def run_ai_analysis(img_id: int, file_path: str, db_session_maker):
+            async def run_ai_analysis(img_id: int, file_path: str, storage_type: str, mime_type: str, db_session_maker):
                 # Create a new session for the background task
                 async with db_session_maker() as session:
                     try:
@@ -302,8 +272,10 @@ async def upload_image(
                             db_img_update.ai_analysis_status = "processing"
                             await session.commit()
 
-                        full_path = os.path.join(config.upload_path, file_path)
-                        result = await gemini_service.analyze_image(full_path)
+                        from app.services.storage import get_storage_backend_for
+                        storage = await get_storage_backend_for(storage_type)
+                        image_data = await storage.read(file_path)
+                        result = await gemini_service.analyze_image(image_data=image_data, mime_type=mime_type)
                         
                         if "error" not in result:
                             # Update DB
@@ -331,10 +303,10 @@ async def upload_image(
                         logger.error(f"Background AI task error: {str(e)}")
 
             # Trigger AI analysis if enabled
-            if await settings_service.is_ai_analysis_enabled():
+            if snapshot.ai_analysis_enabled:
                 # We need a session maker to pass to the background task
                 from app.database import AsyncSessionLocal
-                background_tasks.add_task(run_ai_analysis, image.id, image.file_path, AsyncSessionLocal)
+                background_tasks.add_task(run_ai_analysis, image.id, image.file_path, image.storage_type, image.mime_type, AsyncSessionLocal)
 
     return ImageUploadResponse(
         success=True,
@@ -7,7 +7,8 @@ from app.models.image import Image
 from app.models.album import Album
 from app.schemas.user import UserResponse, UserUpdate
 from app.api.deps import get_current_user
-from app.utils.security import get_password_hash, verify_password
+from app.services.user_cache import invalidate_user
+from app.utils.security import get_password_hash_async, verify_password_async
 from pydantic import BaseModel
 
 router = APIRouter(prefix="/user", tags=["User"])
@@ -110,6 +111,7 @@ async def update_current_user(
         user.watermark_position = data.watermark_position
     
     await db.commit()
+    await invalidate_user(user.id)
     await db.refresh(user)
     
     return UserResponse.model_validate(user)
@@ -124,7 +126,7 @@ async def change_password(
     """Change current user's password."""
     import re
     
-    if not verify_password(data.current_password, user.hashed_password):
+    if not await verify_password_async(data.current_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="当前密码不正确"
@@ -153,13 +155,14 @@ async def change_password(
         )
     
     # 检查新密码不能与旧密码相同
-    if verify_password(data.new_password, user.hashed_password):
+    if await verify_password_async(data.new_password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="新密码不能与当前密码相同"
         )
     
-    user.hashed_password = get_password_hash(data.new_password)
+    user.hashed_password = await get_password_hash_async(data.new_password)
     await db.commit()
+    await invalidate_user(user.id)
     
     return {"message": "密码修改成功"}
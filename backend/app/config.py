@@ -17,12 +17,47 @@ class Settings(BaseSettings):
     # Redis (optional in development)
     redis_url: Optional[str] = None
     redis_enabled: bool = False
+    # Memory bound of the in-memory Redis fallback (bytes)
+    fake_redis_max_bytes: int = 64 * 1024 * 1024
+    # Settings cache refresh interval when Redis pub/sub is not available (seconds)
+    settings_cache_ttl: int = 60
+    # Cache-Control max-age of /api/site/settings (seconds); clients revalidate with the ETag
+    site_settings_max_age: int = 60
+    # In-memory ban index reload interval when Redis pub/sub is not available (seconds)
+    ban_index_ttl: int = 60
+    # Lifetime of a cached authenticated user per worker (seconds); changes also invalidate via Redis pub/sub
+    user_cache_ttl: int = 60
 
     # JWT
     jwt_secret_key: str = "dev-jwt-secret-change-in-production"
     jwt_access_token_expire_minutes: int = 30
     jwt_refresh_token_expire_days: int = 7
 
+    # Password hashing (bcrypt work factor; existing hashes are upgraded on login)
+    bcrypt_rounds: int = 12
+    # Dedicated hashing threads and how many more requests may wait before answering 429
+    password_hash_workers: int = 2
+    password_hash_max_queue: int = 32
+    # Pre-rendered captcha images kept per worker (0 = render on demand)
+    captcha_pool_size: int = 200
+
+    # Content moderation queue: audits running at once per worker, and seconds a
+    # claimed job stays invisible to other workers before it is retried
+    audit_worker_concurrency: int = 32
+    audit_visibility_timeout: int = 120
+    # Provider calls in flight per worker, and per-provider QPS caps, e.g. "aliyun=10,tencent=20"
+    audit_provider_concurrency: int = 8
+    audit_provider_qps: Optional[str] = None
+    # Images sent per provider request (1 = no batching; capped at 10), and seconds a
+    # partial batch waits for more images before it is sent
+    audit_batch_size: int = 10
+    audit_batch_wait: float = 0.5
+    # Reuse verdicts for identical (sha256) or near-identical (dHash within the
+    # given bits, at most 3) images; entries older than the TTL are re-audited
+    audit_cache_enabled: bool = True
+    audit_phash_max_distance: int = 3
+    audit_cache_ttl_days: int = 30
+
     # SMTP (DEPRECATED - now configured in database via admin panel)
     # These settings are kept for backward compatibility but are no longer used
     # Please configure email settings in Admin Panel -> System Settings -> Email Settings
@@ -48,6 +83,27 @@ class Settings(BaseSettings):
 
     # Storage
     storage_type: str = "local"  # local, s3c, oss, cos
+    # Directory layout for new uploads (local paths and cloud keys): date, hash, date_hash
+    storage_layout: str = "date"
+    # Bounded thread pool per cloud backend for blocking SDK calls
+    storage_io_max_workers: int = 16
+    storage_io_max_workers_per_backend: Optional[str] = None  # e.g. "s3c=32,oss=8,cos=8"
+    # Read-through local disk cache in front of cloud backends
+    storage_cache_enabled: bool = False
+    storage_cache_path: str = "./storage_cache"
+    storage_cache_max_size: int = 1073741824  # 1GB
+    # Write-through replication of the active backend, e.g. "local" or "local,oss"
+    storage_replicas: Optional[str] = None
+    storage_replica_write_timeout: float = 10.0  # seconds
+    # Circuit breaker + local spool for cloud backends that are down or slow
+    storage_spool_enabled: bool = False
+    storage_spool_path: str = "./storage_spool"
+    storage_spool_host: Optional[str] = None  # host id on spool records (default: hostname)
+    storage_breaker_failure_threshold: int = 5
+    storage_breaker_reset_timeout: float = 30.0  # seconds before a half-open probe
+    storage_breaker_call_timeout: float = 15.0  # seconds an upload waits for the bucket
+    # Browser-direct presigned uploads: lifetime of the presigned PUT URL
+    direct_upload_expires: int = 900  # seconds
 
     # S3 Compatible Storage (unified)
     s3c_access_key_id: Optional[str] = None
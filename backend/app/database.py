@@ -100,6 +100,14 @@ async def init_db():
                         # Column likely exists
                         pass
                 
+                # Auto-migration: host of spooled uploads on storage_replica_lag
+                try:
+                    await conn.execute(text("ALTER TABLE storage_replica_lag ADD COLUMN host VARCHAR(255)"))
+                    logger.info("Database migration: Added host to storage_replica_lag table")
+                except Exception:
+                    # Column likely exists
+                    pass
+                
                 # Cleanup: If any images are stuck in 'pending' from previous faulty migration, reset them
                 try:
                     await conn.execute(text("UPDATE images SET ai_analysis_status = NULL WHERE ai_analysis_status = 'pending' AND ai_tags IS NULL"))
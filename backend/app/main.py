@@ -14,9 +14,10 @@ from sqlalchemy.orm import selectinload
 from fastapi.responses import JSONResponse, FileResponse, RedirectResponse, StreamingResponse, Response
 from app.models.image import Image
 from app.models.file import File
-from app.api import auth, upload, images, albums, user, files, chunk # Added 'files' and 'chunk' here
+from app.api import auth, upload, images, albums, user, files, chunk, tus # Added 'files' and 'chunk' here
 from app.api.admin import router as admin_router
-from app.utils.rate_limit import get_real_ip, is_blacklisted
+from app.utils.request_context import is_blacklist_exempt, check_ip_blacklisted
+from app.utils.security import PasswordHashingBusy, shutdown_password_hashing
 
 # Import all models to ensure they are registered with SQLAlchemy
 from app.models import user as user_model
@@ -27,6 +28,10 @@ from app.models import audit_log as audit_log_model
 from app.models import backup as backup_model
 from app.models import payment as payment_model
 from app.models import activation_code as activation_code_model
+from app.models import storage_migration as storage_migration_model
+from app.models import storage_replica as storage_replica_model
+from app.models import audit_job as audit_job_model
+from app.models import audit_cache as audit_cache_model
 
 settings = get_settings()
 
@@ -46,6 +51,27 @@ async def lifespan(app: FastAPI):
     logger.info("Starting application...")
     await init_redis()
     await init_db()
+    # 监听其他 worker 的设置变更（需要 Redis）
+    from app.services.settings import start_settings_sync, stop_settings_sync
+    await start_settings_sync()
+    # 加载内存封禁索引，并监听其他 worker 的封禁变更
+    from app.services.ban_index import start_ban_sync, stop_ban_sync
+    await start_ban_sync()
+    # 违规记录批量写入
+    from app.services.violations import start_violation_writer, stop_violation_writer
+    await start_violation_writer()
+    # 已登录用户缓存跨 worker 失效
+    from app.services.user_cache import start_user_cache_sync, stop_user_cache_sync
+    await start_user_cache_sync()
+    # 预渲染验证码池
+    from app.utils.captcha import start_captcha_pool, stop_captcha_pool
+    await start_captcha_pool()
+    # 云存储磁盘缓存：在线程中扫描缓存目录，避免首次读取时阻塞事件循环
+    from app.services.storage.cache import init_storage_cache
+    await init_storage_cache()
+    # 内容审核队列（持久化，只保存图片ID）
+    from app.services.audit_queue import start_audit_worker, stop_audit_worker
+    await start_audit_worker()
     # Load IP header settings
     from app.utils.rate_limit import refresh_ip_header_settings
     try:
@@ -74,6 +100,18 @@ async def lifespan(app: FastAPI):
     except Exception as e:
         logger.warning(f"Error shutting down backup scheduler: {e}")
     
+    from app.services.storage.executor import shutdown_storage_executors
+    shutdown_storage_executors()
+    shutdown_password_hashing()
+    
+    await stop_audit_worker()
+    from app.services.moderation import close_http_client
+    await close_http_client()
+    await stop_captcha_pool()
+    await stop_user_cache_sync()
+    await stop_violation_writer()
+    await stop_ban_sync()
+    await stop_settings_sync()
     await close_redis()
     logger.info("Application shut down")
 
@@ -94,15 +132,16 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    # tus clients read these from cross-origin responses
+    expose_headers=["Location", "Upload-Offset", "Upload-Length", "Tus-Resumable", "Tus-Version", "Tus-Extension", "Tus-Max-Size", "Upload-Result-Url"],
 )
 
 
 # Security middleware
 @app.middleware("http")
 async def security_middleware(request: Request, call_next):
-    # Check IP blacklist
-    ip = get_real_ip(request)
-    if await is_blacklisted(ip):
+    # Check IP blacklist (静态资源、图片访问与健康检查不做黑名单查询)
+    if not is_blacklist_exempt(request.url.path) and await check_ip_blacklisted(request):
         return JSONResponse(
             status_code=status.HTTP_403_FORBIDDEN,
             content={"detail": "Your IP has been temporarily blocked"}
@@ -130,6 +169,16 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
     )
 
 
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, exc: PasswordHashingBusy):
+    # 密码哈希线程池已满，请客户端稍后重试
+    return JSONResponse(
+        status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+        content={"detail": "Server busy, please try again later"},
+        headers={"Retry-After": "1"},
+    )
+
+
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
     logger.error(f"Unhandled exception: {exc}", exc_info=True)
@@ -140,11 +189,13 @@ async def general_exception_handler(request: Request, exc: Exception):
 
 
 # Include routers
-from app.api import appeal, gallery, download, payments, activation, file_collections
+from app.api import appeal, gallery, download, payments, activation, file_collections, direct_upload
 app.include_router(auth.router, prefix="/api")
 app.include_router(upload.router, prefix="/api")
 app.include_router(files.router, prefix="/api")
 app.include_router(chunk.router, prefix="/api")
+app.include_router(tus.router, prefix="/api")  # tus 断点续传协议
+app.include_router(direct_upload.router, prefix="/api")  # 浏览器直传对象存储
 app.include_router(file_collections.router, prefix="/api")
 app.include_router(images.router, prefix="/api")
 app.include_router(albums.router, prefix="/api")
@@ -161,14 +212,57 @@ app.include_router(admin_router, prefix="/api")
 from sqlalchemy.orm import selectinload
 from datetime import datetime
 
+def _parse_range_header(range_header: str, size: int):
+    """
+    解析单段 Range 头 (bytes=start-end / bytes=start- / bytes=-suffix)
+    返回 (start, end) 闭区间；无/不支持的 Range 返回 None，不可满足时抛 416
+    """
+    if not range_header or not range_header.startswith("bytes=") or "," in range_header:
+        return None
+    start_str, _, end_str = range_header[6:].strip().partition("-")
+    try:
+        if start_str:
+            start = int(start_str)
+            end = min(int(end_str), size - 1) if end_str else size - 1
+        elif end_str:
+            start = max(0, size - int(end_str))
+            end = size - 1
+        else:
+            return None
+    except ValueError:
+        return None
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"},
+        )
+    return start, end
+
+
+async def _stream_from_storage(request: Request, storage, path: str, media_type: str, headers: dict):
+    """通过存储后端流式返回文件，支持 Range 请求 (内存占用与文件大小无关)"""
+    size = await storage.get_size(path)
+    byte_range = _parse_range_header(request.headers.get("range"), size)
+    headers = {**headers, "Accept-Ranges": "bytes"}
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(storage.open_read(path, byte_range), status_code=206, media_type=media_type, headers=headers)
+    headers["Content-Length"] = str(size)
+    return StreamingResponse(storage.open_read(path), media_type=media_type, headers=headers)
+
+
 @app.get("/uploads/{file_path:path}")
 @app.get("/img/{file_path:path}")
-async def serve_image(file_path: str):
+async def serve_image(file_path: str, request: Request):
     """
     动态图片/文件访问端点 - 检查文件状态后再返回
     被拒绝的图片返回替换图或 403
     """
     from app.services.settings import get_audit_violation_image
+    from app.services.storage import get_storage_backend_for
 
     # 安全检查：防止路径遍历攻击
     if '..' in file_path or file_path.startswith('/') or file_path.startswith('\\'):
@@ -215,26 +309,10 @@ async def serve_image(file_path: str):
                 if image.user and image.user.vip_expire_at and image.user.vip_expire_at > datetime.now() and image.user.watermark_enabled:
                     try:
                         from app.services.watermark import apply_watermark
-                        from fastapi.responses import Response
-                        import aiofiles
                         
                         # Apply watermark for cloud or local
-                        content = None
-                        if image.storage_type != "local":
-                            # Download from cloud
-                            import httpx
-                            from app.services.storage import get_storage_backend_async
-                            storage = await get_storage_backend_async()
-                            cloud_url = storage.get_url(image.file_path, is_internal=True)
-                            async with httpx.AsyncClient(verify=False, follow_redirects=True, timeout=15.0) as client:
-                                resp = await client.get(cloud_url)
-                                if resp.status_code == 200:
-                                    content = resp.content
-                        else:
-                            # Read from local
-                            if os.path.isfile(full_file_path):
-                                async with aiofiles.open(full_file_path, 'rb') as f:
-                                    content = await f.read()
+                        storage = await get_storage_backend_for(image.storage_type)
+                        content = await storage.read(image.file_path)
                         
                         if content:
                             watermarked_content = apply_watermark(content, image.user)
@@ -249,23 +327,14 @@ async def serve_image(file_path: str):
                 # Default serving (Cloud or Local)
                 if image.storage_type != "local":
                     try:
-                        import httpx
-                        from fastapi.responses import StreamingResponse
-                        from app.services.storage import get_storage_backend_async
-                        
-                        storage = await get_storage_backend_async()
-                        cloud_url = storage.get_url(image.file_path, is_internal=True)
-                        
-                        async def stream_cloud_image():
-                            async with httpx.AsyncClient(verify=False, follow_redirects=True, timeout=15.0) as client:
-                                try:
-                                    async with client.stream("GET", cloud_url) as resp:
-                                        if resp.status_code >= 400: return
-                                        async for chunk in resp.aiter_bytes(): yield chunk
-                                except Exception: return
-
-                        return StreamingResponse(stream_cloud_image(), media_type=image.mime_type, headers=headers)
-                    except Exception:
+                        storage = await get_storage_backend_for(image.storage_type)
+                        return await _stream_from_storage(request, storage, image.file_path, image.mime_type, headers)
+                    except HTTPException:
+                        raise
+                    except FileNotFoundError:
+                        raise HTTPException(status_code=404, detail="Image file not found")
+                    except Exception as e:
+                        logger.error(f"Failed to stream image {image.id} from {image.storage_type}: {e}")
                         if image.storage_url: return RedirectResponse(url=image.storage_url, status_code=302)
                         raise HTTPException(status_code=502, detail="Failed to fetch image")
 
@@ -282,18 +351,28 @@ async def serve_image(file_path: str):
         file_record = result.scalar_one_or_none()
         
         if file_record:
-            # Files also support storage_url (though currently mostly local)
-            # Add dynamic redirection here if needed later
-            if not os.path.isfile(full_file_path):
-                 raise HTTPException(status_code=404, detail="File not found")
-            
             media_type = file_record.mime_type
             if file_path == file_record.thumbnail_path:
                 media_type = "image/jpeg"
+            file_headers = {"Cache-Control": "public, max-age=31536000"}
+            
+            # Video/File stored on a cloud backend: stream through (range requests allow video seeking)
+            if file_record.storage_type and file_record.storage_type != "local" and not os.path.isfile(full_file_path):
+                try:
+                    storage = await get_storage_backend_for(file_record.storage_type)
+                    return await _stream_from_storage(request, storage, file_path, media_type, file_headers)
+                except HTTPException:
+                    raise
+                except FileNotFoundError:
+                    raise HTTPException(status_code=404, detail="File not found")
+                except Exception as e:
+                    logger.error(f"Failed to stream file {file_record.id} from {file_record.storage_type}: {e}")
+                    raise HTTPException(status_code=502, detail="Failed to fetch file")
             
-            return FileResponse(full_file_path, media_type=media_type, headers={
-                "Cache-Control": "public, max-age=31536000",
-            })
+            if not os.path.isfile(full_file_path):
+                 raise HTTPException(status_code=404, detail="File not found")
+            
+            return FileResponse(full_file_path, media_type=media_type, headers=file_headers)
 
         # 3. If neither, deny access
         raise HTTPException(status_code=404, detail="Resource not found")
@@ -305,12 +384,31 @@ async def health_check():
     return {"status": "ok"}
 
 
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses weak comparison (a proxy may have compressed the body into a W/ tag)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
 # Public site settings (no auth required)
+# 每个设置版本只序列化一次；带强 ETag，客户端/CDN 重新验证时返回 304
 @app.get("/api/site/settings")
-async def get_public_site_settings():
+async def get_public_site_settings(request: Request):
     """Get public site settings for frontend."""
-    from app.services.settings import get_public_settings
-    return await get_public_settings()
+    from app.services.settings import get_public_settings_payload
+    body, etag = await get_public_settings_payload()
+    cache_control = f"public, max-age={settings.site_settings_max_age}, must-revalidate"
+    headers = {
+        "ETag": etag,
+        "Cache-Control": cache_control,
+        "CDN-Cache-Control": cache_control,
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
 
 
 # Root redirect
@@ -0,0 +1,34 @@
+"""
+Moderation verdicts remembered by image content.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, BigInteger
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class AuditResultCache(Base):
+    """
+    Provider verdict for an image, looked up by exact content hash or by perceptual
+    hash (services/audit_cache.py).
+    The 64-bit perceptual hash is also stored as four indexed 16-bit bands: two hashes
+    within Hamming distance 3 always share at least one band, so near neighbours are
+    found with indexed equality lookups and then compared exactly.
+    """
+    __tablename__ = "audit_result_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    content_hash = Column(String(64), unique=True, index=True, nullable=False, comment="sha256 of the image bytes")
+    # dHash as a signed 64-bit integer; NULL for animated / flat images
+    phash = Column(BigInteger, nullable=True)
+    phash_band_0 = Column(Integer, nullable=True, index=True)
+    phash_band_1 = Column(Integer, nullable=True, index=True)
+    phash_band_2 = Column(Integer, nullable=True, index=True)
+    phash_band_3 = Column(Integer, nullable=True, index=True)
+    suggestion = Column(String(10), nullable=False, comment="pass / block / review")
+    audit_result = Column(String(2000), nullable=True)
+    hits = Column(Integer, default=0, nullable=False)
+    last_hit_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now(), index=True)
+
+    def __repr__(self):
+        return f"<AuditResultCache({self.content_hash[:12]} {self.suggestion}, hits={self.hits})>"
@@ -0,0 +1,31 @@
+"""
+Durable content moderation queue.
+"""
+from sqlalchemy import Column, Integer, String, DateTime
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class AuditJob(Base):
+    """
+    A pending image waiting for content moderation (services/audit_queue.py).
+    Only the image id is queued: workers read the bytes from storage when they run the job.
+    A claimed job is invisible to other workers until locked_until; a worker that dies
+    mid-job therefore only delays it.
+    """
+    __tablename__ = "audit_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    image_id = Column(Integer, unique=True, index=True, nullable=False)
+    # Public URL of the image (providers that fetch by URL, e.g. Tencent CI)
+    image_url = Column(String(1000), nullable=True)
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String(500), nullable=True)
+    next_attempt_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    locked_until = Column(DateTime, nullable=True)
+    locked_by = Column(String(64), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<AuditJob(image_id={self.image_id}, attempts={self.attempts})>"
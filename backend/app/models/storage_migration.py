@@ -0,0 +1,84 @@
+"""
+Storage migration models: copy objects between storage backends with resumable checkpoints.
+"""
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, BigInteger, Enum as SQLEnum, Boolean
+from sqlalchemy.orm import relationship
+from sqlalchemy.sql import func
+from app.database import Base
+import enum
+
+
+class MigrationStatus(str, enum.Enum):
+    """Status of a storage migration job."""
+    PENDING = "pending"
+    RUNNING = "running"
+    PAUSED = "paused"
+    COMPLETED = "completed"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+
+class StorageMigrationJob(Base):
+    """
+    Storage migration job.
+    The last_image_id / last_file_id cursors are the checkpoint: everything up to them
+    has been copied and its row updated, so a restarted job resumes right after them.
+    """
+    __tablename__ = "storage_migration_jobs"
+
+    id = Column(Integer, primary_key=True, index=True)
+    source_type = Column(String(20), nullable=False, comment="源存储类型")
+    target_type = Column(String(20), nullable=False, comment="目标存储类型")
+    status = Column(
+        SQLEnum(MigrationStatus, values_callable=lambda x: [e.value for e in x]),
+        default=MigrationStatus.PENDING,
+        nullable=False
+    )
+
+    # Options
+    concurrency = Column(Integer, default=4, comment="并发传输数")
+    max_bandwidth = Column(Integer, nullable=True, comment="最大带宽(KB/s)，NULL为不限制")
+    verify_checksum = Column(Boolean, default=True, nullable=False, comment="回读校验SHA256")
+    include_files = Column(Boolean, default=True, nullable=False, comment="同时迁移文件/视频")
+
+    # Checkpoint
+    last_image_id = Column(Integer, default=0, nullable=False)
+    last_file_id = Column(Integer, default=0, nullable=False)
+
+    # Progress
+    total_objects = Column(Integer, default=0)
+    migrated_objects = Column(Integer, default=0)
+    failed_objects = Column(Integer, default=0)
+    bytes_transferred = Column(BigInteger, default=0)
+
+    error_message = Column(Text, nullable=True)
+    triggered_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True, comment="Admin user ID")
+
+    # Timing
+    started_at = Column(DateTime, nullable=True)
+    completed_at = Column(DateTime, nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    failures = relationship("StorageMigrationFailure", back_populates="job", cascade="all, delete-orphan")
+
+    def __repr__(self):
+        return f"<StorageMigrationJob(id={self.id}, {self.source_type}->{self.target_type}, status={self.status})>"
+
+
+class StorageMigrationFailure(Base):
+    """Object that could not be migrated (kept on the source; retried by the next job)."""
+    __tablename__ = "storage_migration_failures"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_id = Column(Integer, ForeignKey("storage_migration_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    record_type = Column(String(10), nullable=False, comment="image / file")
+    record_id = Column(Integer, nullable=False)
+    file_path = Column(String(500), nullable=False)
+    error_message = Column(String(500), nullable=True)
+    created_at = Column(DateTime, server_default=func.now())
+
+    job = relationship("StorageMigrationJob", back_populates="failures")
+
+    def __repr__(self):
+        return f"<StorageMigrationFailure(job_id={self.job_id}, {self.record_type}:{self.record_id})>"
@@ -0,0 +1,34 @@
+"""
+Replica lag tracking for write-through storage replication.
+"""
+from sqlalchemy import Column, Integer, String, DateTime, UniqueConstraint
+from sqlalchemy.sql import func
+from app.database import Base
+
+
+class StorageReplicaLag(Base):
+    """
+    A copy that is behind: the write (or delete) on `storage_type` failed or timed out
+    and is retried by the background reconciler until it succeeds.
+    Operation "spool" marks an upload held in the local spool while the cloud
+    backend's circuit breaker was open (drained by services/storage/spool.py on the
+    host that spooled it).
+    """
+    __tablename__ = "storage_replica_lag"
+    __table_args__ = (
+        UniqueConstraint("storage_type", "file_path", name="uq_replica_lag_type_path"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    storage_type = Column(String(20), nullable=False, comment="落后的存储类型")
+    file_path = Column(String(500), nullable=False)
+    operation = Column(String(10), nullable=False, comment="save / delete / spool")
+    host = Column(String(255), nullable=True, comment="暂存文件所在主机（仅 spool）")
+    attempts = Column(Integer, default=0, nullable=False)
+    last_error = Column(String(500), nullable=True)
+    next_attempt_at = Column(DateTime, server_default=func.now(), nullable=False, index=True)
+    created_at = Column(DateTime, server_default=func.now())
+    updated_at = Column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f"<StorageReplicaLag({self.operation} {self.storage_type}:{self.file_path}, attempts={self.attempts})>"
@@ -1,6 +1,9 @@
-from typing import Optional
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
 from app.config import get_settings
+import heapq
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -9,145 +12,214 @@ redis_client = None
 
 
 class FakeRedis:
-    """A simple in-memory fake Redis for development without Redis server."""
-    
-    # 最大存储条目数，防止内存泄漏
-    MAX_ENTRIES = 10000
-    # 清理阈值
-    CLEANUP_THRESHOLD = 8000
-    
-    def __init__(self):
-        self._data = {}
-        self._expiry = {}
-        self._access_order = []  # LRU tracking
-    
-    def _check_expiry(self, key: str) -> bool:
-        """Check if key has expired. Returns True if key is valid."""
-        import time
-        if key in self._expiry:
-            if time.time() > self._expiry[key]:
-                # Key has expired, remove it
-                self._data.pop(key, None)
-                self._expiry.pop(key, None)
-                if key in self._access_order:
-                    self._access_order.remove(key)
-                return False
+    """
+    In-memory stand-in for Redis when no server is configured (single process only).
+
+    - LRU order in an OrderedDict: every command is O(1)
+    - TTLs in a min-heap with lazy deletion; expired keys are dropped when touched and
+      a few are reaped from the heap top on every write
+    - bounded by FAKE_REDIS_MAX_BYTES (approximate key + value bytes), evicting the
+      least recently used keys
+    - eval/register_script run Python equivalents registered with register_lua()
+    """
+
+    # Approximate per-key bookkeeping cost (dict slot, heap entry, string headers)
+    ENTRY_OVERHEAD = 96
+    # Expired heap entries reaped per write
+    REAP_BATCH = 32
+
+    # Lua source -> async fn(redis, keys, args), shared by all instances
+    _lua_handlers: Dict[str, Callable[..., Awaitable[Any]]] = {}
+
+    def __init__(self, max_bytes: Optional[int] = None):
+        self.max_bytes = max_bytes if max_bytes is not None else settings.fake_redis_max_bytes
+        self._data: "OrderedDict[str, str]" = OrderedDict()
+        self._expiry: Dict[str, float] = {}
+        self._heap: List[Tuple[float, str]] = []
+        self._bytes = 0
+
+    # ---------- internals ----------
+
+    @staticmethod
+    def _size(key: str, value) -> int:
+        return len(key) + len(value) + FakeRedis.ENTRY_OVERHEAD
+
+    def _alive(self, key: str) -> bool:
+        """Whether key exists, dropping it if it has expired."""
+        deadline = self._expiry.get(key)
+        if deadline is not None and deadline <= time.time():
+            self._remove(key)
+            return False
         return key in self._data
-    
-    def _cleanup_expired(self):
-        """Clean up all expired keys."""
-        import time
-        current_time = time.time()
-        expired_keys = [k for k, v in self._expiry.items() if current_time > v]
-        for key in expired_keys:
-            self._data.pop(key, None)
+
+    def _remove(self, key: str) -> bool:
+        value = self._data.pop(key, None)
+        self._expiry.pop(key, None)
+        if value is None:
+            return False
+        self._bytes -= self._size(key, value)
+        return True
+
+    def _set_expiry(self, key: str, seconds: float):
+        deadline = time.time() + seconds
+        self._expiry[key] = deadline
+        heapq.heappush(self._heap, (deadline, key))
+        if len(self._heap) > 2 * len(self._expiry) + 1024:
+            # Mostly superseded entries: rebuild
+            self._heap = [(d, k) for k, d in self._expiry.items()]
+            heapq.heapify(self._heap)
+
+    def _reap(self):
+        now = time.time()
+        heap = self._heap
+        for _ in range(self.REAP_BATCH):
+            if not heap or heap[0][0] > now:
+                return
+            deadline, key = heapq.heappop(heap)
+            if self._expiry.get(key) == deadline:
+                self._remove(key)
+
+    def _store(self, key: str, value, keep_ttl: bool = False):
+        if not isinstance(value, (str, bytes)):
+            value = str(value)
+        self._reap()
+        old = self._data.get(key)
+        if old is not None:
+            self._bytes -= self._size(key, old)
+        self._data[key] = value
+        self._data.move_to_end(key)
+        self._bytes += self._size(key, value)
+        if not keep_ttl:
             self._expiry.pop(key, None)
-            if key in self._access_order:
-                self._access_order.remove(key)
-    
-    def _enforce_max_entries(self):
-        """Enforce maximum entries limit using LRU eviction."""
-        if len(self._data) > self.CLEANUP_THRESHOLD:
-            # First, clean up expired entries
-            self._cleanup_expired()
-            
-            # If still over limit, evict oldest entries
-            while len(self._data) > self.CLEANUP_THRESHOLD and self._access_order:
-                oldest_key = self._access_order.pop(0)
-                self._data.pop(oldest_key, None)
-                self._expiry.pop(oldest_key, None)
-    
-    def _touch(self, key: str):
-        """Update access order for LRU."""
-        if key in self._access_order:
-            self._access_order.remove(key)
-        self._access_order.append(key)
-    
+        while self._bytes > self.max_bytes and len(self._data) > 1:
+            oldest = next(iter(self._data))
+            self._remove(oldest)
+
+    # ---------- commands ----------
+
     async def get(self, key: str) -> Optional[str]:
-        self._check_expiry(key)
-        if key in self._data:
-            self._touch(key)
-            return self._data.get(key)
-        return None
-    
-    async def set(self, key: str, value: str, ex: int = None):
-        import time
-        self._enforce_max_entries()
-        self._data[key] = value
-        self._touch(key)
+        if not self._alive(key):
+            return None
+        self._data.move_to_end(key)
+        return self._data[key]
+
+    async def set(self, key: str, value, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False):
+        if nx and self._alive(key):
+            return None
+        self._store(key, value)
         if ex:
-            self._expiry[key] = time.time() + ex
+            self._set_expiry(key, ex)
+        elif px:
+            self._set_expiry(key, px / 1000)
         return True
-    
-    async def setex(self, key: str, seconds: int, value: str):
-        import time
-        self._enforce_max_entries()
-        self._data[key] = value
-        self._touch(key)
-        self._expiry[key] = time.time() + seconds
+
+    async def setex(self, key: str, seconds: int, value):
+        self._store(key, value)
+        self._set_expiry(key, seconds)
         return True
-    
-    async def incr(self, key: str):
-        self._check_expiry(key)
-        self._enforce_max_entries()
-        val = int(self._data.get(key, 0)) + 1
-        self._data[key] = str(val)
-        self._touch(key)
-        return val
-    
-    async def expire(self, key: str, seconds: int):
-        import time
-        if key in self._data:
-            self._expiry[key] = time.time() + seconds
+
+    async def incrby(self, key: str, amount: int = 1) -> int:
+        current = self._data[key] if self._alive(key) else 0
+        value = int(current) + amount
+        # INCR keeps the key's TTL
+        self._store(key, str(value), keep_ttl=True)
+        return value
+
+    async def incr(self, key: str) -> int:
+        return await self.incrby(key, 1)
+
+    async def expire(self, key: str, seconds: int) -> bool:
+        if not self._alive(key):
+            return False
+        self._set_expiry(key, seconds)
         return True
-    
-    async def delete(self, key: str):
-        self._data.pop(key, None)
-        self._expiry.pop(key, None)
-        if key in self._access_order:
-            self._access_order.remove(key)
-        return 1
-    
-    async def exists(self, key: str):
-        self._check_expiry(key)
-        return 1 if key in self._data else 0
-    
-    def pipeline(self):
+
+    async def ttl(self, key: str) -> int:
+        if not self._alive(key):
+            return -2
+        deadline = self._expiry.get(key)
+        return -1 if deadline is None else max(0, round(deadline - time.time()))
+
+    async def delete(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._remove(key))
+
+    async def exists(self, *keys: str) -> int:
+        return sum(1 for key in keys if self._alive(key))
+
+    async def dbsize(self) -> int:
+        return len(self._data)
+
+    # ---------- scripting ----------
+
+    @classmethod
+    def register_lua(cls, source: str, handler: Callable[..., Awaitable[Any]]):
+        """Provide the in-process equivalent of a Lua script: handler(redis, keys, args)."""
+        cls._lua_handlers[source] = handler
+
+    async def eval(self, script: str, numkeys: int, *keys_and_args):
+        handler = self._lua_handlers.get(script)
+        if handler is None:
+            raise NotImplementedError("FakeRedis cannot run Lua; register an equivalent with FakeRedis.register_lua()")
+        keys, args = list(keys_and_args[:numkeys]), list(keys_and_args[numkeys:])
+        # Handlers must not await anything that suspends, so the script stays atomic
+        return await handler(self, keys, args)
+
+    def register_script(self, script: str):
+        async def run(keys=(), args=()):
+            return await self.eval(script, len(keys), *keys, *args)
+        return run
+
+    def pipeline(self, transaction: bool = True):
         return FakePipeline(self)
-    
+
     async def close(self):
         pass
 
 
 class FakePipeline:
-    def __init__(self, redis_instance):
+    """Queues commands and runs them back to back (nothing can interleave)."""
+
+    def __init__(self, redis_instance: FakeRedis):
         self._redis = redis_instance
         self._commands = []
-    
-    def incr(self, key: str):
-        self._commands.append(('incr', key))
+
+    def _queue(self, name: str, *args, **kwargs):
+        self._commands.append((name, args, kwargs))
         return self
-    
+
+    def get(self, key: str):
+        return self._queue("get", key)
+
+    def set(self, key: str, value, ex: Optional[int] = None, px: Optional[int] = None, nx: bool = False):
+        return self._queue("set", key, value, ex=ex, px=px, nx=nx)
+
+    def setex(self, key: str, seconds: int, value):
+        return self._queue("setex", key, seconds, value)
+
+    def incr(self, key: str):
+        return self._queue("incr", key)
+
+    def incrby(self, key: str, amount: int = 1):
+        return self._queue("incrby", key, amount)
+
     def expire(self, key: str, seconds: int):
-        self._commands.append(('expire', key, seconds))
-        return self
-    
+        return self._queue("expire", key, seconds)
+
+    def delete(self, *keys: str):
+        return self._queue("delete", *keys)
+
+    def exists(self, *keys: str):
+        return self._queue("exists", *keys)
+
     async def execute(self):
-        import time
-        results = []
-        self._redis._enforce_max_entries()
-        for cmd in self._commands:
-            if cmd[0] == 'incr':
-                self._redis._check_expiry(cmd[1])
-                val = int(self._redis._data.get(cmd[1], 0)) + 1
-                self._redis._data[cmd[1]] = str(val)
-                self._redis._touch(cmd[1])
-                results.append(val)
-            elif cmd[0] == 'expire':
-                if cmd[1] in self._redis._data:
-                    self._redis._expiry[cmd[1]] = time.time() + cmd[2]
-                results.append(True)
-        return results
+        commands, self._commands = self._commands, []
+        return [await getattr(self._redis, name)(*args, **kwargs) for name, args, kwargs in commands]
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        self._commands = []
 
 
 async def init_redis():
@@ -181,3 +253,10 @@ async def close_redis():
 
 def get_redis():
     return redis_client
+
+
+def get_shared_redis():
+    """The real Redis client shared by all workers, or None when running on the in-memory fallback."""
+    if redis_client is None or isinstance(redis_client, FakeRedis):
+        return None
+    return redis_client
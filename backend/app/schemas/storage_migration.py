@@ -0,0 +1,69 @@
+"""
+Pydantic schemas for storage migration API.
+"""
+from pydantic import BaseModel, Field
+from typing import Optional, List
+from datetime import datetime
+
+
+STORAGE_TYPES = ("local", "s3c", "oss", "cos")
+
+
+class StorageMigrationCreate(BaseModel):
+    """Schema for starting a storage migration."""
+    source_type: str = Field(..., description="Source storage type (local, s3c, oss, cos)")
+    target_type: str = Field(..., description="Target storage type (local, s3c, oss, cos)")
+    concurrency: int = Field(default=4, ge=1, le=64, description="Concurrent transfers")
+    max_bandwidth: Optional[int] = Field(default=None, ge=1, description="Max bandwidth in KB/s, None for unlimited")
+    verify_checksum: bool = Field(default=True, description="Read back and compare SHA256 after upload")
+    include_files: bool = Field(default=True, description="Also migrate files/videos, not just images")
+
+
+class StorageMigrationFailureResponse(BaseModel):
+    """Schema for a failed object."""
+    record_type: str
+    record_id: int
+    file_path: str
+    error_message: Optional[str]
+    created_at: Optional[datetime]
+
+    class Config:
+        from_attributes = True
+
+
+class StorageMigrationJobResponse(BaseModel):
+    """Schema for storage migration job response."""
+    id: int
+    source_type: str
+    target_type: str
+    status: str
+    concurrency: int
+    max_bandwidth: Optional[int]
+    verify_checksum: bool
+    include_files: bool
+    last_image_id: int
+    last_file_id: int
+    total_objects: int
+    migrated_objects: int
+    failed_objects: int
+    bytes_transferred: int
+    error_message: Optional[str]
+    triggered_by: Optional[int]
+    started_at: Optional[datetime]
+    completed_at: Optional[datetime]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    # Live throughput, only while running in this process
+    bytes_per_second: Optional[float] = None
+    objects_per_second: Optional[float] = None
+    eta_seconds: Optional[int] = None
+    recent_failures: List[StorageMigrationFailureResponse] = []
+
+    class Config:
+        from_attributes = True
+
+
+class StorageMigrationJobListResponse(BaseModel):
+    """Schema for list of storage migration jobs."""
+    jobs: List[StorageMigrationJobResponse]
+    total: int
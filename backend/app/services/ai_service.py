@@ -53,32 +53,28 @@ class GeminiService:
         genai.configure(api_key=api_key)
         return True
 
-    async def analyze_image(self, image_path: str) -> Dict[str, Any]:
+    async def analyze_image(self, image_path: str = None, image_data: bytes = None, mime_type: str = "image/jpeg") -> Dict[str, Any]:
         """
         Analyzes an image using Gemini Vision to generate tags and a description.
+        Pass either a local `image_path` or the raw `image_data` (e.g. read from cloud storage).
         Returns a dict with 'tags' (list) and 'description' (str).
         """
         if not await self._configure_genai():
              return {"error": "AI not configured"}
 
         try:
-             # Load image data
-             # Check if it's a local path or needs downloading
-             # For now assume local file path from upload
-             if not image_path:
+             if not image_path and not image_data:
                  return {"error": "Invalid image path"}
              
-             # Upload file to Gemini (File API) or use inline data if small enough
-             # For simplicity and speed with flash model, we'll use inline data for now if supported by SDK,
-             # else we use the File API. 
              # Ref: https://ai.google.dev/gemini-api/docs/vision
-             
-             # Note: Python SDK often supports passing PIL Image or path directly to generate_content
-             
              model = genai.GenerativeModel(self.model_name)
              
-             # Uploading the file is safer for larger images
-             uploaded_file = genai.upload_file(image_path)
+             if image_data is not None:
+                 # Inline data: no local file needed, works for any storage backend
+                 image_part = {"mime_type": mime_type, "data": image_data}
+             else:
+                 # Uploading the file is safer for larger images
+                 image_part = genai.upload_file(image_path)
              
              prompt = """
              Analyze this image. 
@@ -89,7 +85,7 @@ class GeminiService:
              """
              
              # Retry logic could be added here for 429 errors
-             response = await model.generate_content_async([prompt, uploaded_file], generation_config={"response_mime_type": "application/json"})
+             response = await model.generate_content_async([prompt, image_part], generation_config={"response_mime_type": "application/json"})
              
              # Clean up
              # try:
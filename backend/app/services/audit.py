@@ -8,34 +8,40 @@ Image Audit Service - Async Background Processing
 
 设计原则：
 1. 不阻塞用户上传 - 图片先保存为 pending 状态
-2. 后台异步审核 - 使用 BackgroundTasks
+2. 后台异步审核 - 持久化任务队列（services/audit_queue.py），只保存图片ID
+   同时待审核的图片合并为小批次（按数量或等待时间提交），一次请求审核多张图片
 3. 审核完成后更新状态 - approved 或 rejected
 4. 任何异常都不应该影响主进程
 5. API错误时图片保持pending状态，不误封
 """
-import io
 import logging
 import json
 import asyncio
-import base64
 import hashlib
 import hmac
 import time
 import urllib.parse
-from datetime import datetime, timezone
-from typing import Tuple
-from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeoutError
+from typing import Dict, List, Optional, Tuple
 import httpx
 
+from app.config import get_settings
+from app.services.moderation import ProviderError, aliyun_rpc, get_http_client, get_limiter
+
 logger = logging.getLogger(__name__)
 
-# 全局线程池，限制并发数，避免资源耗尽
-_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="audit_")
+# 阿里云内容安全（图片审核）
+ALIYUN_REGION = "cn-shanghai"
+ALIYUN_ENDPOINT = "imageaudit.cn-shanghai.aliyuncs.com"
+ALIYUN_AUTH_ENDPOINT = "openplatform.aliyuncs.com"
+ALIYUN_SCENES = ("porn", "terrorism")
+
+# 每次请求最多审核的图片数（保守取值，实际批次大小由 AUDIT_BATCH_SIZE 控制）
+PROVIDER_BATCH_LIMITS = {"aliyun": 10, "tencent": 10}
 
 # 审核超时时间（秒）
 AUDIT_TIMEOUT = 30
 
-# 重试配置
+# 重试配置（由审核队列调度）
 MAX_RETRY_ATTEMPTS = 3  # 最大重试次数
 INITIAL_DELAY = 2  # 首次审核前的初始延迟（秒）
 RETRY_DELAYS = [3, 5, 10]  # 每次重试前的延迟（秒），指数退避
@@ -63,9 +69,23 @@ class ImageAuditService:
         self.tencent_bucket = tencent_bucket  # 格式: bucket-appid
         self.tencent_region = tencent_region  # 如: ap-guangzhou
     
-    def audit_image_sync(self, image_bytes: bytes, image_url: str = None) -> Tuple[bool, str, dict]:
+    @property
+    def needs_image_bytes(self) -> bool:
+        """阿里云上传图片内容审核；腾讯云通过公网URL拉取，不需要读取图片"""
+        return self.provider == "aliyun"
+    
+    @property
+    def batch_key(self) -> tuple:
+        """配置相同的审核请求才能合并到一个批次"""
+        return (self.provider, self.api_key, self.api_secret, self.tencent_bucket, self.tencent_region)
+    
+    @property
+    def batch_limit(self) -> int:
+        return max(1, min(get_settings().audit_batch_size, PROVIDER_BATCH_LIMITS.get(self.provider, 1)))
+    
+    async def audit_image_async(self, image_bytes: Optional[bytes], image_url: str = None) -> Tuple[bool, str, dict]:
         """
-        同步审核图片 - 在线程池中执行
+        异步审核图片（共享连接池，按服务商限制并发和QPS）
         Returns: (is_safe, suggestion, details_dict)
         
         is_safe=True: 图片安全，可以通过
@@ -73,10 +93,13 @@ class ImageAuditService:
         suggestion: pass/block/review/error/skip
         
         Args:
-            image_bytes: 图片二进制数据
+            image_bytes: 图片二进制数据（阿里云审核时使用）
             image_url: 图片公网URL（腾讯云审核时使用）
         """
-        # 前置检查 - 快速返回
+        return (await self.audit_batch_async([(image_bytes, image_url)]))[0]
+    
+    def _precheck(self, image_bytes: Optional[bytes], image_url: Optional[str]) -> Optional[Tuple[bool, str, dict]]:
+        """前置检查，不需要调用服务商时直接返回结果"""
         if not self.enabled:
             return True, "skip", {"status": "audit_disabled"}
         
@@ -86,76 +109,139 @@ class ImageAuditService:
         if not self.api_key or not self.api_secret:
             return True, "skip", {"status": "no_credentials"}
         
-        if not image_bytes or len(image_bytes) == 0:
+        if self.needs_image_bytes and not image_bytes:
             return True, "skip", {"status": "empty_image"}
         
+        if self.provider == "tencent":
+            if not self.tencent_bucket or not self.tencent_region:
+                logger.warning("Tencent COS bucket or region not configured")
+                return True, "skip", {"status": "tencent_config_missing"}
+            # 使用公网URL审核，不需要先上传到 COS
+            if not image_url:
+                logger.warning("Tencent audit requires image_url for detect-url mode")
+                return True, "skip", {"status": "no_image_url"}
+        return None
+    
+    async def audit_batch_async(self, items: List[Tuple[Optional[bytes], Optional[str]]]) -> List[Tuple[bool, str, dict]]:
+        """
+        一次请求审核多张图片，结果与 items 顺序一一对应
+        
+        Args:
+            items: [(image_bytes, image_url), ...]
+        """
+        results: List[Optional[Tuple[bool, str, dict]]] = [self._precheck(b, u) for b, u in items]
+        pending = [i for i, r in enumerate(results) if r is None]
+        if not pending:
+            return results
+        
         try:
             if self.provider == "aliyun":
-                return self._call_aliyun_api(image_bytes)
-            elif self.provider == "tencent":
-                return self._call_tencent_api(image_bytes, image_url)
+                batch = await self._call_aliyun_api_batch([items[i][0] for i in pending])
+            elif len(pending) == 1:
+                batch = [await self._call_tencent_api(items[pending[0]][1])]
             else:
-                return True, "skip", {"status": "unsupported_provider"}
+                batch = await self._call_tencent_api_batch([items[i][1] for i in pending])
+        except ProviderError as e:
+            logger.error(f"Audit API error: {e}")
+            # API错误时，返回安全+error，让图片保持pending
+            batch = [(True, "error", {
+                "status": "api_error",
+                "code": e.code,
+                "http_code": e.http_code,
+                "message": str(e)[:500],
+                "retryable": e.retryable
+            })] * len(pending)
+        except (httpx.TimeoutException, httpx.TransportError) as e:
+            logger.error(f"Audit API connection error: {e}")
+            batch = [(True, "error", {"status": "connection_error", "message": str(e)[:500], "retryable": True})] * len(pending)
         except Exception as e:
             error_msg = str(e)
             logger.error(f"Audit API error: {error_msg}")
-            # API错误时，返回安全+error，让图片保持pending
-            return True, "error", {"status": "api_error", "message": error_msg[:500]}
+            batch = [(True, "error", {"status": "api_error", "message": error_msg[:500]})] * len(pending)
+        
+        for i, result in zip(pending, batch):
+            # 同一个错误结果会分给多张图片，各自复制一份 details
+            results[i] = (result[0], result[1], dict(result[2]))
+        return results
     
-    def _call_aliyun_api(self, image_bytes: bytes) -> Tuple[bool, str, dict]:
-        """调用阿里云内容审核 API"""
-        # 动态导入，避免启动时报错
-        try:
-            from alibabacloud_imageaudit20191230.client import Client
-            from alibabacloud_imageaudit20191230.models import (
-                ScanImageAdvanceRequest,
-                ScanImageAdvanceRequestTask,
-            )
-            from alibabacloud_tea_openapi.models import Config
-            from alibabacloud_tea_util.models import RuntimeOptions
-        except ImportError as e:
-            logger.warning(f"Aliyun SDK not installed: {e}")
-            return True, "skip", {"status": "sdk_not_installed"}
-        
-        config = Config(
-            access_key_id=self.api_key,
-            access_key_secret=self.api_secret,
-            endpoint='imageaudit.cn-shanghai.aliyuncs.com',
-            region_id='cn-shanghai'
+    async def _upload_to_aliyun_oss(self, image_bytes: bytes) -> str:
+        """AuthorizeFileUpload 获取临时凭证，表单上传图片到阿里云提供的上海 OSS，返回图片地址"""
+        auth = await aliyun_rpc(
+            ALIYUN_AUTH_ENDPOINT, "2019-12-19", "AuthorizeFileUpload",
+            {"Product": "imageaudit", "RegionId": ALIYUN_REGION},
+            self.api_key, self.api_secret
         )
-        
-        client = Client(config)
-        
-        runtime = RuntimeOptions()
-        runtime.connect_timeout = 10000   # 10秒连接超时
-        runtime.read_timeout = 20000      # 20秒读取超时
-        runtime.autoretry = False         # 禁用自动重试，避免长时间阻塞
-        
-        task = ScanImageAdvanceRequestTask()
-        task.image_urlobject = io.BytesIO(image_bytes)
-        
-        request = ScanImageAdvanceRequest(
-            task=[task], 
-            scene=['porn', 'terrorism']
+        host = f"{auth['Bucket']}.{auth['Endpoint']}"
+        upload = await get_http_client().post(
+            f"https://{host}",
+            data={
+                "key": auth["ObjectKey"],
+                "OSSAccessKeyId": auth["AccessKeyId"],
+                "policy": auth["EncodedPolicy"],
+                "Signature": auth["Signature"],
+                "success_action_status": "201",
+            },
+            files={"file": ("image", image_bytes)},
         )
+        if upload.status_code != 201:
+            raise ProviderError(
+                f"Image upload to audit OSS failed: {upload.text[:300]}",
+                http_code=upload.status_code,
+                retryable=upload.status_code >= 500
+            )
+        return f"http://{host}/{auth['ObjectKey']}"
+    
+    async def _call_aliyun_api_batch(self, images: List[bytes]) -> List[Tuple[bool, str, dict]]:
+        """
+        调用阿里云内容审核 API（与 SDK 的 ScanImageAdvance 流程相同）
+        1. 每张图片 AuthorizeFileUpload + 表单上传到阿里云提供的上海 OSS（并发）
+        2. 一次 ScanImage 请求审核所有上传成功的图片（Task.N，DataId 为批次内序号）
+        """
+        results: List[Optional[Tuple[bool, str, dict]]] = [None] * len(images)
+        async with get_limiter("aliyun").call():
+            uploads = await asyncio.gather(
+                *(self._upload_to_aliyun_oss(image_bytes) for image_bytes in images),
+                return_exceptions=True
+            )
+            params = {}
+            task_count = 0
+            for i, upload in enumerate(uploads):
+                if isinstance(upload, BaseException):
+                    if len(images) == 1:
+                        raise upload
+                    # 单张上传失败只影响这张图片
+                    retryable = not isinstance(upload, ProviderError) or upload.retryable
+                    results[i] = (True, "error", {"status": "upload_error", "message": str(upload)[:500], "retryable": retryable})
+                    continue
+                task_count += 1
+                params[f"Task.{task_count}.DataId"] = str(i)
+                params[f"Task.{task_count}.ImageURL"] = upload
+            if not task_count:
+                return results
+            
+            for i, scene in enumerate(ALIYUN_SCENES, start=1):
+                params[f"Scene.{i}"] = scene
+            result = await aliyun_rpc(
+                ALIYUN_ENDPOINT, "2019-12-30", "ScanImage", params,
+                self.api_key, self.api_secret
+            )
         
-        response = client.scan_image_advance(request, runtime)
-        
-        if not response or not response.body:
-            logger.warning("Empty response from audit API")
-            return True, "error", {"status": "empty_response"}
-        
-        result = response.body.to_map() if hasattr(response.body, 'to_map') else {}
-        
-        # 解析结果
-        data = result.get('Data', {})
-        task_results = data.get('Results', [])
-        
-        if not task_results:
+        by_data_id = {
+            str(task.get('DataId')): task
+            for task in result.get('Data', {}).get('Results', [])
+        }
+        for i in range(len(images)):
+            if results[i] is None:
+                results[i] = self._parse_aliyun_result(by_data_id.get(str(i)))
+        return results
+    
+    def _parse_aliyun_result(self, task_result: Optional[dict]) -> Tuple[bool, str, dict]:
+        """解析阿里云单个任务（Data.Results[]）的审核结果"""
+        if not task_result:
             logger.warning("No audit results returned")
-            return True, "error", {"status": "no_results"}
+            return True, "error", {"status": "no_results", "retryable": True}
         
-        sub_results = task_results[0].get('SubResults', [])
+        sub_results = task_result.get('SubResults', [])
         
         overall_suggestion = 'pass'
         flagged_scenes = []
@@ -189,7 +275,7 @@ class ImageAuditService:
             'flagged_scenes': flagged_scenes
         }
     
-    def _call_tencent_api(self, image_bytes: bytes, image_url: str = None) -> Tuple[bool, str, dict]:
+    async def _call_tencent_api(self, image_url: str = None) -> Tuple[bool, str, dict]:
         """
         调用腾讯云数据万象图片审核 API
         
@@ -197,78 +283,120 @@ class ImageAuditService:
         文档: https://cloud.tencent.com/document/product/460/72995
         
         Args:
-            image_bytes: 图片二进制数据（用于计算签名时的备用）
-            image_url: 图片公网URL（推荐使用，避免上传图片到COS）
+            image_url: 图片公网URL（避免上传图片到COS）
         """
-        if not self.tencent_bucket or not self.tencent_region:
-            logger.warning("Tencent COS bucket or region not configured")
-            return True, "skip", {"status": "tencent_config_missing"}
+        # 构建请求（bucket/region/image_url 已在 _precheck 中检查）
+        host = f"{self.tencent_bucket}.cos.{self.tencent_region}.myqcloud.com"
+        
+        # 使用 detect-url 审核任意公网图片
+        # 请求路径使用一个虚拟的 ObjectKey
+        path = "/"
+        query_params = {
+            "ci-process": "sensitive-content-recognition",
+            "detect-url": image_url,
+        }
         
-        # 使用 detect-url 参数审核公网图片
-        # 这样不需要先上传到 COS
-        if not image_url:
-            logger.warning("Tencent audit requires image_url for detect-url mode")
-            return True, "skip", {"status": "no_image_url"}
+        # 生成签名
+        authorization = self._generate_tencent_signature(
+            method="GET",
+            host=host,
+            path=path,
+            query_params=query_params
+        )
         
-        try:
-            # 构建请求
-            host = f"{self.tencent_bucket}.cos.{self.tencent_region}.myqcloud.com"
-            
-            # 使用 detect-url 审核任意公网图片
-            # 请求路径使用一个虚拟的 ObjectKey
-            path = "/"
-            query_params = {
-                "ci-process": "sensitive-content-recognition",
-                "detect-url": image_url,
-            }
-            
-            # 生成签名
-            authorization = self._generate_tencent_signature(
-                method="GET",
-                host=host,
-                path=path,
-                query_params=query_params
-            )
+        # 构建完整URL
+        query_string = urllib.parse.urlencode(query_params)
+        url = f"https://{host}{path}?{query_string}"
+        
+        headers = {
+            "Host": host,
+            "Authorization": authorization,
+        }
+        
+        # 发送请求（共享连接池）
+        async with get_limiter("tencent").call():
+            response = await get_http_client().get(url, headers=headers)
+        
+        if response.status_code != 200:
+            error_text = response.text[:500]
+            logger.error(f"Tencent audit API error: {response.status_code} - {error_text}")
             
-            # 构建完整URL
-            query_string = urllib.parse.urlencode(query_params)
-            url = f"https://{host}{path}?{query_string}"
+            # 检查是否是 NoSuchKey 错误（可重试）
+            is_retryable = "NoSuchKey" in error_text or "AccessDenied" in error_text or response.status_code >= 500
             
-            headers = {
-                "Host": host,
-                "Authorization": authorization,
+            return True, "error", {
+                "status": "api_error",
+                "http_code": response.status_code,
+                "message": error_text,
+                "retryable": is_retryable  # 标记是否可重试
             }
-            
-            # 发送请求
-            with httpx.Client(timeout=20.0) as client:
-                response = client.get(url, headers=headers)
-            
-            if response.status_code != 200:
-                error_text = response.text[:500]
-                logger.error(f"Tencent audit API error: {response.status_code} - {error_text}")
-                
-                # 检查是否是 NoSuchKey 错误（可重试）
-                is_retryable = "NoSuchKey" in error_text or "AccessDenied" in error_text
-                
-                return True, "error", {
+        
+        # 解析 XML 响应
+        return self._parse_tencent_response(response.text)
+    
+    async def _call_tencent_api_batch(self, image_urls: List[str]) -> List[Tuple[bool, str, dict]]:
+        """
+        调用腾讯云数据万象图片批量审核 API（同步返回每张图片的结果）
+        文档: https://cloud.tencent.com/document/product/460/37318
+        """
+        from xml.sax.saxutils import escape
+        import xml.etree.ElementTree as ET
+        
+        host = f"{self.tencent_bucket}.ci.{self.tencent_region}.myqcloud.com"
+        path = "/image/auditing"
+        inputs = "".join(
+            f"<Input><Url>{escape(url)}</Url><DataId>{i}</DataId></Input>"
+            for i, url in enumerate(image_urls)
+        )
+        body = f"<Request>{inputs}<Conf></Conf></Request>"
+        
+        authorization = self._generate_tencent_signature(
+            method="POST",
+            host=host,
+            path=path,
+            query_params={}
+        )
+        headers = {
+            "Host": host,
+            "Authorization": authorization,
+            "Content-Type": "application/xml",
+        }
+        
+        async with get_limiter("tencent").call():
+            response = await get_http_client().post(f"https://{host}{path}", content=body.encode("utf-8"), headers=headers)
+        
+        if response.status_code != 200:
+            error_text = response.text[:500]
+            logger.error(f"Tencent batch audit API error: {response.status_code} - {error_text}")
+            raise ProviderError(
+                f"Tencent batch audit failed: {error_text}",
+                http_code=response.status_code,
+                retryable=response.status_code >= 500 or response.status_code == 429
+            )
+        
+        try:
+            root = ET.fromstring(response.text)
+        except ET.ParseError as e:
+            logger.error(f"Failed to parse Tencent response XML: {e}")
+            return [(True, "error", {"status": "xml_parse_error", "message": str(e)})] * len(image_urls)
+        
+        jobs = {job.findtext('DataId', ''): job for job in root.findall('JobsDetail')}
+        results = []
+        for i in range(len(image_urls)):
+            job = jobs.get(str(i))
+            if job is None:
+                results.append((True, "error", {"status": "no_results", "retryable": True}))
+            elif job.findtext('Code') or job.findtext('State', 'Success') != 'Success':
+                # 单张图片失败（如图片暂时无法下载），可重试
+                results.append((True, "error", {
                     "status": "api_error",
-                    "http_code": response.status_code,
-                    "message": error_text,
-                    "retryable": is_retryable  # 标记是否可重试
-                }
-            
-            # 解析 XML 响应
-            return self._parse_tencent_response(response.text)
-            
-        except httpx.TimeoutException as e:
-            logger.error(f"Tencent audit timeout: {e}")
-            return True, "error", {"status": "timeout", "message": str(e), "retryable": True}
-        except httpx.ConnectError as e:
-            logger.error(f"Tencent audit connection error: {e}")
-            return True, "error", {"status": "connection_error", "message": str(e), "retryable": True}
-        except Exception as e:
-            logger.error(f"Tencent audit exception: {e}")
-            return True, "error", {"status": "exception", "message": str(e)[:500], "retryable": False}
+                    "code": job.findtext('Code', ''),
+                    "message": job.findtext('Message', '')[:500],
+                    "retryable": True
+                }))
+            else:
+                results.append(self._parse_tencent_element(job))
+        return results
     
     def _generate_tencent_signature(
         self, 
@@ -363,7 +491,15 @@ class ImageAuditService:
         
         try:
             root = ET.fromstring(xml_text)
-            
+        except ET.ParseError as e:
+            logger.error(f"Failed to parse Tencent response XML: {e}")
+            logger.debug(f"XML content: {xml_text[:1000]}")
+            return True, "error", {"status": "xml_parse_error", "message": str(e)}
+        return self._parse_tencent_element(root)
+    
+    def _parse_tencent_element(self, root) -> Tuple[bool, str, dict]:
+        """解析单张图片的审核结果（单次审核的 RecognitionResult 或批量审核的 JobsDetail）"""
+        try:
             # 获取整体结果
             result_code = int(root.findtext('Result', '0'))
             label = root.findtext('Label', 'Normal')
@@ -412,107 +548,116 @@ class ImageAuditService:
                 'flagged_scenes': flagged_scenes
             }
             
-        except ET.ParseError as e:
-            logger.error(f"Failed to parse Tencent response XML: {e}")
-            logger.debug(f"XML content: {xml_text[:1000]}")
+        except ValueError as e:
+            logger.error(f"Unexpected Tencent audit result: {e}")
             return True, "error", {"status": "xml_parse_error", "message": str(e)}
 
 
-async def run_audit_in_background(
-    image_id: int,
-    image_bytes: bytes,
+class _Batch:
+    """等待提交的一批审核请求"""
+    
+    def __init__(self, audit_service: 'ImageAuditService'):
+        self.audit_service = audit_service
+        self.items: List[Tuple[Optional[bytes], Optional[str]]] = []
+        self.futures: List[asyncio.Future] = []
+
+
+# 按审核配置（batch_key）分组的待提交批次
+_open_batches: Dict[tuple, _Batch] = {}
+# 正在提交的批次任务（保持引用，避免被回收）
+_flush_tasks: set = set()
+_batch_stats = {"batches": 0, "images": 0, "full": 0}
+
+
+def _start_flush(key: tuple, batch: _Batch, full: bool):
+    if _open_batches.get(key) is not batch:
+        # 已经提交过
+        return
+    del _open_batches[key]
+    _batch_stats["batches"] += 1
+    _batch_stats["images"] += len(batch.items)
+    if full:
+        _batch_stats["full"] += 1
+    task = asyncio.create_task(_flush_batch(batch))
+    _flush_tasks.add(task)
+    task.add_done_callback(_flush_tasks.discard)
+
+
+async def _flush_batch(batch: _Batch):
+    try:
+        results = await batch.audit_service.audit_batch_async(batch.items)
+    except Exception as e:
+        logger.error(f"[Audit] Batch of {len(batch.items)} failed: {e}")
+        results = [(True, "error", {"status": "exception", "message": str(e)[:500], "retryable": True})
+                   for _ in batch.items]
+    for future, result in zip(batch.futures, results):
+        # 调用方可能已超时放弃
+        if not future.done():
+            future.set_result(result)
+
+
+async def _flush_after_deadline(key: tuple, batch: _Batch):
+    await asyncio.sleep(max(0.0, get_settings().audit_batch_wait))
+    _start_flush(key, batch, full=False)
+
+
+async def _audit_batched(
+    audit_service: 'ImageAuditService',
+    image_bytes: Optional[bytes],
+    image_url: Optional[str]
+) -> Tuple[bool, str, dict]:
+    """
+    加入当前批次并等待这张图片的结果
+    批次达到 batch_limit 张或第一张加入后等待 AUDIT_BATCH_WAIT 秒时提交
+    """
+    key = audit_service.batch_key
+    batch = _open_batches.get(key)
+    if batch is None:
+        batch = _open_batches[key] = _Batch(audit_service)
+        task = asyncio.create_task(_flush_after_deadline(key, batch))
+        _flush_tasks.add(task)
+        task.add_done_callback(_flush_tasks.discard)
+    future = asyncio.get_running_loop().create_future()
+    batch.items.append((image_bytes, image_url))
+    batch.futures.append(future)
+    if len(batch.items) >= audit_service.batch_limit:
+        _start_flush(key, batch, full=True)
+    return await future
+
+
+def get_audit_batch_stats() -> dict:
+    """批量提交统计（管理后台诊断用）"""
+    batches = _batch_stats["batches"]
+    return {
+        **_batch_stats,
+        "avg_size": round(_batch_stats["images"] / batches, 2) if batches else 0,
+        "open": sum(len(batch.items) for batch in _open_batches.values()),
+    }
+
+
+async def audit_image(
     audit_service: 'ImageAuditService',
+    image_bytes: Optional[bytes],
     image_url: str = None
-):
+) -> Tuple[bool, str, dict]:
     """
-    后台异步执行审核任务（带重试机制）
-    
-    关键设计：
-    1. 所有异常都被捕获，不会影响主进程
-    2. 使用超时控制，避免长时间阻塞
-    3. API错误时保持pending状态，不误封
-    4. 数据库操作独立，失败不影响其他
-    5. 对于可重试的错误（如 NoSuchKey），自动重试最多 MAX_RETRY_ATTEMPTS 次
-    
-    Args:
-        image_id: 图片ID
-        image_bytes: 图片二进制数据
-        audit_service: 审核服务实例
-        image_url: 图片公网URL（腾讯云审核需要）
+    执行一次审核（带超时），由审核队列调用
+    同时审核的图片合并为批次提交（AUDIT_BATCH_SIZE > 1 时）
+    超时返回可重试的 error 结果
     """
-    logger.info(f"[Audit] Starting for image {image_id}, url={image_url}")
-    
-    # 初始延迟：等待文件完全写入磁盘并可通过公网访问
-    # 这对于本地存储+Nginx代理的场景尤为重要
-    await asyncio.sleep(INITIAL_DELAY)
-    
-    is_safe = True
-    suggestion = "error"
-    details = {"status": "unknown_error"}
-    
-    # 重试循环
-    for attempt in range(MAX_RETRY_ATTEMPTS):
-        try:
-            # 使用 asyncio.to_thread (Python 3.9+) 或 run_in_executor
-            loop = asyncio.get_running_loop()
-            
-            # 带超时的线程池执行
-            future = loop.run_in_executor(
-                _executor,
-                lambda: audit_service.audit_image_sync(image_bytes, image_url)
-            )
-            
-            # 设置超时
-            is_safe, suggestion, details = await asyncio.wait_for(
-                future, 
-                timeout=AUDIT_TIMEOUT
-            )
-            
-            logger.info(f"[Audit] Image {image_id} attempt {attempt + 1}: safe={is_safe}, suggestion={suggestion}")
-            
-            # 检查是否需要重试
-            if suggestion == "error" and details.get("retryable", False):
-                if attempt < MAX_RETRY_ATTEMPTS - 1:
-                    retry_delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                    logger.warning(f"[Audit] Image {image_id}: Retryable error, waiting {retry_delay}s before retry {attempt + 2}/{MAX_RETRY_ATTEMPTS}")
-                    await asyncio.sleep(retry_delay)
-                    continue
-                else:
-                    logger.error(f"[Audit] Image {image_id}: Max retries ({MAX_RETRY_ATTEMPTS}) reached, giving up")
-            
-            # 成功或不可重试的错误，跳出循环
-            break
-            
-        except asyncio.TimeoutError:
-            logger.error(f"[Audit] Image {image_id} attempt {attempt + 1}: TIMEOUT after {AUDIT_TIMEOUT}s")
-            is_safe = True
-            suggestion = "error"
-            details = {"status": "timeout", "message": f"Audit timeout after {AUDIT_TIMEOUT}s", "retryable": True}
-            
-            # 超时也可以重试
-            if attempt < MAX_RETRY_ATTEMPTS - 1:
-                retry_delay = RETRY_DELAYS[min(attempt, len(RETRY_DELAYS) - 1)]
-                logger.warning(f"[Audit] Image {image_id}: Timeout, waiting {retry_delay}s before retry {attempt + 2}/{MAX_RETRY_ATTEMPTS}")
-                await asyncio.sleep(retry_delay)
-                continue
-            
-        except Exception as e:
-            logger.error(f"[Audit] Image {image_id} attempt {attempt + 1}: Exception - {e}")
-            is_safe = True
-            suggestion = "error"
-            details = {"status": "exception", "message": str(e)[:500], "retryable": False}
-            break  # 未知异常不重试
+    # 不需要调用服务商（未启用/未配置等）时直接返回，不进入批次
+    skipped = audit_service._precheck(image_bytes, image_url)
+    if skipped is not None:
+        return skipped
     
-    # 记录最终重试次数
-    details["attempts"] = attempt + 1
-    
-    # 更新数据库（独立try块）
+    if audit_service.batch_limit > 1:
+        call = _audit_batched(audit_service, image_bytes, image_url)
+    else:
+        call = audit_service.audit_image_async(image_bytes, image_url)
     try:
-        await _update_image_status(image_id, is_safe, suggestion, details)
-    except Exception as e:
-        logger.error(f"[Audit] Image {image_id}: DB update failed - {e}")
-    
-    logger.info(f"[Audit] Image {image_id}: Complete after {attempt + 1} attempt(s)")
+        return await asyncio.wait_for(call, timeout=AUDIT_TIMEOUT)
+    except asyncio.TimeoutError:
+        return True, "error", {"status": "timeout", "message": f"Audit timeout after {AUDIT_TIMEOUT}s", "retryable": True}
 
 
 async def _update_image_status(
@@ -0,0 +1,213 @@
+"""
+Moderation Result Cache
+
+The same images (memes, screenshots, re-uploads) come back again and again. The
+audit queue fingerprints each image before calling the provider:
+
+- exact match: sha256 of the stored bytes
+- near match: 64-bit difference hash (dHash), within AUDIT_PHASH_MAX_DISTANCE bits
+  (at most 3: the banded index only guarantees finding neighbours that close)
+
+A hit reuses the earlier verdict: known-safe images are approved and known-bad
+content rejected instantly, without a paid provider call. Only real verdicts
+(pass / block / review) are stored; entries older than AUDIT_CACHE_TTL_DAYS are
+ignored and purged daily. When an admin overrides a decision, the image's entry
+and the entry its verdict was reused from are dropped, so duplicates go back to the
+provider.
+"""
+import hashlib
+import io
+import json
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional, Tuple
+
+from sqlalchemy import delete, or_, select
+from sqlalchemy.exc import IntegrityError
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.audit_cache import AuditResultCache
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+PHASH_BANDS = 4
+BAND_BITS = 16
+# Distance the banded index can guarantee (pigeonhole: bands - 1)
+MAX_INDEXED_DISTANCE = PHASH_BANDS - 1
+CACHEABLE_SUGGESTIONS = ("pass", "block", "review")
+
+_MASK_64 = (1 << 64) - 1
+
+
+@dataclass(frozen=True)
+class ImageFingerprint:
+    content_hash: str
+    # Unsigned 64-bit dHash, None when not meaningful
+    phash: Optional[int]
+
+
+def _dhash(image_bytes: bytes) -> Optional[int]:
+    from PIL import Image as PILImage
+    with PILImage.open(io.BytesIO(image_bytes)) as img:
+        if getattr(img, "n_frames", 1) > 1:
+            # Later frames may differ completely from the first
+            return None
+        img.draft("L", (64, 64))
+        pixels = img.convert("L").resize((9, 8), PILImage.LANCZOS).tobytes()
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            value = (value << 1) | (pixels[row * 9 + col] > pixels[row * 9 + col + 1])
+    if value in (0, _MASK_64):
+        # Flat images all hash alike
+        return None
+    return value
+
+
+def fingerprint_image(image_bytes: bytes) -> ImageFingerprint:
+    """Content and perceptual hash of an image (CPU bound: run it in a thread)."""
+    try:
+        phash = _dhash(image_bytes)
+    except Exception:
+        phash = None
+    return ImageFingerprint(hashlib.sha256(image_bytes).hexdigest(), phash)
+
+
+def _bands(phash: int) -> Tuple[int, ...]:
+    return tuple((phash >> (BAND_BITS * i)) & ((1 << BAND_BITS) - 1) for i in range(PHASH_BANDS))
+
+
+def _to_signed(value: int) -> int:
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def verdict_from_suggestion(suggestion: str, auto_reject: bool) -> bool:
+    """is_safe for a cached suggestion under the current auto-reject setting."""
+    if suggestion == "review":
+        return not auto_reject
+    return suggestion == "pass"
+
+
+async def lookup_audit_result(fingerprint: ImageFingerprint) -> Optional[Tuple[str, dict]]:
+    """(suggestion, details) of a cached verdict for the image, or None."""
+    if not settings.audit_cache_enabled:
+        return None
+    cutoff = datetime.utcnow() - timedelta(days=settings.audit_cache_ttl_days)
+    max_distance = min(settings.audit_phash_max_distance, MAX_INDEXED_DISTANCE)
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(AuditResultCache).where(
+                AuditResultCache.content_hash == fingerprint.content_hash,
+                AuditResultCache.created_at >= cutoff,
+            )
+        )
+        match = result.scalar_one_or_none()
+        distance = 0
+
+        if match is None and fingerprint.phash is not None and max_distance > 0:
+            bands = _bands(fingerprint.phash)
+            # Every row sharing a band is checked (no LIMIT, which could hide a match);
+            # only the columns needed to rank are loaded
+            result = await db.execute(
+                select(AuditResultCache.id, AuditResultCache.phash, AuditResultCache.suggestion)
+                .where(
+                    or_(*(getattr(AuditResultCache, f"phash_band_{i}") == band for i, band in enumerate(bands))),
+                    AuditResultCache.created_at >= cutoff,
+                )
+            )
+            best = None
+            for entry_id, phash, suggestion in result.all():
+                d = bin((phash & _MASK_64) ^ fingerprint.phash).count("1")
+                if d > max_distance:
+                    continue
+                # A blocked neighbour wins over a closer safe one
+                rank = (suggestion == "block", -d)
+                if best is None or rank > best[0]:
+                    best = (rank, entry_id, d)
+            if best is not None:
+                match, distance = await db.get(AuditResultCache, best[1]), best[2]
+
+        if match is None:
+            return None
+        match.hits += 1
+        match.last_hit_at = datetime.utcnow()
+        await db.commit()
+
+    details = json.loads(match.audit_result) if match.audit_result else {}
+    exact = match.content_hash == fingerprint.content_hash
+    details["cache"] = {
+        "match": "exact" if exact else "similar",
+        "distance": distance,
+        # The entry the verdict came from, dropped by forget_audit_results on override
+        "content_hash": match.content_hash,
+    }
+    return match.suggestion, details
+
+
+async def store_audit_result(fingerprint: ImageFingerprint, suggestion: str, details: dict):
+    """Remember a provider verdict. Never raises."""
+    if not settings.audit_cache_enabled or suggestion not in CACHEABLE_SUGGESTIONS:
+        return
+    payload = json.dumps({k: v for k, v in details.items() if k not in ("attempts", "cache")}, ensure_ascii=False)[:2000]
+    values = {
+        "suggestion": suggestion,
+        "audit_result": payload,
+        "phash": None,
+        **{f"phash_band_{i}": None for i in range(PHASH_BANDS)},
+        "created_at": datetime.utcnow(),
+    }
+    if fingerprint.phash is not None:
+        values["phash"] = _to_signed(fingerprint.phash)
+        values.update({f"phash_band_{i}": band for i, band in enumerate(_bands(fingerprint.phash))})
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(AuditResultCache).where(AuditResultCache.content_hash == fingerprint.content_hash)
+            )
+            entry = result.scalar_one_or_none()
+            if entry is None:
+                entry = AuditResultCache(content_hash=fingerprint.content_hash, hits=0)
+                db.add(entry)
+            for key, value in values.items():
+                setattr(entry, key, value)
+            await db.commit()
+    except IntegrityError:
+        # Stored concurrently by another worker
+        pass
+    except Exception as e:
+        logger.error(f"[Audit] Failed to cache verdict for {fingerprint.content_hash[:12]}: {e}")
+
+
+async def forget_audit_results(images: Iterable):
+    """
+    Drop the cached verdicts of images whose status an admin overrode: the image's
+    own entry and, for a cache hit, the entry its verdict came from.
+    """
+    hashes = set()
+    for image in images:
+        try:
+            details = json.loads(image.audit_result or "{}")
+            hashes.add(details.get("content_hash"))
+            hashes.add((details.get("cache") or {}).get("content_hash"))
+        except (ValueError, AttributeError):
+            continue
+    hashes.discard(None)
+    if not hashes:
+        return
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(AuditResultCache).where(AuditResultCache.content_hash.in_(hashes)))
+        await db.commit()
+
+
+async def purge_audit_cache():
+    """Delete expired verdicts (scheduled daily)."""
+    cutoff = datetime.utcnow() - timedelta(days=settings.audit_cache_ttl_days)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(delete(AuditResultCache).where(AuditResultCache.created_at < cutoff))
+        await db.commit()
+    if result.rowcount:
+        logger.info(f"[Audit] Purged {result.rowcount} expired cached verdicts")
@@ -0,0 +1,294 @@
+"""
+Durable Content Moderation Queue
+
+Uploads that need moderation add an audit_jobs row holding only the image id (and
+its public URL) in the upload transaction. Worker tasks (one loop per process,
+AUDIT_WORKER_CONCURRENCY jobs at a time) claim due jobs, read the image from
+storage when the provider or the verdict cache (services/audit_cache.py) needs the
+bytes, run the audit and update the image. Provider calls of concurrent jobs are
+merged into micro-batches (services/audit.py, AUDIT_BATCH_SIZE / AUDIT_BATCH_WAIT),
+each image's result still goes through _update_image_status on its own.
+
+- claiming sets locked_until (AUDIT_VISIBILITY_TIMEOUT) with a conditional UPDATE,
+  so each job runs once even with several workers; a job whose worker died becomes
+  visible again when the lock expires; finishing or rescheduling a job only applies
+  while the claim (locked_by + locked_until) is still the worker's own
+- retryable failures (provider timeouts, storage read errors, ...) are rescheduled
+  with the RETRY_DELAYS backoff, up to MAX_RETRY_ATTEMPTS
+- requeue_stale_audits() (scheduled every 5 minutes, in every worker) re-enqueues
+  images left pending without a job, e.g. uploads queued before a crash in older
+  versions; rows another worker enqueued first are skipped
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Optional
+
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.audit_job import AuditJob
+from app.models.image import Image, ImageStatus
+from app.services.audit import (
+    INITIAL_DELAY,
+    MAX_RETRY_ATTEMPTS,
+    RETRY_DELAYS,
+    ImageAuditService,
+    _update_image_status,
+    audit_image,
+    get_audit_service,
+)
+from app.services.audit_cache import (
+    fingerprint_image,
+    lookup_audit_result,
+    store_audit_result,
+    verdict_from_suggestion,
+)
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Seconds between polls while the queue is idle
+POLL_INTERVAL = 2.0
+# Pending images without a job older than this are re-enqueued by the sweeper
+STALE_AFTER = timedelta(minutes=10)
+SWEEP_BATCH_SIZE = 500
+
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_worker_task: Optional[asyncio.Task] = None
+
+
+async def get_audit_image_url(image: Image) -> Optional[str]:
+    """Public URL of the image for providers that fetch by URL (None without a site URL)."""
+    if image.storage_url:
+        return image.storage_url
+    from app.services.settings import get_settings_snapshot
+    site_url = (await get_settings_snapshot()).site_url.rstrip('/')
+    # image.url is the relative path (e.g. /uploads/... or /img/images/...)
+    return f"{site_url}{image.url}" if site_url else None
+
+
+async def enqueue_audit(db, image: Image):
+    """Queue moderation of a committed image; the caller commits the session."""
+    db.add(AuditJob(
+        image_id=image.id,
+        image_url=await get_audit_image_url(image),
+        # Give the file time to become reachable at its public URL
+        next_attempt_at=datetime.utcnow() + timedelta(seconds=INITIAL_DELAY),
+    ))
+
+
+async def _claim_jobs(limit: int) -> List[AuditJob]:
+    now = datetime.utcnow()
+    visible = or_(AuditJob.locked_until.is_(None), AuditJob.locked_until < now)
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(AuditJob.id)
+            .where(AuditJob.next_attempt_at <= now, visible)
+            .order_by(AuditJob.next_attempt_at)
+            .limit(limit)
+        )
+        claimed = []
+        locked_until = now + timedelta(seconds=settings.audit_visibility_timeout)
+        for job_id in result.scalars().all():
+            # Another worker may have claimed it since the SELECT
+            claim = await db.execute(
+                update(AuditJob)
+                .where(AuditJob.id == job_id, visible)
+                .values(locked_until=locked_until, locked_by=_worker_id)
+            )
+            if claim.rowcount:
+                claimed.append(job_id)
+        await db.commit()
+        if not claimed:
+            return []
+        result = await db.execute(select(AuditJob).where(AuditJob.id.in_(claimed)))
+        return list(result.scalars().all())
+
+
+def _owned(job: AuditJob):
+    """Our claim is still current (the lock may have expired and the job been re-claimed)."""
+    return (
+        (AuditJob.id == job.id)
+        & (AuditJob.locked_by == job.locked_by)
+        & (AuditJob.locked_until == job.locked_until)
+    )
+
+
+async def _finish_job(job: AuditJob):
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(AuditJob).where(_owned(job)))
+        await db.commit()
+
+
+async def _retry_job(job: AuditJob, error: str):
+    delay = RETRY_DELAYS[min(job.attempts, len(RETRY_DELAYS) - 1)]
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            update(AuditJob)
+            .where(_owned(job))
+            .values(
+                attempts=job.attempts + 1,
+                last_error=error[:500],
+                next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                locked_until=None,
+                locked_by=None,
+            )
+        )
+        await db.commit()
+    if not result.rowcount:
+        logger.info(f"[Audit] Image {job.image_id}: job re-claimed by another worker, not rescheduled")
+        return
+    logger.warning(f"[Audit] Image {job.image_id}: retry {job.attempts + 2}/{MAX_RETRY_ATTEMPTS} in {delay}s ({error[:200]})")
+
+
+async def _run_job(job: AuditJob, audit_service: ImageAuditService):
+    attempt = job.attempts + 1
+    try:
+        async with AsyncSessionLocal() as db:
+            image = await db.get(Image, job.image_id)
+        if image is None or image.status != ImageStatus.PENDING:
+            # Deleted or already decided (e.g. by an admin)
+            await _finish_job(job)
+            return
+
+        image_bytes = None
+        use_cache = audit_service.enabled and settings.audit_cache_enabled
+        if audit_service.enabled and (audit_service.needs_image_bytes or use_cache):
+            from app.services.storage import get_storage_backend_for
+            storage = await get_storage_backend_for(image.storage_type or "local")
+            try:
+                image_bytes = await storage.read(image.file_path or image.full_filename)
+            except Exception as e:
+                if audit_service.needs_image_bytes:
+                    raise
+                # URL based providers can still audit it, just without the cache
+                logger.warning(f"[Audit] Image {job.image_id}: read for cache failed - {e}")
+
+        fingerprint = None
+        cached = None
+        if use_cache and image_bytes:
+            fingerprint = await asyncio.to_thread(fingerprint_image, image_bytes)
+            cached = await lookup_audit_result(fingerprint)
+
+        if cached:
+            suggestion, details = cached
+            is_safe = verdict_from_suggestion(suggestion, audit_service.auto_reject)
+        else:
+            is_safe, suggestion, details = await audit_image(audit_service, image_bytes, job.image_url)
+            if fingerprint:
+                await store_audit_result(fingerprint, suggestion, details)
+        if fingerprint:
+            # Lets an admin override drop the cached verdict (forget_audit_results)
+            details["content_hash"] = fingerprint.content_hash
+    except Exception as e:
+        is_safe, suggestion, details = True, "error", {"status": "exception", "message": str(e)[:500], "retryable": True}
+
+    logger.info(f"[Audit] Image {job.image_id} attempt {attempt}: safe={is_safe}, suggestion={suggestion}")
+    if suggestion == "error" and details.get("retryable") and attempt < MAX_RETRY_ATTEMPTS:
+        await _retry_job(job, details.get("message") or details.get("status", "error"))
+        return
+
+    details["attempts"] = attempt
+    try:
+        await _update_image_status(job.image_id, is_safe, suggestion, details)
+    except Exception as e:
+        logger.error(f"[Audit] Image {job.image_id}: DB update failed - {e}")
+        # The lock expires and another attempt picks it up
+        return
+    await _finish_job(job)
+
+
+async def _worker_loop():
+    running: set = set()
+    while True:
+        try:
+            free = max(1, settings.audit_worker_concurrency) - len(running)
+            jobs = await _claim_jobs(free) if free > 0 else []
+            if jobs:
+                audit_service = await get_audit_service()
+                for job in jobs:
+                    task = asyncio.create_task(_run_job(job, audit_service))
+                    running.add(task)
+                    task.add_done_callback(running.discard)
+                continue
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"[Audit] Queue worker error: {e}")
+
+        if running:
+            # Claim more as soon as a slot frees up
+            await asyncio.wait(running, timeout=POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+        else:
+            await asyncio.sleep(POLL_INTERVAL)
+
+
+async def requeue_stale_audits():
+    """Re-enqueue pending images that have no job (scheduled every 5 minutes)."""
+    cutoff = datetime.utcnow() - STALE_AFTER
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(Image)
+            .outerjoin(AuditJob, AuditJob.image_id == Image.id)
+            .where(
+                Image.status == ImageStatus.PENDING,
+                # An audit_result means the audit ran and failed for good: left to admins
+                Image.audit_result.is_(None),
+                Image.created_at < cutoff,
+                AuditJob.id.is_(None),
+            )
+            .limit(SWEEP_BATCH_SIZE)
+        )
+        images = result.scalars().all()
+        if not images:
+            return
+        # Every worker runs this sweep: an image another worker just enqueued hits
+        # the unique image_id, which must only skip that row, not fail the batch
+        enqueued = 0
+        for image in images:
+            try:
+                async with db.begin_nested():
+                    await enqueue_audit(db, image)
+                enqueued += 1
+            except IntegrityError:
+                pass
+        await db.commit()
+    if enqueued:
+        logger.info(f"[Audit] Re-enqueued {enqueued} stale pending images")
+
+
+async def get_audit_queue_stats() -> dict:
+    """Queue depth (for admin diagnosis)."""
+    from sqlalchemy import func
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        queued = (await db.execute(select(func.count(AuditJob.id)))).scalar() or 0
+        running = (await db.execute(
+            select(func.count(AuditJob.id)).where(AuditJob.locked_until >= now)
+        )).scalar() or 0
+        retrying = (await db.execute(
+            select(func.count(AuditJob.id)).where(AuditJob.attempts > 0)
+        )).scalar() or 0
+    return {"queued": queued, "running": running, "retrying": retrying}
+
+
+async def start_audit_worker():
+    global _worker_task
+    if _worker_task is None:
+        _worker_task = asyncio.create_task(_worker_loop())
+
+
+async def stop_audit_worker():
+    global _worker_task
+    if _worker_task:
+        _worker_task.cancel()
+        try:
+            await _worker_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _worker_task = None
@@ -86,6 +86,49 @@ async def init_scheduler():
         name="Cleanup expired files"
     )
     
+    # Re-enqueue images left pending without an audit job every 5 minutes
+    from app.services.audit_queue import requeue_stale_audits
+    scheduler.add_job(
+        requeue_stale_audits,
+        IntervalTrigger(minutes=5),
+        id="requeue_stale_audits",
+        replace_existing=True,
+        name="Requeue stale image audits"
+    )
+    
+    # Purge expired cached moderation verdicts daily
+    from app.services.audit_cache import purge_audit_cache
+    scheduler.add_job(
+        purge_audit_cache,
+        CronTrigger(hour=4, minute=30),
+        id="purge_audit_cache",
+        replace_existing=True,
+        name="Purge expired audit cache"
+    )
+    
+    # Repair lagging storage replicas every minute (only when STORAGE_REPLICAS is set)
+    from app.services.storage.replicated import get_replica_types, reconcile_replicas
+    if get_replica_types():
+        scheduler.add_job(
+            reconcile_replicas,
+            IntervalTrigger(minutes=1),
+            id="reconcile_storage_replicas",
+            replace_existing=True,
+            name="Reconcile storage replicas"
+        )
+    
+    # Push uploads spooled during cloud storage outages every minute
+    from app.config import get_settings
+    if get_settings().storage_spool_enabled:
+        from app.services.storage.spool import drain_spool
+        scheduler.add_job(
+            drain_spool,
+            IntervalTrigger(minutes=1),
+            id="drain_storage_spool",
+            replace_existing=True,
+            name="Drain storage spool"
+        )
+    
     scheduler.start()
     logger.info("Backup scheduler started")
 
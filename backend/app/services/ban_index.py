@@ -0,0 +1,358 @@
+"""
+In-memory Ban Index
+
+security.is_banned() answers from a per-process index of active blacklist rows
+instead of querying the blacklist table on every upload:
+
+- exact IPs and user ids: dict lookups
+- CIDR ranges ("10.0.0.0/24", "2001:db8::/32" in ip_address): a binary prefix tree
+  per address family
+- expiry is checked lazily on lookup; expired entries are dropped when hit
+
+The index is loaded at startup. Every ban change (create, lift, extend, make
+permanent) is applied locally and published on Redis (bans:changed) with the full
+entry, so other workers apply it without touching the database. A worker reloads
+the whole index whenever its listener (re)connects, and every BAN_INDEX_TTL seconds
+while no listener is running (no Redis).
+"""
+import asyncio
+import ipaddress
+import json
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.blacklist import Blacklist, BanType
+from app.redis import get_shared_redis
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+BAN_CHANNEL = "bans:changed"
+
+
+@dataclass(slots=True)
+class BanEntry:
+    id: int
+    ip: Optional[str]
+    user_id: Optional[int]
+    reason: str
+    # Epoch seconds; None = permanent
+    expires_at: Optional[float]
+    created_at: float
+
+    def is_active(self, now: float) -> bool:
+        return self.expires_at is None or now < self.expires_at
+
+    def to_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "ip": self.ip,
+            "user_id": self.user_id,
+            "reason": self.reason,
+            "expires_at": self.expires_at,
+            "created_at": self.created_at,
+        }
+
+
+def _epoch(dt: Optional[datetime]) -> Optional[float]:
+    # Blacklist timestamps are naive UTC
+    return dt.replace(tzinfo=timezone.utc).timestamp() if dt else None
+
+
+def entry_from_ban(ban: Blacklist) -> Optional[BanEntry]:
+    """Index entry for a blacklist row, or None when the row cannot ban anyone."""
+    if ban.lifted_at is not None:
+        return None
+    permanent = ban.ban_type == BanType.PERMANENT
+    if not permanent and ban.expires_at is None:
+        # Same rule as the original query: a temporary ban needs an expiry
+        return None
+    return BanEntry(
+        id=ban.id,
+        ip=(ban.ip_address or "").strip() or None,
+        user_id=ban.user_id,
+        reason=ban.reason,
+        expires_at=None if permanent else _epoch(ban.expires_at),
+        created_at=_epoch(ban.created_at) or 0.0,
+    )
+
+
+def _parse_network(value: str):
+    if "/" not in value:
+        return None
+    try:
+        return ipaddress.ip_network(value, strict=False)
+    except ValueError:
+        return None
+
+
+class _PrefixTrie:
+    """Binary trie over address bits; a node holds the bans whose prefix ends there."""
+
+    __slots__ = ("bits", "root", "size")
+
+    def __init__(self, bits: int):
+        self.bits = bits
+        # Node: [child_0, child_1, {ban_id: BanEntry} or None]
+        self.root = [None, None, None]
+        self.size = 0
+
+    def _walk(self, network, create: bool):
+        node = self.root
+        address = int(network.network_address)
+        for i in range(network.prefixlen):
+            bit = (address >> (self.bits - 1 - i)) & 1
+            child = node[bit]
+            if child is None:
+                if not create:
+                    return None
+                child = node[bit] = [None, None, None]
+            node = child
+        return node
+
+    def insert(self, network, entry: BanEntry):
+        node = self._walk(network, create=True)
+        if node[2] is None:
+            node[2] = {}
+        if entry.id not in node[2]:
+            self.size += 1
+        node[2][entry.id] = entry
+
+    def remove(self, network, ban_id: int):
+        node = self._walk(network, create=False)
+        if node is not None and node[2] and node[2].pop(ban_id, None) is not None:
+            self.size -= 1
+
+    def match(self, address: int) -> List[BanEntry]:
+        """Bans of every prefix containing the address."""
+        found = []
+        node = self.root
+        for i in range(self.bits + 1):
+            if node[2]:
+                found.extend(node[2].values())
+            if i == self.bits:
+                break
+            node = node[(address >> (self.bits - 1 - i)) & 1]
+            if node is None:
+                break
+        return found
+
+
+class BanIndex:
+    def __init__(self):
+        self.by_id: Dict[int, BanEntry] = {}
+        self.by_ip: Dict[str, Dict[int, BanEntry]] = {}
+        self.by_user: Dict[int, Dict[int, BanEntry]] = {}
+        self.tries = {4: _PrefixTrie(32), 6: _PrefixTrie(128)}
+
+    def __len__(self) -> int:
+        return len(self.by_id)
+
+    def put(self, entry: BanEntry):
+        self.discard(entry.id)
+        self.by_id[entry.id] = entry
+        if entry.ip:
+            network = _parse_network(entry.ip)
+            if network is not None:
+                self.tries[network.version].insert(network, entry)
+            else:
+                self.by_ip.setdefault(entry.ip, {})[entry.id] = entry
+        if entry.user_id:
+            self.by_user.setdefault(entry.user_id, {})[entry.id] = entry
+
+    def discard(self, ban_id: int):
+        entry = self.by_id.pop(ban_id, None)
+        if entry is None:
+            return
+        if entry.ip:
+            network = _parse_network(entry.ip)
+            if network is not None:
+                self.tries[network.version].remove(network, ban_id)
+            else:
+                _pop_nested(self.by_ip, entry.ip, ban_id)
+        if entry.user_id:
+            _pop_nested(self.by_user, entry.user_id, ban_id)
+
+    def lookup(self, ip: Optional[str], user_id: Optional[int]) -> Optional[BanEntry]:
+        """Most recent active ban matching the IP (exact or range) or the user."""
+        candidates: List[BanEntry] = []
+        if ip:
+            exact = self.by_ip.get(ip)
+            if exact:
+                candidates.extend(exact.values())
+            if self.tries[4].size or self.tries[6].size:
+                try:
+                    address = ipaddress.ip_address(ip)
+                except ValueError:
+                    address = None
+                if address is not None and self.tries[address.version].size:
+                    candidates.extend(self.tries[address.version].match(int(address)))
+        if user_id:
+            by_user = self.by_user.get(user_id)
+            if by_user:
+                candidates.extend(by_user.values())
+        if not candidates:
+            return None
+
+        now = time.time()
+        best = None
+        for entry in candidates:
+            if not entry.is_active(now):
+                # Lazy expiry
+                self.discard(entry.id)
+            elif best is None or entry.created_at > best.created_at:
+                best = entry
+        return best
+
+
+def _pop_nested(index: dict, key, ban_id: int):
+    bucket = index.get(key)
+    if bucket is not None:
+        bucket.pop(ban_id, None)
+        if not bucket:
+            del index[key]
+
+
+_index = BanIndex()
+_loaded = False
+_loaded_at = 0.0
+_load_lock = asyncio.Lock()
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_sync_task: Optional[asyncio.Task] = None
+_sync_active = False
+
+
+async def load_ban_index():
+    """(Re)build the index from every active blacklist row."""
+    global _index, _loaded, _loaded_at
+    async with _load_lock:
+        now = datetime.utcnow()
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(Blacklist).where(
+                    Blacklist.lifted_at.is_(None),
+                    (Blacklist.ban_type == BanType.PERMANENT) | (Blacklist.expires_at > now),
+                )
+            )
+            bans = result.scalars().all()
+        index = BanIndex()
+        for ban in bans:
+            entry = entry_from_ban(ban)
+            if entry is not None:
+                index.put(entry)
+        _index = index
+        _loaded = True
+        _loaded_at = time.monotonic()
+        logger.info(f"Ban index loaded: {len(index)} active bans")
+
+
+def _needs_reload() -> bool:
+    if not _loaded:
+        return True
+    return not _sync_active and time.monotonic() - _loaded_at > settings.ban_index_ttl
+
+
+async def lookup_ban(ip: Optional[str], user_id: Optional[int] = None) -> Optional[BanEntry]:
+    """Active ban for the IP or user. Raises if the index cannot be loaded."""
+    if _needs_reload():
+        await load_ban_index()
+    return _index.lookup(ip, user_id)
+
+
+async def publish_ban_change(ban: Blacklist):
+    """Call after committing a ban change: applies it here and on the other workers."""
+    entry = entry_from_ban(ban)
+    if entry is not None:
+        _index.put(entry)
+    else:
+        _index.discard(ban.id)
+
+    client = get_shared_redis()
+    if client is None:
+        return
+    try:
+        await client.publish(BAN_CHANNEL, json.dumps({
+            "origin": _worker_id,
+            "id": ban.id,
+            "entry": entry.to_dict() if entry else None,
+        }))
+    except Exception as e:
+        logger.warning(f"Failed to publish ban change: {e}")
+
+
+def _handle_ban_message(data: str):
+    try:
+        message = json.loads(data)
+        ban_id = int(message["id"])
+        entry = message.get("entry")
+    except (ValueError, KeyError, TypeError):
+        return
+    if message.get("origin") == _worker_id:
+        return
+    if entry:
+        _index.put(BanEntry(**entry))
+    else:
+        _index.discard(ban_id)
+
+
+async def _ban_sync_loop():
+    """Apply ban changes published by other workers (reconnects with backoff)."""
+    global _sync_active
+    backoff = 1
+    while True:
+        client = get_shared_redis()
+        if client is None:
+            return
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(BAN_CHANNEL)
+            # Changes published while we were not listening are lost: start from a fresh load
+            await load_ban_index()
+            _sync_active = True
+            backoff = 1
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _handle_ban_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Ban sync listener disconnected: {e}, retrying in {backoff}s")
+        finally:
+            _sync_active = False
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+async def start_ban_sync():
+    """Load the index and start the cross-worker listener (no listener without Redis)."""
+    global _sync_task
+    try:
+        await load_ban_index()
+    except Exception as e:
+        logger.warning(f"Failed to load ban index: {e}")
+    if _sync_task is None and get_shared_redis() is not None:
+        _sync_task = asyncio.create_task(_ban_sync_loop())
+
+
+async def stop_ban_sync():
+    global _sync_task
+    if _sync_task:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _sync_task = None
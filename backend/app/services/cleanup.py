@@ -10,7 +10,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.database import AsyncSessionLocal
 from app.models.file import File
-from app.services.storage import get_storage_backend_async
+from app.services.storage import delete_stored_files
 
 logger = logging.getLogger(__name__)
 
@@ -39,33 +39,22 @@ async def cleanup_expired_files(batch_size: int = 100):
                     break
                 
                 logger.info(f"Found {len(files)} expired files to clean up")
-                storage = await get_storage_backend_async()
+                # One bulk delete request per backend (files + video thumbnails)
+                try:
+                    results = await delete_stored_files(
+                        (file.storage_type, path)
+                        for file in files
+                        for path in (file.file_path, file.thumbnail_path)
+                    )
+                    for path, ok in results.items():
+                        if not ok:
+                            logger.error(f"Failed to delete file from storage: {path}")
+                except Exception as e:
+                    logger.error(f"Failed to bulk delete {len(files)} expired files from storage: {e}")
                 
-                ids_to_delete = []
-                
-                for file in files:
-                    try:
-                        # logical deletion from storage
-                        # Note: storage.delete might require full path or relative path depending on implementation
-                        # In `files.py`: 
-                        # await storage.delete(file_obj.file_path)
-                        # Let's check `files.py` usually passes `file_path` which is relative path stored in DB
-                        # But LocalStorage.delete expects full path?
-                        # Let's double check LocalStorage implementation in `storage/local.py` or assume standard interface.
-                        # `files.py` line 181: await storage.delete(file_obj.file_path)
-                        # So we assume that works.
-                        
-                        await storage.delete(file.file_path)
-                        ids_to_delete.append(file.id)
-                    except Exception as e:
-                        logger.error(f"Failed to delete file from storage: {file.file_path} (ID: {file.id}): {e}")
-                        # If storage deletion fails, should we delete from DB?
-                        # Maybe yes, to stop loop? Or maybe keep it to retry?
-                        # If we don't delete from DB, this loop will pick it up forever.
-                        # For now, let's delete from DB even if storage fails, to clean up metadata.
-                        # Or maybe we should mark it as error?
-                        # Risk: Orphaned files on disk. Admin can clean up manually.
-                        ids_to_delete.append(file.id)
+                # Delete from DB even if storage deletion failed, otherwise this loop
+                # would pick the same rows up forever. Risk: orphaned objects, admin can clean up manually.
+                ids_to_delete = [file.id for file in files]
                 
                 if ids_to_delete:
                     # Batch delete from DB
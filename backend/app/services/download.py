@@ -4,6 +4,7 @@ Download service for batch downloading images as ZIP files.
 import io
 import os
 import zipfile
+import logging
 from datetime import datetime
 from typing import List, Optional, AsyncGenerator
 from sqlalchemy import select
@@ -14,6 +15,26 @@ from app.models.album import Album
 from app.config import get_settings
 
 settings = get_settings()
+logger = logging.getLogger(__name__)
+
+
+class _ZipStreamBuffer(io.RawIOBase):
+    """Unseekable sink for ZipFile; whatever was written is handed out by drain()."""
+    
+    def __init__(self):
+        self._chunks: List[bytes] = []
+    
+    def writable(self) -> bool:
+        return True
+    
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+    
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
 
 
 class DownloadService:
@@ -76,24 +97,60 @@ class DownloadService:
         timestamp = datetime.now().strftime("%Y%m%d")
         return f"{safe_name}_{timestamp}.zip"
     
-    async def create_zip_stream(self, images: List[Image]) -> io.BytesIO:
-        """Create a ZIP file in memory containing the specified images."""
-        zip_buffer = io.BytesIO()
+    def create_zip_stream(self, images: List[Image]) -> AsyncGenerator[bytes, None]:
+        """
+        Stream a ZIP archive of the specified images.
         
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            for image in images:
-                # Build local file path
-                local_path = os.path.join(settings.upload_path, image.file_path)
-                
-                if os.path.exists(local_path):
-                    # Use original filename or generated filename
-                    filename = image.original_filename or image.full_filename
-                    # Ensure unique filenames in ZIP
-                    arcname = self._get_unique_arcname(zip_file, filename)
-                    zip_file.write(local_path, arcname)
+        Images are read chunk by chunk from whichever backend holds them, so memory
+        use stays bounded regardless of archive size. Entries use data descriptors
+        (the output is never seeked), which every common unzip tool supports.
+        """
+        # Snapshot what we need now: the generator runs after the request's DB session is gone
+        entries = [
+            (image.storage_type or "local", image.file_path, image.original_filename or image.full_filename, image.file_size or 0)
+            for image in images
+        ]
+        return self._iter_zip(entries)
+    
+    async def _iter_zip(self, entries: List[tuple]) -> AsyncGenerator[bytes, None]:
+        from app.services.storage import get_storage_backend_for
         
-        zip_buffer.seek(0)
-        return zip_buffer
+        backends = {}
+        buffer = _ZipStreamBuffer()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
+            for storage_type, file_path, filename, file_size in entries:
+                if storage_type not in backends:
+                    backends[storage_type] = await get_storage_backend_for(storage_type)
+                storage = backends[storage_type]
+                
+                chunks = storage.open_read(file_path)
+                try:
+                    # Pull the first chunk before creating the entry so missing files are skipped
+                    first_chunk = await chunks.__anext__()
+                except (FileNotFoundError, StopAsyncIteration):
+                    continue
+                except Exception as e:
+                    logger.warning(f"Skipping {file_path} in ZIP: {e}")
+                    continue
+                
+                # Ensure unique filenames in ZIP
+                zinfo = zipfile.ZipInfo(self._get_unique_arcname(zip_file, filename), date_time=datetime.now().timetuple()[:6])
+                zinfo.compress_type = zipfile.ZIP_DEFLATED
+                # A size hint lets zipfile decide on ZIP64 up front
+                zinfo.file_size = file_size
+                
+                with zip_file.open(zinfo, 'w') as entry:
+                    entry.write(first_chunk)
+                    async for chunk in chunks:
+                        data = buffer.drain()
+                        if data:
+                            yield data
+                        entry.write(chunk)
+                data = buffer.drain()
+                if data:
+                    yield data
+        # Central directory
+        yield buffer.drain()
     
     def _get_unique_arcname(self, zip_file: zipfile.ZipFile, filename: str) -> str:
         """Get unique filename for ZIP archive to avoid duplicates."""
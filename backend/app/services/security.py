@@ -11,6 +11,7 @@ import logging
 
 from app.models.blacklist import Blacklist, ViolationLog, BanType
 from app.database import AsyncSessionLocal
+from app.services.ban_index import lookup_ban, publish_ban_change
 
 logger = logging.getLogger(__name__)
 
@@ -21,9 +22,23 @@ _rate_cache = {}
 
 async def is_banned(ip: str, user_id: Optional[int] = None, db: AsyncSession = None) -> Tuple[bool, Optional[str]]:
     """
-    Check if IP or user is banned.
+    Check if IP or user is banned (answered from the in-memory ban index).
     Returns: (is_banned, reason)
     """
+    if not ip and not user_id:
+        return False, None
+    try:
+        ban = await lookup_ban(ip, user_id)
+    except Exception as e:
+        logger.warning(f"Ban index unavailable, querying blacklist: {e}")
+        return await _query_ban(ip, user_id, db)
+    if ban is None:
+        return False, None
+    return True, ban.reason
+
+
+async def _query_ban(ip: str, user_id: Optional[int], db: AsyncSession = None) -> Tuple[bool, Optional[str]]:
+    """Database fallback for is_banned()."""
     close_db = False
     if db is None:
         db = AsyncSessionLocal()
@@ -77,76 +92,56 @@ async def log_violation(
     image_id: Optional[int] = None,
     details: Optional[dict] = None,
     db: AsyncSession = None
-) -> ViolationLog:
-    """Log a violation and check if auto-ban should be triggered."""
-    close_db = False
-    if db is None:
-        db = AsyncSessionLocal()
-        close_db = True
+):
+    """
+    Log a violation and check if auto-ban should be triggered.
+    The violation_logs row is written asynchronously in a batch (see services/violations.py).
+    """
+    from app.services.violations import count_violation, enqueue_violation, flush_violations, is_writer_running
     
-    try:
-        # Create violation log
-        violation = ViolationLog(
-            ip_address=ip,
-            user_id=user_id,
-            image_id=image_id,
-            violation_type=violation_type,
-            details=json.dumps(details) if details else None,
-        )
-        db.add(violation)
-        await db.commit()
-        await db.refresh(violation)
-        
-        # Check if auto-ban should be triggered
-        await check_auto_ban(ip, user_id, violation_type, db)
-        
-        return violation
-    finally:
-        if close_db:
-            await db.close()
+    enqueue_violation({
+        "ip_address": ip,
+        "user_id": user_id,
+        "image_id": image_id,
+        "violation_type": violation_type,
+        "details": json.dumps(details) if details else None,
+        "created_at": datetime.utcnow(),
+    })
+    if not is_writer_running():
+        # Outside the app (scripts): write through
+        await flush_violations()
+    
+    count = await count_violation(violation_type, ip, user_id)
+    await check_auto_ban(ip, user_id, violation_type, db, count=count)
 
 
 async def check_auto_ban(
     ip: str,
     user_id: Optional[int],
     violation_type: str,
-    db: AsyncSession
+    db: AsyncSession = None,
+    count: Optional[int] = None,
 ):
-    """Check if automatic ban should be triggered based on violation history."""
-    from app.services.settings import (
-        get_setting_bool,
-        get_setting_int,
-    )
+    """
+    Check if automatic ban should be triggered based on violation history.
+    count is the 24 h violation count from the Redis counters; without it the logs are counted.
+    """
+    from app.services.settings import get_settings_snapshot
     
-    # Check if auto-ban is enabled
-    if not await get_setting_bool("security_auto_ban_enabled", True):
+    snapshot = await get_settings_snapshot()
+    if not snapshot.auto_ban_enabled:
         return
     
     # Get thresholds
     if violation_type == "audit_failed":
-        threshold = await get_setting_int("security_audit_fail_threshold", 3)
+        threshold = snapshot.audit_fail_threshold
     else:  # rate_limit_exceeded
-        threshold = await get_setting_int("security_rate_exceed_threshold", 3)
-    
-    ban_duration_minutes = await get_setting_int("security_temp_ban_duration", 1440)  # Default 24 hours in minutes
-    
-    # Count recent violations (last 24 hours)
-    since = datetime.utcnow() - timedelta(hours=24)
+        threshold = snapshot.rate_exceed_threshold
     
-    conditions = [
-        ViolationLog.violation_type == violation_type,
-        ViolationLog.created_at >= since,
-    ]
+    ban_duration_minutes = snapshot.temp_ban_minutes
     
-    if user_id:
-        conditions.append(ViolationLog.user_id == user_id)
-    else:
-        conditions.append(ViolationLog.ip_address == ip)
-    
-    result = await db.execute(
-        select(func.count(ViolationLog.id)).where(and_(*conditions))
-    )
-    count = result.scalar()
+    if count is None:
+        count = await get_violation_count(ip, user_id, violation_type, hours=24, db=db)
     
     # Trigger auto-ban if threshold reached
     if count >= threshold:
@@ -208,6 +203,7 @@ async def create_ban(
                     existing.expires_at = None
                 await db.commit()
                 await db.refresh(existing)
+                await publish_ban_change(existing)
                 return existing
         
         # Create new ban
@@ -226,6 +222,7 @@ async def create_ban(
         db.add(ban)
         await db.commit()
         await db.refresh(ban)
+        await publish_ban_change(ban)
         return ban
     finally:
         if close_db:
@@ -252,6 +249,7 @@ async def remove_ban(
     ban.lifted_by = lifted_by
     ban.lift_reason = lift_reason or "手动解封"
     await db.commit()
+    await publish_ban_change(ban)
     return True
 
 
@@ -260,82 +258,29 @@ async def check_rate_limit_multi(
     user_id: Optional[int],
     is_user: bool,
     is_vip: bool = False,
-    limit_type: str = 'image'  # 'image' or 'file'
-) -> Tuple[bool, str, int]:
+    limit_type: str = 'image'  # 'image', 'file' or 'video'
+) -> Tuple[bool, str, int, int]:
     """
-    Check multiple rate limits (per minute, hour, day).
-    Returns: (is_allowed, limit_type, remaining)
+    Check the per minute, hour and day limits in one atomic call.
+    Returns: (is_allowed, limit_type, remaining, retry_after_seconds)
     """
-    from app.services.settings import get_setting_int
-    from app.services.settings import (
-        get_vip_upload_limit_per_minute,
-        get_vip_upload_limit_per_hour,
-        get_vip_upload_limit_per_day,
-        # File limits
-        get_guest_file_limit_per_minute,
-        get_guest_file_limit_per_hour,
-        get_guest_file_limit_per_day,
-        get_user_file_limit_per_minute,
-        get_user_file_limit_per_hour,
-        get_user_file_limit_per_day,
-        get_vip_file_limit_per_minute,
-        get_vip_file_limit_per_hour,
-        get_vip_file_limit_per_day
-    )
-    from app.utils.rate_limit import check_rate_limit
-    
-    # Get limits from settings
-    if limit_type == 'file':
-        if is_user:
-            if is_vip:
-                per_minute = await get_vip_file_limit_per_minute()
-                per_hour = await get_vip_file_limit_per_hour()
-                per_day = await get_vip_file_limit_per_day()
-            else:
-                per_minute = await get_user_file_limit_per_minute()
-                per_hour = await get_user_file_limit_per_hour()
-                per_day = await get_user_file_limit_per_day()
-            key_prefix = f"upload_file:user:{user_id}"
-        else:
-            per_minute = await get_guest_file_limit_per_minute()
-            per_hour = await get_guest_file_limit_per_hour()
-            per_day = await get_guest_file_limit_per_day()
-            key_prefix = f"upload_file:ip:{ip}"
-    else:
-        # Default (Image) Limits
-        if is_user:
-            if is_vip:
-                per_minute = await get_vip_upload_limit_per_minute()
-                per_hour = await get_vip_upload_limit_per_hour()
-                per_day = await get_vip_upload_limit_per_day()
-            else:
-                per_minute = await get_setting_int("security_rate_limit_user_per_minute", 10)
-                per_hour = await get_setting_int("security_rate_limit_user_per_hour", 100)
-                per_day = await get_setting_int("security_rate_limit_user_per_day", 500)
-            
-            key_prefix = f"upload:user:{user_id}"
-        else:
-            per_minute = await get_setting_int("security_rate_limit_guest_per_minute", 3)
-            per_hour = await get_setting_int("security_rate_limit_guest_per_hour", 10)
-            per_day = await get_setting_int("security_rate_limit_guest_per_day", 30)
-            key_prefix = f"upload:ip:{ip}"
-    
-    # Check per-minute limit (60 seconds window)
-    allowed, count, remaining = await check_rate_limit(f"{key_prefix}:minute", per_minute, 60)
-    if not allowed:
-        return False, "minute", remaining
+    from app.services.settings import get_settings_snapshot, rate_tier
+    from app.utils.rate_limit import RateWindow, hit_rate_limit
     
-    # Check per-hour limit (3600 seconds window)
-    allowed, count, remaining = await check_rate_limit(f"{key_prefix}:hour", per_hour, 3600)
-    if not allowed:
-        return False, "hour", remaining
+    # Limits come precomputed from the settings snapshot, keyed by (tier, media)
+    snapshot = await get_settings_snapshot()
+    media = limit_type if limit_type in ('file', 'video') else 'image'
+    limits = snapshot.rate_limits[(rate_tier(is_user, is_vip), media)]
     
-    # Check per-day limit (86400 seconds window)
-    allowed, count, remaining = await check_rate_limit(f"{key_prefix}:day", per_day, 86400)
-    if not allowed:
-        return False, "day", remaining
+    prefix = {'image': "upload", 'file': "upload_file", 'video': "upload_video"}[media]
+    key = f"{prefix}:user:{user_id}" if is_user else f"{prefix}:ip:{ip}"
     
-    return True, "", remaining
+    result = await hit_rate_limit(key, (
+        RateWindow("minute", limits.per_minute, 60),
+        RateWindow("hour", limits.per_hour, 3600),
+        RateWindow("day", limits.per_day, 86400),
+    ))
+    return result.allowed, result.window, result.remaining, result.retry_after
 
 
 async def get_violation_count(
@@ -1,15 +1,29 @@
 """
 System Settings Service
 Provides centralized access to system settings from database.
-Settings are cached and refreshed periodically.
+
+Settings are cached per process. Changes are propagated between workers through
+Redis: a version counter (settings:version) plus a pub/sub message listing the
+changed keys, which every worker applies without a full reload. A worker that
+misses a version reloads everything. Without Redis (or while the listener is
+disconnected) the cache is reloaded every SETTINGS_CACHE_TTL seconds instead.
 """
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select
-from typing import Optional, Dict, Any
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Optional, Dict, Any, Iterable, List, Mapping, Tuple
 from app.models.settings import SystemSettings
 from app.database import AsyncSessionLocal
+from app.config import get_settings
+from app.redis import get_shared_redis
 import logging
 import asyncio
+import hashlib
+import json
+import os
+import time
+import uuid
 
 logger = logging.getLogger(__name__)
 
@@ -17,6 +31,17 @@ logger = logging.getLogger(__name__)
 _settings_cache: Dict[str, str] = {}
 _cache_loaded = False
 _cache_lock = asyncio.Lock()
+_cache_loaded_at = 0.0
+# Bumped on every local cache change (full load or applied keys)
+_cache_generation = 0
+
+# Cross-worker invalidation
+SETTINGS_VERSION_KEY = "settings:version"
+SETTINGS_CHANNEL = "settings:changed"
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_redis_version = 0
+_sync_task: Optional[asyncio.Task] = None
+_sync_active = False
 
 
 # Default values (fallback if not in database)
@@ -243,7 +268,7 @@ DEFAULTS = {
 
 async def load_settings_to_cache():
     """Load all settings from database to cache."""
-    global _settings_cache, _cache_loaded
+    global _settings_cache, _cache_loaded, _cache_loaded_at, _cache_generation
     
     async with _cache_lock:
         # Double-check if loaded while waiting for lock
@@ -255,31 +280,42 @@ async def load_settings_to_cache():
                 result = await db.execute(select(SystemSettings))
                 settings = result.scalars().all()
                 
-                # Start with defaults
-                _settings_cache = DEFAULTS.copy()
-                
-                # Override with database values
+                # Start with defaults, override with database values
+                cache = DEFAULTS.copy()
                 for setting in settings:
-                    _settings_cache[setting.key] = setting.value or ""
+                    cache[setting.key] = setting.value or ""
+                _settings_cache = cache
                 
                 _cache_loaded = True
                 logger.info(f"Loaded {len(settings)} settings from database")
         except Exception as e:
             logger.error(f"Failed to load settings: {e}")
-            _settings_cache = DEFAULTS.copy()
+            if not _settings_cache:
+                _settings_cache = DEFAULTS.copy()
             _cache_loaded = True
+        _cache_loaded_at = time.monotonic()
+        _cache_generation += 1
 
 
 async def get_setting(key: str, default: str = "") -> str:
     """Get a single setting value."""
-    global _cache_loaded
-    
-    if not _cache_loaded:
+    if not _cache_loaded or _cache_expired():
         await load_settings_to_cache()
     
     return _settings_cache.get(key, DEFAULTS.get(key, default))
 
 
+def _cache_expired() -> bool:
+    """TTL fallback, only used while no Redis listener keeps the cache current."""
+    global _cache_loaded
+    if _sync_active:
+        return False
+    if time.monotonic() - _cache_loaded_at > get_settings().settings_cache_ttl:
+        _cache_loaded = False
+        return True
+    return False
+
+
 async def get_setting_int(key: str, default: int = 0) -> int:
     """Get a setting as integer."""
     value = await get_setting(key, str(default))
@@ -323,11 +359,16 @@ async def set_setting(key: str, value: str, db: AsyncSession):
     
     await db.commit()
     
-    # Update cache
-    _settings_cache[key] = value
+    # Update this worker's cache and notify the others
+    await notify_settings_changed([key])
+
+
+async def _run_change_hooks(keys: Optional[Iterable[str]] = None):
+    """Refresh caches derived from settings. `keys=None` means everything changed."""
+    keys = set(keys) if keys is not None else None
     
     # 如果是IP相关设置，刷新IP头缓存
-    if key in ("security_real_ip_header", "security_trust_proxy"):
+    if keys is None or keys & {"security_real_ip_header", "security_trust_proxy"}:
         try:
             from app.utils.rate_limit import refresh_ip_header_settings
             await refresh_ip_header_settings()
@@ -335,11 +376,11 @@ async def set_setting(key: str, value: str, db: AsyncSession):
             logger.warning(f"Failed to refresh IP header settings: {e}")
     
     # 如果是时区设置，刷新时区缓存
-    if key == "general_timezone":
+    if keys is None or "general_timezone" in keys:
         try:
             from app.utils.timezone import refresh_timezone_cache
             refresh_timezone_cache()
-            logger.info(f"Timezone cache refreshed for: {value}")
+            logger.info("Timezone cache refreshed")
         except Exception as e:
             logger.warning(f"Failed to refresh timezone cache: {e}")
 
@@ -357,6 +398,305 @@ def invalidate_cache():
     _cache_loaded = False
 
 
+def get_cache_generation() -> int:
+    """Changes whenever this worker's settings cache changes (for caches derived from settings)."""
+    return _cache_generation
+
+
+async def _apply_keys(keys: List[str]):
+    """Re-read only the given keys from the database into the cache."""
+    global _cache_generation
+    if not _cache_loaded:
+        await load_settings_to_cache()
+        return
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(SystemSettings).where(SystemSettings.key.in_(keys)))
+        values = {setting.key: setting.value or "" for setting in result.scalars().all()}
+    for key in keys:
+        if key in values:
+            _settings_cache[key] = values[key]
+        elif key in DEFAULTS:
+            _settings_cache[key] = DEFAULTS[key]
+        else:
+            _settings_cache.pop(key, None)
+    _cache_generation += 1
+
+
+async def notify_settings_changed(keys: Iterable[str]):
+    """
+    Call after committing setting changes: applies them to this worker and
+    publishes them (with a new version number) to the other workers.
+    """
+    global _redis_version
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    try:
+        await _apply_keys(keys)
+    except Exception as e:
+        logger.warning(f"Failed to apply changed settings, reloading: {e}")
+        await refresh_cache()
+    await _run_change_hooks(keys)
+    
+    client = get_shared_redis()
+    if client is None:
+        return
+    try:
+        version = await client.incr(SETTINGS_VERSION_KEY)
+        await client.publish(SETTINGS_CHANNEL, json.dumps({"version": version, "keys": keys, "origin": _worker_id}))
+    except Exception as e:
+        logger.warning(f"Failed to publish settings change: {e}")
+        return
+    if version != _redis_version + 1:
+        # Another worker's change got a version in between and its message has not
+        # arrived yet: reload now so skipping past its version loses nothing
+        await refresh_cache()
+        await _run_change_hooks()
+    _redis_version = max(_redis_version, version)
+
+
+async def _handle_settings_message(data: str):
+    global _redis_version
+    try:
+        message = json.loads(data)
+        version = int(message["version"])
+        keys = list(message.get("keys") or [])
+    except (ValueError, KeyError, TypeError):
+        return
+    if message.get("origin") == _worker_id:
+        # Already applied locally by notify_settings_changed
+        _redis_version = max(_redis_version, version)
+        return
+    if version <= _redis_version:
+        # Arrived after a later version was seen (e.g. our own concurrent change):
+        # cheap to reload, wrong to drop
+        await refresh_cache()
+        await _run_change_hooks()
+        return
+    if version == _redis_version + 1 and keys:
+        await _apply_keys(keys)
+        await _run_change_hooks(keys)
+    else:
+        # Missed at least one change: reload everything
+        await refresh_cache()
+        await _run_change_hooks()
+    _redis_version = version
+
+
+async def _settings_sync_loop():
+    """Listen for settings changes published by other workers (reconnects with backoff)."""
+    global _sync_active, _redis_version
+    backoff = 1
+    while True:
+        client = get_shared_redis()
+        if client is None:
+            return
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(SETTINGS_CHANNEL)
+            # Catch up on anything published while we were not listening
+            remote_version = int(await client.get(SETTINGS_VERSION_KEY) or 0)
+            if remote_version != _redis_version:
+                if _cache_loaded:
+                    await refresh_cache()
+                    await _run_change_hooks()
+                _redis_version = remote_version
+            _sync_active = True
+            backoff = 1
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    await _handle_settings_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"Settings sync listener disconnected: {e}, retrying in {backoff}s")
+        finally:
+            _sync_active = False
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+async def start_settings_sync():
+    """Start the cross-worker settings listener (no-op without Redis)."""
+    global _sync_task
+    if _sync_task is None and get_shared_redis() is not None:
+        _sync_task = asyncio.create_task(_settings_sync_loop())
+
+
+async def stop_settings_sync():
+    global _sync_task
+    if _sync_task:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _sync_task = None
+
+
+# ---------- Typed snapshot ----------
+
+RATE_TIERS = ("guest", "user", "vip")
+RATE_MEDIA = ("image", "file", "video")
+
+# (tier, media) -> (setting key prefix, (per_minute, per_hour, per_day) defaults)
+_RATE_LIMIT_KEYS = {
+    ("guest", "image"): ("security_rate_limit_guest", (3, 10, 30)),
+    ("user", "image"): ("security_rate_limit_user", (10, 100, 500)),
+    ("vip", "image"): ("security_rate_limit_vip", (30, 300, 2000)),
+    ("guest", "file"): ("security_rate_limit_guest_file", (1, 3, 10)),
+    ("user", "file"): ("security_rate_limit_user_file", (5, 20, 50)),
+    ("vip", "file"): ("security_rate_limit_vip_file", (10, 50, 200)),
+    ("guest", "video"): ("security_rate_limit_guest_video", (1, 5, 10)),
+    ("user", "video"): ("security_rate_limit_user_video", (3, 20, 50)),
+    ("vip", "video"): ("security_rate_limit_vip_video", (10, 50, 200)),
+}
+
+# (tier, media) -> (setting key, default bytes)
+_MAX_SIZE_KEYS = {
+    ("guest", "image"): ("upload_max_size_guest", 5242880),
+    ("user", "image"): ("upload_max_size_user", 10485760),
+    ("vip", "image"): ("upload_max_size_vip", 52428800),
+    ("guest", "file"): ("upload_file_max_size_guest", 52428800),
+    ("user", "file"): ("upload_file_max_size_user", 104857600),
+    ("vip", "file"): ("upload_file_max_size_vip", 524288000),
+    ("guest", "video"): ("upload_video_max_size_guest", 52428800),
+    ("user", "video"): ("upload_video_max_size_user", 524288000),
+    ("vip", "video"): ("upload_video_max_size_vip", 2147483648),
+}
+
+_EXTENSION_KEYS = {
+    "image": ("upload_allowed_extensions", "png,jpg,jpeg,gif,webp"),
+    "file": ("upload_file_allowed_extensions", "zip,rar,7z,tar,gz,pdf,doc,docx,xls,xlsx,ppt,pptx,txt,md"),
+    "video": ("upload_video_allowed_extensions", "mp4,webm,ogg,mov,avi,mkv"),
+}
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitTier:
+    per_minute: int
+    per_hour: int
+    per_day: int
+
+
+@dataclass(frozen=True, slots=True)
+class SettingsSnapshot:
+    """
+    Parsed, read-only view of the settings cache for hot paths.
+    Built once per cache generation; read it with current_settings().
+    """
+    generation: int
+    site_url: str
+    timezone: str
+    storage_type: str
+    registration_enabled: bool
+    guest_upload_enabled: bool
+    compression_quality: int
+    audit_enabled: bool
+    audit_provider: str
+    audit_auto_reject: bool
+    ai_analysis_enabled: bool
+    gemini_api_keys: Tuple[str, ...]
+    auto_ban_enabled: bool
+    audit_fail_threshold: int
+    rate_exceed_threshold: int
+    temp_ban_minutes: int
+    # (tier, media) -> bytes
+    max_upload_size: Mapping[Tuple[str, str], int]
+    # media -> extensions
+    allowed_extensions: Mapping[str, Tuple[str, ...]]
+    # (tier, media) -> limits
+    rate_limits: Mapping[Tuple[str, str], RateLimitTier]
+
+
+_snapshot: Optional[SettingsSnapshot] = None
+
+
+def _raw(key: str, default: str = "") -> str:
+    return _settings_cache.get(key, DEFAULTS.get(key, default))
+
+
+def _parse_int(key: str, default: int) -> int:
+    try:
+        return int(_raw(key, str(default)))
+    except (ValueError, TypeError):
+        return default
+
+
+def _parse_bool(key: str, default: bool) -> bool:
+    return _raw(key, str(default).lower()).lower() in ("true", "1", "yes", "on")
+
+
+def _parse_list(key: str, default: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in _raw(key, default).split(",") if item.strip())
+
+
+def _build_snapshot() -> SettingsSnapshot:
+    rate_limits = {
+        tier_media: RateLimitTier(
+            per_minute=_parse_int(f"{prefix}_per_minute", minute),
+            per_hour=_parse_int(f"{prefix}_per_hour", hour),
+            per_day=_parse_int(f"{prefix}_per_day", day),
+        )
+        for tier_media, (prefix, (minute, hour, day)) in _RATE_LIMIT_KEYS.items()
+    }
+    return SettingsSnapshot(
+        generation=_cache_generation,
+        site_url=_raw("general_site_url", "http://localhost:3000"),
+        timezone=_raw("general_timezone", "Asia/Shanghai"),
+        storage_type=_raw("storage_type", "local"),
+        registration_enabled=_parse_bool("general_enable_registration", True),
+        guest_upload_enabled=_parse_bool("general_enable_guest_upload", True),
+        compression_quality=_parse_int("upload_compression_quality", 85),
+        audit_enabled=_parse_bool("audit_enabled", False),
+        audit_provider=_raw("audit_provider", ""),
+        audit_auto_reject=_parse_bool("audit_auto_reject", False),
+        ai_analysis_enabled=_raw("ai_analysis_enabled", "false").lower() == "true",
+        gemini_api_keys=_parse_list("ai_gemini_api_keys", ""),
+        auto_ban_enabled=_parse_bool("security_auto_ban_enabled", True),
+        audit_fail_threshold=_parse_int("security_audit_fail_threshold", 3),
+        rate_exceed_threshold=_parse_int("security_rate_exceed_threshold", 3),
+        temp_ban_minutes=_parse_int("security_temp_ban_duration", 1440),
+        max_upload_size=MappingProxyType({
+            tier_media: _parse_int(key, default) for tier_media, (key, default) in _MAX_SIZE_KEYS.items()
+        }),
+        allowed_extensions=MappingProxyType({
+            media: _parse_list(key, default) for media, (key, default) in _EXTENSION_KEYS.items()
+        }),
+        rate_limits=MappingProxyType(rate_limits),
+    )
+
+
+def current_settings() -> SettingsSnapshot:
+    """
+    Synchronous read of the typed settings snapshot, rebuilt when the cache generation changes.
+    Reflects whatever is cached; use get_settings_snapshot() where the cache may be cold or stale.
+    """
+    global _snapshot
+    snapshot = _snapshot
+    if snapshot is None or snapshot.generation != _cache_generation:
+        snapshot = _snapshot = _build_snapshot()
+    return snapshot
+
+
+async def get_settings_snapshot() -> SettingsSnapshot:
+    """Load (or TTL-refresh) the cache if needed, then return the snapshot."""
+    if not _cache_loaded or _cache_expired():
+        await load_settings_to_cache()
+    return current_settings()
+
+
+def rate_tier(is_user: bool, is_vip: bool = False) -> str:
+    """Tier name used as the first half of the snapshot lookup keys."""
+    if is_vip:
+        return "vip"
+    return "user" if is_user else "guest"
+
+
 # Convenience functions for common settings
 async def get_site_name() -> str:
     return await get_setting("general_site_name", "PicKoala")
@@ -807,6 +1147,30 @@ async def get_public_settings() -> dict:
         "home_table_cols": await get_setting("home_table_cols", "{}"),
         "home_table_rows": await get_setting("home_table_rows", "{}"),
     }
+# Serialized get_public_settings(): (cache generation, JSON body, ETag)
+_public_payload: Optional[Tuple[int, bytes, str]] = None
+
+
+async def get_public_settings_payload() -> Tuple[bytes, str]:
+    """
+    JSON body and strong ETag for /api/site/settings, built once per cache generation.
+    The ETag is a hash of the body, so all workers agree on it for the same settings.
+    """
+    global _public_payload
+    if not _cache_loaded or _cache_expired():
+        await load_settings_to_cache()
+    cached = _public_payload
+    if cached is not None and cached[0] == _cache_generation:
+        return cached[1], cached[2]
+
+    # A change landing mid-build leaves a stale generation behind, so the next call rebuilds
+    generation = _cache_generation
+    body = json.dumps(await get_public_settings(), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = f'"{hashlib.sha256(body).hexdigest()[:32]}"'
+    _public_payload = (generation, body, etag)
+    return body, etag
+
+
 async def is_ai_analysis_enabled() -> bool:
     val = await get_setting("ai_analysis_enabled", "false")
     return val.lower() == "true"
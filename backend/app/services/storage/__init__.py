@@ -7,6 +7,7 @@ Supports:
 - oss: Aliyun OSS (native SDK)
 - cos: Tencent Cloud COS (native SDK, recommended with audit service)
 """
+from typing import Dict, Iterable, Optional, Tuple
 from app.services.storage.base import StorageBackend
 from app.services.storage.local import LocalStorage
 from app.config import get_settings
@@ -15,10 +16,24 @@ settings = get_settings()
 
 
 async def get_storage_backend_async() -> StorageBackend:
-    """Get the configured storage backend from database settings."""
-    from app.services.settings import get_storage_type, get_setting
+    """
+    Get the configured storage backend from database settings.
+    Cloud backends spill to the local spool while their circuit breaker is open
+    (STORAGE_SPOOL_ENABLED), writes fan out to replicas when STORAGE_REPLICAS is set,
+    and cloud backends are wrapped with the local disk cache when STORAGE_CACHE_ENABLED is set.
+    """
+    from app.services.settings import get_storage_type
+    return await get_storage_backend_for(await get_storage_type())
+
+
+async def build_storage_backend(storage_type: str) -> StorageBackend:
+    """
+    Build a backend of the given type from its database settings (no disk cache).
+    Any configured backend can be built, not just the active one (used by storage migration).
+    """
+    from app.services.settings import get_setting
     
-    storage_type = (await get_storage_type()).lower()
+    storage_type = (storage_type or "local").lower()
     
     if storage_type == "s3c":
         # Unified S3-compatible storage
@@ -106,6 +121,34 @@ async def get_storage_backend_async() -> StorageBackend:
         )
 
 
+async def get_storage_backend_for(storage_type: str) -> StorageBackend:
+    """
+    Get the backend that holds a record with the given storage_type.
+    Records saved on one backend stay readable after the site switches to another.
+    """
+    from app.services.storage.cache import wrap_with_cache
+    from app.services.storage.replicated import wrap_with_replication
+    from app.services.storage.spool import wrap_with_spool
+    return wrap_with_cache(await wrap_with_replication(wrap_with_spool(await build_storage_backend(storage_type))))
+
+
+async def delete_stored_files(items: Iterable[Tuple[Optional[str], Optional[str]]]) -> Dict[str, bool]:
+    """
+    Bulk delete (storage_type, file_path) pairs with one delete_many() per backend.
+    Returns {file_path: ok}; empty paths are skipped.
+    """
+    grouped: Dict[str, list] = {}
+    for storage_type, file_path in items:
+        if file_path:
+            grouped.setdefault((storage_type or "local").lower(), []).append(file_path)
+    
+    results: Dict[str, bool] = {}
+    for storage_type, paths in grouped.items():
+        storage = await get_storage_backend_for(storage_type)
+        results.update(await storage.delete_many(paths))
+    return results
+
+
 def get_storage_backend() -> StorageBackend:
     """Get the configured storage backend (sync version, uses .env settings)."""
     storage_type = settings.storage_type.lower()
@@ -148,4 +191,7 @@ __all__ = [
     "LocalStorage", 
     "get_storage_backend",
     "get_storage_backend_async",
+    "get_storage_backend_for",
+    "build_storage_backend",
+    "delete_stored_files",
 ]
@@ -1,5 +1,15 @@
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import AsyncIterator, Dict, Iterable, List, Optional, Tuple
+
+# Chunk size for streaming reads (bounded memory per reader)
+READ_CHUNK_SIZE = 64 * 1024
+
+# Max keys per bulk delete request (S3 DeleteObjects / OSS / COS limit)
+DELETE_BATCH_SIZE = 1000
+
+# Byte range for open_read: (start, end) with `end` inclusive, or (start, None) for "to EOF"
+ByteRange = Tuple[int, Optional[int]]
 
 
 class StorageBackend(ABC):
@@ -41,18 +51,120 @@ class StorageBackend(ABC):
         """
         pass
     
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        """
+        Delete several files at once.
+        
+        Returns {file_path: ok} where ok means the file no longer exists afterwards
+        (already-missing files count as deleted, matching the cloud batch APIs).
+        Default implementation runs single deletes concurrently; backends with a
+        native batch API override this.
+        """
+        paths = unique_paths(file_paths)
+        results = await asyncio.gather(*(self.delete(p) for p in paths), return_exceptions=True)
+        return {p: r is True for p, r in zip(paths, results)}
+    
     @abstractmethod
     async def exists(self, filename: str) -> bool:
         """Check if file exists in storage."""
         pass
     
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        """
+        Presign a browser-direct PUT of `file_path` (valid for `expires` seconds).
+        The client must send the returned headers unchanged, they are part of the signature.
+        
+        Returns:
+            {"method": "PUT", "url": ..., "headers": {...}}
+        
+        Raises:
+            NotImplementedError: If the backend cannot accept direct uploads (local storage)
+        """
+        raise NotImplementedError(f"{self.storage_type} storage does not support direct uploads")
+    
+    async def register_direct_upload(self, file_path: str):
+        """Bookkeeping hook for an object written by a presigned upload (e.g. schedule replica copies)."""
+        pass
+    
+    @abstractmethod
+    def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        """
+        Stream a stored file as an async iterator of byte chunks (at most READ_CHUNK_SIZE each).
+        
+        Args:
+            file_path: Relative file path (e.g., "2025/12/14/abc123.png")
+            range: Optional (start, end) byte range, `end` inclusive or None for "to EOF"
+        
+        Raises (on first iteration):
+            FileNotFoundError: If the file does not exist
+        """
+        pass
+    
+    @abstractmethod
+    async def get_size(self, file_path: str) -> int:
+        """
+        Return the size of a stored file in bytes.
+        
+        Raises:
+            FileNotFoundError: If the file does not exist
+        """
+        pass
+    
+    async def _stream_body(self, body, op: str = "read_body") -> AsyncIterator[bytes]:
+        """Drain a blocking SDK response body (anything with .read(n)) chunk by chunk in the I/O pool."""
+        try:
+            while True:
+                chunk = await self._run_blocking(op, body.read, READ_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+        finally:
+            close = getattr(body, "close", None)
+            if close:
+                try:
+                    close()
+                except Exception:
+                    pass
+    
+    @staticmethod
+    def _range_header(range: Optional[ByteRange]) -> Optional[str]:
+        """Format a ByteRange as an HTTP Range header value."""
+        if not range:
+            return None
+        start, end = range
+        return f"bytes={start}-{'' if end is None else end}"
+    
+    async def read(self, file_path: str) -> bytes:
+        """Read a whole file into memory. Prefer open_read() for anything large."""
+        chunks = []
+        async for chunk in self.open_read(file_path):
+            chunks.append(chunk)
+        return b"".join(chunks)
+    
     @abstractmethod
     def get_url(self, filename: str, is_internal: bool = False) -> str:
         """Get the URL for a file. If is_internal=True, return real cloud URL."""
         pass
     
+    async def _run_blocking(self, op: str, func, *args, **kwargs):
+        """
+        Run a blocking SDK call in this backend's bounded I/O pool.
+        `op` is the metric name (e.g. "put_object").
+        """
+        from app.services.storage.executor import run_storage_io
+        return await run_storage_io(self.storage_type, op, func, *args, **kwargs)
+    
     @property
     @abstractmethod
     def storage_type(self) -> str:
         """Return the storage type identifier."""
         pass
+
+
+def unique_paths(file_paths: Iterable[str]) -> List[str]:
+    """Drop empty and duplicate paths, keeping order."""
+    return list(dict.fromkeys(p for p in file_paths if p))
+
+
+def batched(items: List[str], size: int = DELETE_BATCH_SIZE) -> List[List[str]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
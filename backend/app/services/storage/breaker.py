@@ -0,0 +1,110 @@
+"""
+Per-backend Health Tracking and Circuit Breaker
+
+Each storage type gets one CircuitBreaker (per process):
+
+- closed: calls go through; STORAGE_BREAKER_FAILURE_THRESHOLD consecutive failures open it
+- open: calls are refused for STORAGE_BREAKER_RESET_TIMEOUT seconds
+- half_open: one probe call is let through; success closes it, failure re-opens it
+"""
+import time
+from typing import Dict, Optional
+
+from app.config import get_settings
+
+settings = get_settings()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker plus health counters for one backend."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+        self.consecutive_failures = 0
+        self.total_failures = 0
+        self.total_successes = 0
+        self.times_opened = 0
+        self.last_error: Optional[str] = None
+        self.last_failure_at: Optional[float] = None
+        self.last_success_at: Optional[float] = None
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            return HALF_OPEN
+        return self._state
+
+    def allow(self) -> bool:
+        """Whether a call may be attempted now. In half-open state only one probe is allowed."""
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and not self._probe_in_flight:
+            self._state = HALF_OPEN
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.total_successes += 1
+        self.consecutive_failures = 0
+        self.last_success_at = time.time()
+        self._probe_in_flight = False
+        self._state = CLOSED
+
+    def release(self):
+        """The call ended without a result (e.g. cancelled): let the next probe through."""
+        self._probe_in_flight = False
+
+    def record_failure(self, error: Optional[BaseException] = None):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.last_failure_at = time.time()
+        self.last_error = (str(error) or type(error).__name__)[:200] if error is not None else None
+        was_probe = self._probe_in_flight
+        self._probe_in_flight = False
+        if was_probe or self.consecutive_failures >= self.failure_threshold:
+            if self._state != OPEN:
+                self.times_opened += 1
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_successes": self.total_successes,
+            "times_opened": self.times_opened,
+            "last_error": self.last_error,
+            "last_failure_at": self.last_failure_at,
+            "last_success_at": self.last_success_at,
+        }
+
+
+_breakers: Dict[str, CircuitBreaker] = {}
+
+
+def get_breaker(storage_type: str) -> CircuitBreaker:
+    storage_type = (storage_type or "local").lower()
+    breaker = _breakers.get(storage_type)
+    if breaker is None:
+        breaker = _breakers[storage_type] = CircuitBreaker(
+            storage_type,
+            settings.storage_breaker_failure_threshold,
+            settings.storage_breaker_reset_timeout,
+        )
+    return breaker
+
+
+def get_breaker_stats() -> Dict[str, dict]:
+    return {name: breaker.stats() for name, breaker in _breakers.items()}
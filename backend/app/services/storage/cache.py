@@ -0,0 +1,394 @@
+"""
+Read-through Disk Cache for Cloud Storage
+
+CachedStorage wraps any StorageBackend and keeps recently read/written objects
+on local disk, so hot images are served without a round trip (and egress) to the
+bucket. Objects are cached on full reads and on writes, and invalidated on
+delete/overwrite. Ranged reads are served from the cache on a hit, but a ranged
+miss goes straight to the origin and is not cached.
+
+The cache directory is shared by all worker processes and is the only source of
+truth: each worker rebuilds its LRU view by scanning the blobs in a thread (on startup and every
+RESCAN_INTERVAL seconds), ordered by mtime, which hits refresh. The size cap is
+therefore enforced against what is actually on disk, blobs cached by other workers
+are hits here too, and the cache stays warm across restarts.
+
+Config (.env):
+- STORAGE_CACHE_ENABLED: wrap cloud backends (s3c/oss/cos) with the cache
+- STORAGE_CACHE_PATH: cache directory
+- STORAGE_CACHE_MAX_SIZE: total size cap in bytes
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import shutil
+import time
+import uuid
+from collections import OrderedDict
+from typing import AsyncIterator, Dict, Iterable, Optional, Tuple
+
+import aiofiles
+
+from app.config import get_settings
+from app.services.storage.base import StorageBackend, ByteRange, READ_CHUNK_SIZE
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Seconds between rescans of the cache directory (the ground truth shared by workers)
+RESCAN_INTERVAL = 300.0
+# Temp files older than this are leftovers of interrupted writes (seconds)
+TEMP_FILE_GRACE = 3600.0
+# Objects larger than max_size / MAX_OBJECT_FRACTION are never cached
+MAX_OBJECT_FRACTION = 8
+
+
+class DiskCache:
+    """Size-capped on-disk LRU keyed by storage file_path (blobs named by its sha1)."""
+
+    def __init__(self, root: str, max_size: int):
+        self.root = os.path.abspath(root)
+        self.max_size = max(0, max_size)
+        self.max_object_size = self.max_size // MAX_OBJECT_FRACTION
+        self.tmp_dir = os.path.join(self.root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        # blob key -> size, least recently used first
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self.total_size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # None until the first scan (init_storage_cache at startup, else the first rescan)
+        self._last_scan: Optional[float] = None
+        self._scanning = False
+        # Blobs admitted while a rescan runs (the scan may have missed them)
+        self._admitted_during_scan: Dict[str, int] = {}
+
+    def load(self):
+        """Initial directory scan (blocking: run it in a thread)."""
+        self._apply_scan(self._scan())
+        self._evict()
+        logger.info(f"Storage cache loaded: {len(self._entries)} objects, {self.total_size} bytes in {self.root}")
+
+    # ---------- paths ----------
+
+    @staticmethod
+    def _key(file_path: str) -> str:
+        return hashlib.sha1(file_path.encode("utf-8")).hexdigest()
+
+    def _blob(self, key: str) -> str:
+        return os.path.join(self.root, key[:2], key)
+
+    def blob_path(self, file_path: str) -> str:
+        return self._blob(self._key(file_path))
+
+    def temp_path(self) -> str:
+        return os.path.join(self.tmp_dir, uuid.uuid4().hex)
+
+    # ---------- lookup / insert / invalidate ----------
+
+    async def lookup(self, file_path: str) -> Optional[Tuple[str, int]]:
+        """Return (blob path, size) on a hit (and mark it recently used)."""
+        self._maybe_rescan()
+        key = self._key(file_path)
+        blob = self._blob(key)
+        size = await asyncio.to_thread(_touch, blob)
+        if size is None:
+            # Never cached, evicted by another worker or removed by hand
+            if key in self._entries:
+                self._drop(key)
+            self.misses += 1
+            return None
+        # Possibly cached (or rewritten) by another worker since the last scan
+        self.total_size += size - self._entries.get(key, 0)
+        self._entries[key] = size
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return blob, size
+
+    def admit(self, file_path: str, temp_file: str, size: int) -> bool:
+        """Move a fully written temp file into the cache under `file_path`."""
+        if size > self.max_object_size:
+            _remove_quietly(temp_file)
+            return False
+        key = self._key(file_path)
+        blob = self._blob(key)
+        try:
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            os.replace(temp_file, blob)
+        except OSError as e:
+            logger.warning(f"Storage cache admit failed for {file_path}: {e}")
+            _remove_quietly(temp_file)
+            return False
+        if key in self._entries:
+            self.total_size -= self._entries.pop(key)
+        self._entries[key] = size
+        self.total_size += size
+        if self._scanning:
+            self._admitted_during_scan[key] = size
+        self._evict()
+        self._maybe_rescan()
+        return True
+
+    def invalidate(self, file_path: str):
+        key = self._key(file_path)
+        if key in self._entries:
+            self._drop(key)
+        # Another worker may have cached it even if this worker has not seen it
+        _remove_quietly(self._blob(key))
+
+    def _drop(self, key: str):
+        self.total_size -= self._entries.pop(key, 0)
+
+    def _evict(self):
+        while self.total_size > self.max_size and self._entries:
+            key, size = self._entries.popitem(last=False)
+            self.total_size -= size
+            self.evictions += 1
+            _remove_quietly(self._blob(key))
+
+    # ---------- directory scan ----------
+
+    def _scan(self) -> list:
+        """(mtime, key, size) of every blob on disk, oldest first; removes stale temp files."""
+        blobs = []
+        for directory in os.scandir(self.root):
+            if not directory.is_dir() or len(directory.name) != 2:
+                continue
+            for entry in os.scandir(directory.path):
+                try:
+                    stat = entry.stat()
+                except OSError:
+                    continue
+                blobs.append((stat.st_mtime, entry.name, stat.st_size))
+        blobs.sort()
+
+        # Leftovers from interrupted writes; recent ones may belong to another worker
+        cutoff = time.time() - TEMP_FILE_GRACE
+        for entry in os.scandir(self.tmp_dir):
+            try:
+                if entry.stat().st_mtime < cutoff:
+                    os.remove(entry.path)
+            except OSError:
+                pass
+        return blobs
+
+    def _apply_scan(self, blobs: list):
+        self._entries = OrderedDict((key, size) for _, key, size in blobs)
+        for key, size in self._admitted_during_scan.items():
+            self._entries.pop(key, None)
+            self._entries[key] = size
+        self._admitted_during_scan.clear()
+        self.total_size = sum(self._entries.values())
+        self._last_scan = time.monotonic()
+
+    def _maybe_rescan(self):
+        """Re-read the directory every RESCAN_INTERVAL: picks up other workers' blobs and sizes."""
+        if self._scanning:
+            return
+        if self._last_scan is not None and time.monotonic() - self._last_scan < RESCAN_INTERVAL:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        self._scanning = True
+        loop.run_in_executor(None, self._scan).add_done_callback(self._scan_done)
+
+    def _scan_done(self, future: asyncio.Future):
+        self._scanning = False
+        try:
+            blobs = future.result()
+        except Exception as e:
+            logger.warning(f"Storage cache rescan failed: {e}")
+            self._admitted_during_scan.clear()
+            self._last_scan = time.monotonic()
+            return
+        self._apply_scan(blobs)
+        self._evict()
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "path": self.root,
+            "objects": len(self._entries),
+            "size": self.total_size,
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+        }
+
+
+def _touch(path: str) -> Optional[int]:
+    """Refresh the blob's mtime (recency shared with other workers and rescans); its size, None if missing."""
+    try:
+        os.utime(path)
+        return os.path.getsize(path)
+    except OSError:
+        return None
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class CachedStorage(StorageBackend):
+    """Read-through / write-through disk cache in front of another backend."""
+
+    def __init__(self, inner: StorageBackend, cache: DiskCache):
+        self.inner = inner
+        self.cache = cache
+
+    # ---------- writes ----------
+
+    async def save(self, content: bytes, filename: str, date_path: Optional[str] = None) -> str:
+        relative_path = await self.inner.save(content, filename, date_path)
+        self.cache.invalidate(relative_path)
+        if len(content) <= self.cache.max_object_size:
+            temp_file = self.cache.temp_path()
+            async with aiofiles.open(temp_file, "wb") as f:
+                await f.write(content)
+            self.cache.admit(relative_path, temp_file, len(content))
+        return relative_path
+
+    async def save_from_path(self, local_path: str, filename: str, date_path: Optional[str] = None) -> str:
+        relative_path = await self.inner.save_from_path(local_path, filename, date_path)
+        self.cache.invalidate(relative_path)
+        size = os.path.getsize(local_path)
+        if size <= self.cache.max_object_size:
+            temp_file = self.cache.temp_path()
+            await asyncio.to_thread(shutil.copyfile, local_path, temp_file)
+            self.cache.admit(relative_path, temp_file, size)
+        return relative_path
+
+    async def delete(self, file_path: str) -> bool:
+        self.cache.invalidate(file_path)
+        return await self.inner.delete(file_path)
+
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        paths = list(file_paths)
+        for path in paths:
+            if path:
+                self.cache.invalidate(path)
+        return await self.inner.delete_many(paths)
+
+    # ---------- reads ----------
+
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        hit = await self.cache.lookup(file_path)
+        if hit:
+            async for chunk in _read_file(hit[0], range):
+                yield chunk
+            return
+
+        if range:
+            async for chunk in self.inner.open_read(file_path, range):
+                yield chunk
+            return
+
+        # Miss: stream from origin and tee into a temp file, admitted only if fully read
+        temp_file = self.cache.temp_path()
+        size = 0
+        complete = False
+        f = await aiofiles.open(temp_file, "wb")
+        try:
+            async for chunk in self.inner.open_read(file_path):
+                size += len(chunk)
+                if f is not None:
+                    if size > self.cache.max_object_size:
+                        await f.close()
+                        f = None
+                        _remove_quietly(temp_file)
+                    else:
+                        await f.write(chunk)
+                yield chunk
+            complete = True
+        finally:
+            if f is not None:
+                await f.close()
+                if complete:
+                    self.cache.admit(file_path, temp_file, size)
+                else:
+                    _remove_quietly(temp_file)
+
+    async def get_size(self, file_path: str) -> int:
+        hit = await self.cache.lookup(file_path)
+        if hit:
+            return hit[1]
+        return await self.inner.get_size(file_path)
+
+    async def exists(self, file_path: str) -> bool:
+        if await asyncio.to_thread(os.path.isfile, self.cache.blob_path(file_path)):
+            return True
+        return await self.inner.exists(file_path)
+
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        return self.inner.create_presigned_upload(file_path, content_type, expires)
+    
+    async def register_direct_upload(self, file_path: str):
+        await self.inner.register_direct_upload(file_path)
+    
+    def get_url(self, file_path: str, is_internal: bool = False) -> str:
+        return self.inner.get_url(file_path, is_internal)
+
+    @property
+    def storage_type(self) -> str:
+        # Records keep the origin type; the cache is transparent
+        return self.inner.storage_type
+
+
+async def _read_file(path: str, range: Optional[ByteRange]) -> AsyncIterator[bytes]:
+    start, end = range if range else (0, None)
+    remaining = None if end is None else end - start + 1
+    async with aiofiles.open(path, "rb") as f:
+        if start:
+            await f.seek(start)
+        while remaining is None or remaining > 0:
+            size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+            chunk = await f.read(size)
+            if not chunk:
+                break
+            if remaining is not None:
+                remaining -= len(chunk)
+            yield chunk
+
+
+_disk_cache: Optional[DiskCache] = None
+
+
+def get_disk_cache() -> DiskCache:
+    """
+    Process-wide cache instance (backends are rebuilt per request, the cache is not).
+    Without init_storage_cache() (e.g. scripts) it starts empty and the first lookup
+    schedules the directory scan in a thread.
+    """
+    global _disk_cache
+    if _disk_cache is None:
+        _disk_cache = DiskCache(settings.storage_cache_path, settings.storage_cache_max_size)
+    return _disk_cache
+
+
+async def init_storage_cache():
+    """Create the cache and scan its directory off the event loop (called at startup)."""
+    global _disk_cache
+    if settings.storage_cache_enabled and _disk_cache is None:
+        cache = DiskCache(settings.storage_cache_path, settings.storage_cache_max_size)
+        await asyncio.to_thread(cache.load)
+        _disk_cache = cache
+
+
+def wrap_with_cache(backend: StorageBackend) -> StorageBackend:
+    """Wrap a cloud backend with the disk cache when STORAGE_CACHE_ENABLED is set."""
+    if not settings.storage_cache_enabled or backend.storage_type == "local":
+        return backend
+    return CachedStorage(backend, get_disk_cache())
+
+
+def get_storage_cache_stats() -> Optional[dict]:
+    return _disk_cache.stats() if _disk_cache else None
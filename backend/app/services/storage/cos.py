@@ -6,8 +6,9 @@ Recommended when using Tencent Cloud's content moderation (audit) service.
 
 For S3-compatible mode, use S3CompatibleStorage with provider='cos' instead.
 """
-from typing import Optional
-from app.services.storage.base import StorageBackend
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from app.services.storage.base import StorageBackend, ByteRange, unique_paths, batched
 from app.config import get_settings
 import logging
 
@@ -104,7 +105,9 @@ class COSStorage(StorageBackend):
             
             # Use put_object for bytes content
             from io import BytesIO
-            self.client.put_object(
+            await self._run_blocking(
+                "put_object",
+                self.client.put_object,
                 Bucket=self.bucket,
                 Body=BytesIO(content),
                 Key=key,
@@ -125,7 +128,9 @@ class COSStorage(StorageBackend):
         """
         try:
             key = f"images/{file_path}"
-            self.client.delete_object(
+            await self._run_blocking(
+                "delete_object",
+                self.client.delete_object,
                 Bucket=self.bucket,
                 Key=key,
             )
@@ -135,6 +140,37 @@ class COSStorage(StorageBackend):
             logger.error(f"Error deleting file from COS {file_path}: {e}")
             return False
     
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        """Delete files with delete_objects, up to 1000 keys per request."""
+        paths = unique_paths(file_paths)
+        batches = await asyncio.gather(*(self._delete_batch(batch) for batch in batched(paths)))
+        results = {}
+        for batch_result in batches:
+            results.update(batch_result)
+        return results
+    
+    async def _delete_batch(self, paths: List[str]) -> Dict[str, bool]:
+        try:
+            response = await self._run_blocking(
+                "delete_objects",
+                self.client.delete_objects,
+                Bucket=self.bucket,
+                Delete={"Object": [{"Key": f"images/{p}"} for p in paths], "Quiet": "true"},
+            )
+        except Exception as e:
+            logger.error(f"Error bulk deleting {len(paths)} files from COS: {e}")
+            return {p: False for p in paths}
+        
+        # Quiet mode: only failures are reported (a single error may come back as a dict)
+        errors = (response or {}).get("Error", [])
+        if isinstance(errors, dict):
+            errors = [errors]
+        failed = {err.get("Key") for err in errors}
+        for err in errors:
+            logger.error(f"Error deleting {err.get('Key')} from COS: {err.get('Code')} {err.get('Message')}")
+        logger.info(f"Bulk deleted {len(paths) - len(failed)}/{len(paths)} files from COS")
+        return {p: f"images/{p}" not in failed for p in paths}
+    
     async def exists(self, file_path: str) -> bool:
         """
         Check if file exists in Tencent Cloud COS.
@@ -144,7 +180,9 @@ class COSStorage(StorageBackend):
         """
         try:
             key = f"images/{file_path}"
-            self.client.head_object(
+            await self._run_blocking(
+                "head_object",
+                self.client.head_object,
                 Bucket=self.bucket,
                 Key=key,
             )
@@ -152,6 +190,57 @@ class COSStorage(StorageBackend):
         except Exception:
             return False
     
+    @staticmethod
+    def _is_not_found(error) -> bool:
+        return error.get_status_code() == 404 or error.get_error_code() in ("NoSuchKey", "NoSuchResource")
+    
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        """Stream an object via get_object, passing `range` through as an HTTP Range header."""
+        from qcloud_cos.cos_exception import CosServiceError
+        
+        key = f"images/{file_path}"
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if range:
+            kwargs["Range"] = self._range_header(range)
+        try:
+            response = await self._run_blocking("get_object", self.client.get_object, **kwargs)
+        except CosServiceError as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(file_path)
+            raise
+        async for chunk in self._stream_body(response["Body"].get_raw_stream()):
+            yield chunk
+    
+    async def get_size(self, file_path: str) -> int:
+        """Return the object size from head_object."""
+        from qcloud_cos.cos_exception import CosServiceError
+        
+        key = f"images/{file_path}"
+        try:
+            response = await self._run_blocking(
+                "head_object",
+                self.client.head_object,
+                Bucket=self.bucket,
+                Key=key,
+            )
+        except CosServiceError as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(file_path)
+            raise
+        return int(response["Content-Length"])
+    
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        """Presigned PUT URL (Content-Type is signed)."""
+        headers = {"Content-Type": content_type}
+        url = self.client.get_presigned_url(
+            Method="PUT",
+            Bucket=self.bucket,
+            Key=f"images/{file_path}",
+            Expired=expires,
+            Headers=headers,
+        )
+        return {"method": "PUT", "url": url, "headers": headers}
+    
     def get_url(self, file_path: str, is_internal: bool = False) -> str:
         """Get common URL for COS."""
         key = f"images/{file_path}"
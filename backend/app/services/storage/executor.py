@@ -0,0 +1,138 @@
+"""
+Storage I/O Executor
+
+The cloud SDKs (boto3, oss2, cos-python-sdk-v5) are blocking. Every SDK call is
+dispatched to a bounded thread pool dedicated to its backend type, so a slow
+bucket neither freezes the event loop nor starves the other backends.
+
+Pool sizes come from .env:
+- STORAGE_IO_MAX_WORKERS: default per-backend limit
+- STORAGE_IO_MAX_WORKERS_PER_BACKEND: overrides, e.g. "s3c=32,oss=8"
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict
+
+from app.config import get_settings
+from app.utils.metrics import parse_overrides, percentile
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# Number of recent samples kept for percentile calculation
+LATENCY_SAMPLE_SIZE = 1000
+
+
+class StorageExecutor:
+    """Bounded thread pool plus latency metrics for one storage backend type."""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"storage_{name}_")
+        # Counters are only touched from the event loop thread
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self._ops: Dict[str, dict] = {}
+
+    async def run(self, op: str, func: Callable, *args, **kwargs) -> Any:
+        """Run a blocking SDK call in the pool and record its latency under `op`."""
+        loop = asyncio.get_running_loop()
+        submitted = time.perf_counter()
+        started = [submitted]
+
+        def _call():
+            started[0] = time.perf_counter()
+            return func(*args, **kwargs)
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        failed = False
+        try:
+            return await loop.run_in_executor(self._executor, _call)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self.in_flight -= 1
+            finished = time.perf_counter()
+            self._record(op, (finished - submitted) * 1000, (started[0] - submitted) * 1000, failed)
+
+    def _record(self, op: str, latency_ms: float, queue_ms: float, failed: bool):
+        stats = self._ops.get(op)
+        if stats is None:
+            stats = self._ops[op] = {
+                "calls": 0,
+                "errors": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "queue_total_ms": 0.0,
+                "samples": deque(maxlen=LATENCY_SAMPLE_SIZE),
+            }
+        stats["calls"] += 1
+        if failed:
+            stats["errors"] += 1
+        stats["total_ms"] += latency_ms
+        stats["max_ms"] = max(stats["max_ms"], latency_ms)
+        stats["queue_total_ms"] += queue_ms
+        stats["samples"].append(latency_ms)
+
+    def stats(self) -> dict:
+        ops = {}
+        for op, s in self._ops.items():
+            samples = sorted(s["samples"])
+            ops[op] = {
+                "calls": s["calls"],
+                "errors": s["errors"],
+                "avg_ms": round(s["total_ms"] / s["calls"], 2) if s["calls"] else 0,
+                "avg_queue_ms": round(s["queue_total_ms"] / s["calls"], 2) if s["calls"] else 0,
+                "p50_ms": round(percentile(samples, 0.50), 2),
+                "p95_ms": round(percentile(samples, 0.95), 2),
+                "p99_ms": round(percentile(samples, 0.99), 2),
+                "max_ms": round(s["max_ms"], 2),
+            }
+        return {
+            "max_workers": self.max_workers,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "operations": ops,
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False)
+
+
+_executors: Dict[str, StorageExecutor] = {}
+
+
+def get_storage_executor(name: str) -> StorageExecutor:
+    """Get (or lazily create) the executor for a backend type (s3c, oss, cos, ...)."""
+    executor = _executors.get(name)
+    if executor is None:
+        overrides = parse_overrides(
+            settings.storage_io_max_workers_per_backend, lambda count: max(1, int(count)), "storage I/O worker override"
+        )
+        max_workers = overrides.get(name, max(1, settings.storage_io_max_workers))
+        executor = _executors[name] = StorageExecutor(name, max_workers)
+        logger.info(f"Storage I/O pool created: backend={name}, max_workers={max_workers}")
+    return executor
+
+
+async def run_storage_io(name: str, op: str, func: Callable, *args, **kwargs) -> Any:
+    """Shortcut for get_storage_executor(name).run(op, func, ...)."""
+    return await get_storage_executor(name).run(op, partial(func, *args, **kwargs))
+
+
+def get_storage_io_stats() -> Dict[str, dict]:
+    """Per-backend concurrency and latency metrics (for admin diagnosis)."""
+    return {name: executor.stats() for name, executor in _executors.items()}
+
+
+def shutdown_storage_executors():
+    for executor in _executors.values():
+        executor.shutdown()
+    _executors.clear()
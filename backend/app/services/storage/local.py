@@ -1,7 +1,10 @@
 import os
+import uuid
+import shutil
+import asyncio
 import aiofiles
-from typing import Optional
-from app.services.storage.base import StorageBackend
+from typing import AsyncIterator, Dict, Iterable, Optional
+from app.services.storage.base import StorageBackend, ByteRange, READ_CHUNK_SIZE, unique_paths
 from app.config import get_settings
 import logging
 
@@ -9,10 +12,44 @@ settings = get_settings()
 logger = logging.getLogger(__name__)
 
 
+def _fsync_dir(dir_path: str):
+    """Persist a rename by fsyncing its directory (not supported on Windows)."""
+    if os.name == "nt":
+        return
+    fd = os.open(dir_path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _atomic_write(file_path: str, write):
+    """
+    Write via a temp file in the target directory, fsync it, then rename over the
+    target, so readers never see a partially written file. Blocking.
+    """
+    folder_path = os.path.dirname(file_path)
+    os.makedirs(folder_path, exist_ok=True)
+    tmp_path = os.path.join(folder_path, f".{os.path.basename(file_path)}.tmp-{uuid.uuid4().hex}")
+    try:
+        with open(tmp_path, 'wb') as f:
+            write(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+        _fsync_dir(folder_path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
 class LocalStorage(StorageBackend):
     """Local filesystem storage backend."""
     
-    def __init__(self, public_url: Optional[str] = None):
+    def __init__(self, public_url: Optional[str] = None, root: Optional[str] = None):
         """
         Initialize local storage.
         
@@ -20,8 +57,9 @@ class LocalStorage(StorageBackend):
             public_url: Optional custom public URL (CDN domain) for accessing files.
                        If provided, URLs will be generated as {public_url}/uploads/{file_path}
                        If not provided, URLs will be /uploads/{file_path} (relative)
+            root: Directory to store files in (default: UPLOAD_PATH)
         """
-        self.upload_path = settings.upload_path
+        self.upload_path = root or settings.upload_path
         self.public_url = public_url.rstrip('/') if public_url and public_url.strip() else None
         os.makedirs(self.upload_path, exist_ok=True)
         
@@ -49,26 +87,10 @@ class LocalStorage(StorageBackend):
         if date_path and ('..' in date_path or date_path.startswith('/') or date_path.startswith('\\')):
             raise ValueError(f"Invalid date_path: {date_path}")
         
-        if date_path:
-            # Create date-based folder structure
-            folder_path = os.path.join(self.upload_path, date_path)
-            os.makedirs(folder_path, exist_ok=True)
-            file_path = os.path.join(folder_path, filename)
-            relative_path = f"{date_path}/{filename}"
-        else:
-            # Legacy: flat structure for backward compatibility
-            file_path = os.path.join(self.upload_path, filename)
-            relative_path = filename
-        
-        # Additional security: verify final path is within upload_path
-        normalized_path = os.path.normpath(file_path)
-        normalized_upload = os.path.normpath(self.upload_path)
-        if not normalized_path.startswith(normalized_upload):
-            raise ValueError(f"Path escape attempt: {file_path}")
+        file_path, relative_path = self._target_path(filename, date_path)
         
         try:
-            async with aiofiles.open(file_path, 'wb') as f:
-                await f.write(content)
+            await asyncio.to_thread(_atomic_write, file_path, lambda f: f.write(content))
             logger.info(f"Saved file to: {file_path}")
             return relative_path
         except Exception as e:
@@ -82,30 +104,14 @@ class LocalStorage(StorageBackend):
             raise ValueError(f"Invalid filename: {filename}")
         if date_path and ('..' in date_path or date_path.startswith('/') or date_path.startswith('\\')):
             raise ValueError(f"Invalid date_path: {date_path}")
-            
-        if date_path:
-            folder_path = os.path.join(self.upload_path, date_path)
-            os.makedirs(folder_path, exist_ok=True)
-            file_path = os.path.join(folder_path, filename)
-            relative_path = f"{date_path}/{filename}"
-        else:
-            file_path = os.path.join(self.upload_path, filename)
-            relative_path = filename
-
-        # Additional security
-        normalized_path = os.path.normpath(file_path)
-        normalized_upload = os.path.normpath(self.upload_path)
-        if not normalized_path.startswith(normalized_upload):
-             raise ValueError(f"Path escape attempt: {file_path}")
+        
+        file_path, relative_path = self._target_path(filename, date_path)
 
         try:
-            import shutil
-            # Using copy2 to preserve metadata if possible, but copyfile is fine too.
-            # Running in thread pool because shutil is blocking
-            import asyncio
-            from functools import partial
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, partial(shutil.copy2, local_path, file_path))
+            def copy(dst):
+                with open(local_path, 'rb') as src:
+                    shutil.copyfileobj(src, dst, READ_CHUNK_SIZE * 16)
+            await asyncio.to_thread(_atomic_write, file_path, copy)
             
             logger.info(f"Saved file (from path) to: {file_path}")
             return relative_path
@@ -113,6 +119,23 @@ class LocalStorage(StorageBackend):
             logger.error(f"Error saving file from path {filename}: {e}")
             raise
 
+    def _target_path(self, filename: str, date_path: Optional[str]) -> tuple:
+        """Absolute target path and the relative path stored in the database."""
+        if date_path:
+            # Date/hash folder structure (see app.utils.date_path.get_storage_dir)
+            file_path = os.path.join(self.upload_path, date_path, filename)
+            relative_path = f"{date_path}/{filename}"
+        else:
+            # Legacy: flat structure for backward compatibility
+            file_path = os.path.join(self.upload_path, filename)
+            relative_path = filename
+        
+        # Additional security: verify final path is within upload_path
+        normalized_path = os.path.normpath(file_path)
+        normalized_upload = os.path.normpath(self.upload_path)
+        if not normalized_path.startswith(normalized_upload):
+            raise ValueError(f"Path escape attempt: {file_path}")
+        return file_path, relative_path
     
     async def delete(self, file_path: str) -> bool:
         """
@@ -149,6 +172,35 @@ class LocalStorage(StorageBackend):
             logger.error(f"Error deleting file {file_path}: {e}")
             return False
     
+    def _unlink(self, file_path: str) -> bool:
+        """Blocking unlink used by delete_many; a missing file counts as deleted."""
+        if '..' in file_path or file_path.startswith('/') or file_path.startswith('\\'):
+            logger.warning(f"Invalid file_path for deletion: {file_path}")
+            return False
+        
+        full_path = os.path.join(self.upload_path, file_path)
+        if not os.path.normpath(full_path).startswith(os.path.normpath(self.upload_path)):
+            logger.warning(f"Path escape attempt in delete: {file_path}")
+            return False
+        
+        try:
+            os.remove(full_path)
+            return True
+        except FileNotFoundError:
+            return True
+        except Exception as e:
+            logger.error(f"Error deleting file {file_path}: {e}")
+            return False
+    
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        """Delete several local files with concurrent unlinks in worker threads."""
+        paths = unique_paths(file_paths)
+        results = await asyncio.gather(*(asyncio.to_thread(self._unlink, p) for p in paths))
+        deleted = sum(results)
+        if paths:
+            logger.info(f"Bulk deleted {deleted}/{len(paths)} local files")
+        return dict(zip(paths, results))
+    
     async def exists(self, file_path: str) -> bool:
         """
         Check if file exists in local filesystem.
@@ -173,6 +225,40 @@ class LocalStorage(StorageBackend):
         
         return os.path.exists(full_path)
     
+    def _resolve_read_path(self, file_path: str) -> str:
+        """Map a relative file path to an absolute path, rejecting traversal and missing files."""
+        if '..' in file_path or file_path.startswith('/') or file_path.startswith('\\'):
+            raise FileNotFoundError(file_path)
+        
+        full_path = os.path.join(self.upload_path, file_path)
+        normalized_path = os.path.normpath(full_path)
+        normalized_upload = os.path.normpath(self.upload_path)
+        if not normalized_path.startswith(normalized_upload) or not os.path.isfile(full_path):
+            raise FileNotFoundError(file_path)
+        return full_path
+    
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        """Stream a local file in READ_CHUNK_SIZE chunks, optionally limited to a byte range."""
+        full_path = self._resolve_read_path(file_path)
+        start, end = range if range else (0, None)
+        remaining = None if end is None else end - start + 1
+        
+        async with aiofiles.open(full_path, 'rb') as f:
+            if start:
+                await f.seek(start)
+            while remaining is None or remaining > 0:
+                size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = await f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+    
+    async def get_size(self, file_path: str) -> int:
+        """Return the local file size in bytes."""
+        return os.path.getsize(self._resolve_read_path(file_path))
+    
     def get_url(self, file_path: str, is_internal: bool = False) -> str:
         """
         Get the URL for a file.
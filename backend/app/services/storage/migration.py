@@ -0,0 +1,381 @@
+"""
+Storage Migration
+
+Copies Image/File objects from one storage backend to another (e.g. local -> s3c)
+and repoints their rows, so a site can switch backends without hand-written scripts.
+
+- N concurrent transfers, optional shared bandwidth cap (KB/s)
+- Each object is streamed through a temp file (bounded memory), size-checked and
+  optionally read back from the target and compared by SHA256
+- Rows are updated in batches together with the job checkpoint (last_image_id /
+  last_file_id), so a crashed or paused job resumes after the last committed batch
+- A running job touches its row every HEARTBEAT_INTERVAL; resuming claims the job
+  with a conditional UPDATE, so it never runs in two workers at once
+- Source objects are never deleted; failed objects stay on the source and are
+  recorded in storage_migration_failures
+
+Entry points: admin API (/api/admin/storage-migration) and `python migrate_storage.py`.
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from sqlalchemy import select, func, update, or_
+
+from app.database import AsyncSessionLocal
+from app.models.image import Image
+from app.models.file import File
+from app.models.storage_migration import StorageMigrationJob, StorageMigrationFailure, MigrationStatus
+from app.services.storage.base import StorageBackend
+from app.services.storage.transfer import BandwidthLimiter, copy_object
+
+logger = logging.getLogger(__name__)
+
+# Rows per checkpoint (copied, then updated + checkpointed in one transaction)
+BATCH_SIZE = 100
+# A RUNNING job whose row has not been touched for this long is considered crashed
+STALE_AFTER = timedelta(minutes=5)
+# Seconds between updated_at touches while a batch is copying (well below STALE_AFTER)
+HEARTBEAT_INTERVAL = 60
+
+
+class _Progress:
+    """Live counters for throughput reporting (per process)."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.bytes = 0
+        self.objects = 0
+
+    def snapshot(self, remaining_objects: int) -> dict:
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        objects_per_second = self.objects / elapsed
+        return {
+            "bytes_per_second": round(self.bytes / elapsed, 1),
+            "objects_per_second": round(objects_per_second, 2),
+            "eta_seconds": int(remaining_objects / objects_per_second) if objects_per_second > 0 else None,
+        }
+
+
+_running: Dict[int, asyncio.Task] = {}
+_progress: Dict[int, _Progress] = {}
+
+
+class MigrationError(Exception):
+    """Raised when a migration job cannot be created or resumed."""
+    pass
+
+
+class StorageMigrator:
+    """Runs one migration job to completion (or until paused/cancelled)."""
+
+    def __init__(self, job_id: int):
+        self.job_id = job_id
+        self.progress = _progress.setdefault(job_id, _Progress())
+        self.source: Optional[StorageBackend] = None
+        self.target: Optional[StorageBackend] = None
+        self.limiter: Optional[BandwidthLimiter] = None
+        self.verify_checksum = True
+
+    async def run(self):
+        from app.services.storage import build_storage_backend
+
+        async with AsyncSessionLocal() as db:
+            job = await db.get(StorageMigrationJob, self.job_id)
+            if not job:
+                raise MigrationError(f"Migration job {self.job_id} not found")
+            try:
+                self.source = await build_storage_backend(job.source_type)
+                self.target = await build_storage_backend(job.target_type)
+            except Exception as e:
+                await self._finish(db, job, MigrationStatus.FAILED, f"Failed to initialize storage: {e}")
+                return
+            self.limiter = BandwidthLimiter(job.max_bandwidth * 1024) if job.max_bandwidth else None
+            self.verify_checksum = job.verify_checksum
+            self.semaphore = asyncio.Semaphore(max(1, job.concurrency))
+
+            job.status = MigrationStatus.RUNNING
+            job.started_at = job.started_at or datetime.utcnow()
+            job.completed_at = None
+            job.error_message = None
+            job.total_objects = job.migrated_objects + job.failed_objects + await self._count_remaining(db, job)
+            await db.commit()
+            logger.info(f"[Migration {job.id}] {job.source_type} -> {job.target_type}: "
+                        f"{job.total_objects} objects, concurrency={job.concurrency}, max_bandwidth={job.max_bandwidth}KB/s")
+
+            try:
+                kinds = ("image", "file") if job.include_files else ("image",)
+                for kind in kinds:
+                    while True:
+                        # Pause/cancel is written to the row by the admin API (possibly from another worker)
+                        await db.refresh(job, ["status"])
+                        if job.status in (MigrationStatus.PAUSED, MigrationStatus.CANCELLED):
+                            await self._finish(db, job, job.status)
+                            return
+                        records = await self._next_batch(db, job, kind)
+                        if not records:
+                            break
+                        await self._migrate_batch(db, job, kind, records)
+            except Exception as e:
+                logger.error(f"[Migration {job.id}] Aborted: {e}", exc_info=True)
+                await db.rollback()
+                job = await db.get(StorageMigrationJob, self.job_id)
+                await self._finish(db, job, MigrationStatus.FAILED, str(e)[:2000])
+                return
+
+            await self._finish(db, job, MigrationStatus.COMPLETED)
+
+    # ---------- selection ----------
+
+    def _source_filter(self, model, source_type: str):
+        if source_type == "local":
+            return or_(model.storage_type == "local", model.storage_type.is_(None))
+        return model.storage_type == source_type
+
+    async def _count_remaining(self, db, job: StorageMigrationJob) -> int:
+        total = await db.scalar(
+            select(func.count(Image.id)).where(self._source_filter(Image, job.source_type), Image.id > job.last_image_id)
+        ) or 0
+        if job.include_files:
+            total += await db.scalar(
+                select(func.count(File.id)).where(self._source_filter(File, job.source_type), File.id > job.last_file_id)
+            ) or 0
+        return total
+
+    async def _next_batch(self, db, job: StorageMigrationJob, kind: str) -> list:
+        model = Image if kind == "image" else File
+        cursor = job.last_image_id if kind == "image" else job.last_file_id
+        result = await db.execute(
+            select(model)
+            .where(self._source_filter(model, job.source_type), model.id > cursor)
+            .order_by(model.id)
+            .limit(BATCH_SIZE)
+        )
+        return list(result.scalars().all())
+
+    # ---------- transfer ----------
+
+    async def _migrate_batch(self, db, job: StorageMigrationJob, kind: str, records: list):
+        # A batch of large objects can take longer than STALE_AFTER to copy
+        heartbeat = asyncio.create_task(self._heartbeat())
+        try:
+            outcomes = await asyncio.gather(*(self._migrate_record(kind, record) for record in records))
+        finally:
+            heartbeat.cancel()
+
+        model = Image if kind == "image" else File
+        target_type = self.target.storage_type
+        row_updates = []
+        batch_bytes = 0
+        for record, (ok, transferred, failed_path, error) in zip(records, outcomes):
+            batch_bytes += transferred
+            if ok:
+                url = self.target.get_url(record.file_path)
+                row_updates.append({
+                    "id": record.id,
+                    "storage_type": target_type,
+                    "storage_url": url if url.startswith("http") else None,
+                })
+            else:
+                db.add(StorageMigrationFailure(
+                    job_id=job.id,
+                    record_type=kind,
+                    record_id=record.id,
+                    file_path=failed_path[:500],
+                    error_message=error[:500],
+                ))
+
+        # Rows + checkpoint in one transaction
+        if row_updates:
+            await db.execute(update(model), row_updates)
+        if kind == "image":
+            job.last_image_id = records[-1].id
+        else:
+            job.last_file_id = records[-1].id
+        job.migrated_objects += len(row_updates)
+        job.failed_objects += len(records) - len(row_updates)
+        job.bytes_transferred += batch_bytes
+        await db.commit()
+
+        self.progress.objects += len(records)
+        logger.info(f"[Migration {job.id}] {kind} batch up to id {records[-1].id}: "
+                    f"{len(row_updates)}/{len(records)} ok, {job.migrated_objects}/{job.total_objects} total")
+
+    async def _heartbeat(self):
+        """Touch the job row until cancelled, so other workers do not take the job for crashed."""
+        while True:
+            await asyncio.sleep(HEARTBEAT_INTERVAL)
+            try:
+                async with AsyncSessionLocal() as db:
+                    await db.execute(
+                        update(StorageMigrationJob)
+                        .where(StorageMigrationJob.id == self.job_id, StorageMigrationJob.status == MigrationStatus.RUNNING)
+                        .values(updated_at=datetime.utcnow())
+                    )
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"[Migration {self.job_id}] Heartbeat failed: {e}")
+
+    async def _migrate_record(self, kind: str, record) -> tuple:
+        """Returns (ok, bytes_transferred, failed_path, error)."""
+        paths = [record.file_path]
+        if kind == "file" and record.thumbnail_path:
+            paths.append(record.thumbnail_path)
+
+        transferred = 0
+        async with self.semaphore:
+            for path in paths:
+                try:
+                    transferred += await self._transfer(path)
+                except Exception as e:
+                    logger.warning(f"[Migration {self.job_id}] {kind} {record.id} ({path}) failed: {e}")
+                    return False, transferred, path, f"{e.__class__.__name__}: {e}"
+        return True, transferred, None, None
+
+    async def _transfer(self, path: str) -> int:
+        """Copy one object source -> target and verify it."""
+        size = await copy_object(self.source, self.target, path, self.limiter, self.verify_checksum)
+        self.progress.bytes += size
+        return size
+
+    async def _finish(self, db, job: StorageMigrationJob, status: MigrationStatus, error: Optional[str] = None):
+        job.status = status
+        job.error_message = error
+        if status in (MigrationStatus.COMPLETED, MigrationStatus.FAILED, MigrationStatus.CANCELLED):
+            job.completed_at = datetime.utcnow()
+        await db.commit()
+        logger.info(f"[Migration {job.id}] {status.value}: {job.migrated_objects} migrated, "
+                    f"{job.failed_objects} failed, {job.bytes_transferred} bytes")
+
+
+# ---------- job control ----------
+
+async def create_migration_job(
+    db,
+    source_type: str,
+    target_type: str,
+    concurrency: int = 4,
+    max_bandwidth: Optional[int] = None,
+    verify_checksum: bool = True,
+    include_files: bool = True,
+    triggered_by: Optional[int] = None,
+) -> StorageMigrationJob:
+    source_type, target_type = source_type.lower(), target_type.lower()
+    if source_type == target_type:
+        raise MigrationError("Source and target storage must differ")
+
+    active = await db.scalar(
+        select(func.count(StorageMigrationJob.id)).where(StorageMigrationJob.status == MigrationStatus.RUNNING)
+    )
+    if active:
+        raise MigrationError("Another migration job is already running")
+
+    # Fail fast on incomplete configuration
+    from app.services.storage import build_storage_backend
+    for storage_type in (source_type, target_type):
+        try:
+            backend = await build_storage_backend(storage_type)
+        except Exception as e:
+            raise MigrationError(f"Storage '{storage_type}' is not configured: {e}")
+        if storage_type != "local" and backend.storage_type == "local":
+            raise MigrationError(f"Unknown storage type: {storage_type}")
+
+    job = StorageMigrationJob(
+        source_type=source_type,
+        target_type=target_type,
+        concurrency=concurrency,
+        max_bandwidth=max_bandwidth,
+        verify_checksum=verify_checksum,
+        include_files=include_files,
+        triggered_by=triggered_by,
+        status=MigrationStatus.PENDING,
+    )
+    db.add(job)
+    await db.commit()
+    await db.refresh(job)
+    return job
+
+
+async def run_migration_job(job_id: int):
+    """Run a job in the current task (used by the CLI and by start_migration_job)."""
+    try:
+        await StorageMigrator(job_id).run()
+    finally:
+        _running.pop(job_id, None)
+
+
+def start_migration_job(job_id: int) -> asyncio.Task:
+    """Run a job in the background of this process."""
+    _progress[job_id] = _Progress()
+    task = asyncio.create_task(run_migration_job(job_id))
+    _running[job_id] = task
+    return task
+
+
+async def resume_migration_job(db, job_id: int, start: bool = True) -> StorageMigrationJob:
+    """Check a job can be resumed and (unless start=False, e.g. the CLI runs it itself) restart it."""
+    job = await db.get(StorageMigrationJob, job_id)
+    if not job:
+        raise MigrationError("Migration job not found")
+    if job_id in _running:
+        raise MigrationError("Migration job is already running")
+    if job.status in (MigrationStatus.COMPLETED, MigrationStatus.CANCELLED):
+        raise MigrationError(f"Migration job is {job.status.value}")
+    # Claim the job with a conditional UPDATE: a RUNNING job with a recent heartbeat is
+    # running in another worker process, and of two concurrent resumes only one wins
+    now = datetime.utcnow()
+    claim = await db.execute(
+        update(StorageMigrationJob)
+        .where(
+            StorageMigrationJob.id == job_id,
+            StorageMigrationJob.status.notin_((MigrationStatus.COMPLETED, MigrationStatus.CANCELLED)),
+            or_(
+                StorageMigrationJob.status != MigrationStatus.RUNNING,
+                StorageMigrationJob.updated_at.is_(None),
+                StorageMigrationJob.updated_at < now - STALE_AFTER,
+            ),
+        )
+        .values(status=MigrationStatus.RUNNING, updated_at=now)
+    )
+    await db.commit()
+    if not claim.rowcount:
+        raise MigrationError("Migration job is already running")
+    await db.refresh(job)
+    if start:
+        start_migration_job(job_id)
+    return job
+
+
+async def pause_migration_job(db, job_id: int, cancel: bool = False) -> StorageMigrationJob:
+    """Pause or cancel a job; a running job stops after its current batch is checkpointed."""
+    job = await db.get(StorageMigrationJob, job_id)
+    if not job:
+        raise MigrationError("Migration job not found")
+    if job.status in (MigrationStatus.COMPLETED, MigrationStatus.CANCELLED):
+        raise MigrationError(f"Migration job is {job.status.value}")
+    job.status = MigrationStatus.CANCELLED if cancel else MigrationStatus.PAUSED
+    if cancel:
+        job.completed_at = datetime.utcnow()
+    await db.commit()
+    return job
+
+
+def get_live_progress(job: StorageMigrationJob) -> dict:
+    """Throughput and ETA for a job running in this process (empty otherwise)."""
+    progress = _progress.get(job.id)
+    if not progress or job.status != MigrationStatus.RUNNING:
+        return {}
+    remaining = max(0, (job.total_objects or 0) - (job.migrated_objects or 0) - (job.failed_objects or 0))
+    return progress.snapshot(remaining)
+
+
+async def list_recent_failures(db, job_id: int, limit: int = 20) -> List[StorageMigrationFailure]:
+    result = await db.execute(
+        select(StorageMigrationFailure)
+        .where(StorageMigrationFailure.job_id == job_id)
+        .order_by(StorageMigrationFailure.id.desc())
+        .limit(limit)
+    )
+    return list(result.scalars().all())
@@ -1,6 +1,7 @@
 import oss2
-from typing import Optional
-from app.services.storage.base import StorageBackend
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from app.services.storage.base import StorageBackend, ByteRange, unique_paths, batched
 from app.config import get_settings
 import logging
 
@@ -64,7 +65,7 @@ class OSSStorage(StorageBackend):
                 key = f"images/{filename}"
                 relative_path = filename
             
-            self.bucket.put_object(key, content)
+            await self._run_blocking("put_object", self.bucket.put_object, key, content)
             logger.info(f"Saved file to OSS: {key}")
             return relative_path
         except Exception as e:
@@ -80,13 +81,35 @@ class OSSStorage(StorageBackend):
         """
         try:
             key = f"images/{file_path}"
-            self.bucket.delete_object(key)
+            await self._run_blocking("delete_object", self.bucket.delete_object, key)
             logger.info(f"Deleted file from OSS: {key}")
             return True
         except Exception as e:
             logger.error(f"Error deleting file from OSS {file_path}: {e}")
             return False
     
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        """Delete files with batch_delete_objects, up to 1000 keys per request."""
+        paths = unique_paths(file_paths)
+        batches = await asyncio.gather(*(self._delete_batch(batch) for batch in batched(paths)))
+        results = {}
+        for batch_result in batches:
+            results.update(batch_result)
+        return results
+    
+    async def _delete_batch(self, paths: List[str]) -> Dict[str, bool]:
+        keys = [f"images/{p}" for p in paths]
+        try:
+            result = await self._run_blocking("batch_delete_objects", self.bucket.batch_delete_objects, keys)
+        except Exception as e:
+            logger.error(f"Error bulk deleting {len(paths)} files from OSS: {e}")
+            return {p: False for p in paths}
+        
+        # OSS lists every key it deleted (missing keys included)
+        deleted = set(result.deleted_keys)
+        logger.info(f"Bulk deleted {len(deleted)}/{len(paths)} files from OSS")
+        return {p: key in deleted for p, key in zip(paths, keys)}
+    
     async def exists(self, file_path: str) -> bool:
         """
         Check if file exists in Aliyun OSS.
@@ -96,10 +119,36 @@ class OSSStorage(StorageBackend):
         """
         try:
             key = f"images/{file_path}"
-            return self.bucket.object_exists(key)
+            return await self._run_blocking("object_exists", self.bucket.object_exists, key)
         except:
             return False
     
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        """Stream an object via get_object, using byte_range for partial reads."""
+        key = f"images/{file_path}"
+        byte_range = (range[0], range[1]) if range else None
+        try:
+            result = await self._run_blocking("get_object", self.bucket.get_object, key, byte_range=byte_range)
+        except oss2.exceptions.NoSuchKey:
+            raise FileNotFoundError(file_path)
+        async for chunk in self._stream_body(result):
+            yield chunk
+    
+    async def get_size(self, file_path: str) -> int:
+        """Return the object size from head_object."""
+        key = f"images/{file_path}"
+        try:
+            result = await self._run_blocking("head_object", self.bucket.head_object, key)
+        except oss2.exceptions.NotFound:
+            raise FileNotFoundError(file_path)
+        return int(result.content_length)
+    
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        """Presigned PUT URL (Content-Type is signed)."""
+        headers = {"Content-Type": content_type}
+        url = self.bucket.sign_url("PUT", f"images/{file_path}", expires, headers=headers, slash_safe=True)
+        return {"method": "PUT", "url": url, "headers": headers}
+    
     def get_url(self, file_path: str, is_internal: bool = False) -> str:
         """Get URL for OSS."""
         key = f"images/{file_path}"
@@ -0,0 +1,350 @@
+"""
+Write-through Replicated Storage
+
+ReplicatedStorage fans every write out to a primary backend and one or more
+replicas concurrently (e.g. local disk + cloud bucket):
+
+- save/save_from_path succeed once the primary copy is written (records carry the
+  primary's storage_type and URL, so the object must be there; a cloud primary that
+  is down is covered by the spool, see spool.py). Replica copies that fail, or are
+  still running after STORAGE_REPLICA_WRITE_TIMEOUT, are recorded in
+  storage_replica_lag and repaired by the background reconciler. When the primary
+  write fails, replica copies are removed and the error is raised.
+- Reads prefer local storage, then the remaining copies, skipping backends that
+  failed recently; a failing copy falls through to the next one.
+- get_url and storage_type come from the primary, so records look exactly like
+  records written to the primary alone.
+
+Config (.env):
+- STORAGE_REPLICAS: replica storage types of the active backend, e.g. "local" or "local,oss"
+- STORAGE_REPLICA_WRITE_TIMEOUT: seconds to wait for replicas before returning
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.storage_replica import StorageReplicaLag
+from app.services.storage.base import StorageBackend, ByteRange
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+# A backend that failed a read is tried last for this long (seconds)
+UNHEALTHY_COOLDOWN = 30
+# Reconcile retry backoff: 2^attempts minutes, capped
+RECONCILE_MAX_BACKOFF = timedelta(hours=1)
+RECONCILE_BATCH_SIZE = 100
+
+# storage_type -> monotonic time until which it is considered unhealthy (per process)
+_unhealthy_until: Dict[str, float] = {}
+# Replica writes still running after the timeout (keeps a reference so they are not GC'd)
+_background_writes: set = set()
+
+
+def _mark_unhealthy(storage_type: str):
+    _unhealthy_until[storage_type] = time.monotonic() + UNHEALTHY_COOLDOWN
+
+
+def _is_healthy(storage_type: str) -> bool:
+    return _unhealthy_until.get(storage_type, 0) <= time.monotonic()
+
+
+class ReplicatedStorage(StorageBackend):
+    """Composite backend: primary + replicas, written concurrently."""
+
+    def __init__(self, primary: StorageBackend, replicas: List[StorageBackend]):
+        self.primary = primary
+        self.replicas = replicas
+        self.backends = [primary] + replicas
+
+    # ---------- writes ----------
+
+    async def save(self, content: bytes, filename: str, date_path: Optional[str] = None) -> str:
+        return await self._fan_out_write(lambda b: b.save(content, filename, date_path), filename, date_path)
+
+    async def save_from_path(self, local_path: str, filename: str, date_path: Optional[str] = None) -> str:
+        return await self._fan_out_write(lambda b: b.save_from_path(local_path, filename, date_path), filename, date_path)
+
+    async def _fan_out_write(self, write, filename: str, date_path: Optional[str]) -> str:
+        relative_path = f"{date_path}/{filename}" if date_path else filename
+        primary_task = asyncio.ensure_future(write(self.primary))
+        tasks = {primary_task: self.primary}
+        tasks.update({asyncio.ensure_future(write(b)): b for b in self.replicas})
+        await asyncio.wait(tasks, timeout=settings.storage_replica_write_timeout)
+        if not primary_task.done():
+            # The primary decides the outcome, however long it takes
+            await asyncio.wait({primary_task})
+
+        replica_tasks = [t for t in tasks if t is not primary_task]
+        if primary_task.exception() is not None:
+            for task in replica_tasks:
+                task.cancel()
+            written = [tasks[t] for t in replica_tasks if t.done() and not t.cancelled() and t.exception() is None]
+            # The caller gets an error and creates no record: drop the orphaned copies
+            await asyncio.gather(*(b.delete(relative_path) for b in written), return_exceptions=True)
+            raise primary_task.exception()
+
+        lagging = []
+        for task in replica_tasks:
+            backend = tasks[task]
+            if not task.done():
+                # Still running: record lag now, clear it if the write completes
+                lagging.append((backend.storage_type, "write timed out"))
+                _background_writes.add(task)
+                task.add_done_callback(lambda t, b=backend: self._on_late_write(t, b, relative_path))
+            elif task.exception() is not None:
+                logger.warning(f"Replica write to {backend.storage_type} failed for {relative_path}: {task.exception()}")
+                lagging.append((backend.storage_type, str(task.exception())))
+        if lagging:
+            await record_lag(lagging, relative_path, "save")
+
+        return primary_task.result()
+
+    def _on_late_write(self, task: asyncio.Task, backend: StorageBackend, relative_path: str):
+        _background_writes.discard(task)
+        if not task.cancelled() and task.exception() is None:
+            cleanup = asyncio.ensure_future(clear_lag(backend.storage_type, relative_path))
+            _background_writes.add(cleanup)
+            cleanup.add_done_callback(_background_writes.discard)
+
+    async def delete(self, file_path: str) -> bool:
+        results = await self.delete_many([file_path])
+        return results.get(file_path, False)
+
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        paths = [p for p in file_paths if p]
+        outcomes = await asyncio.gather(*(b.delete_many(paths) for b in self.backends), return_exceptions=True)
+
+        results = {p: True for p in paths}
+        lagging = []
+        for backend, outcome in zip(self.backends, outcomes):
+            failed_paths = paths if isinstance(outcome, Exception) else [p for p in paths if not outcome.get(p)]
+            for path in failed_paths:
+                results[path] = False
+                lagging.append((backend.storage_type, path, "delete failed"))
+        if lagging:
+            await record_lags(lagging, "delete")
+        return results
+
+    # ---------- reads ----------
+
+    def _read_order(self) -> List[StorageBackend]:
+        """Local first, then primary, then other replicas; recently failed backends last."""
+        ordered = sorted(self.backends, key=lambda b: (b.storage_type != "local", b is not self.primary))
+        return sorted(ordered, key=lambda b: not _is_healthy(b.storage_type))
+
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        last_error: Optional[Exception] = None
+        for backend in self._read_order():
+            chunks = backend.open_read(file_path, range)
+            try:
+                # Fall through to the next copy only before anything was sent
+                first_chunk = await chunks.__anext__()
+            except StopAsyncIteration:
+                return
+            except Exception as e:
+                if not isinstance(e, FileNotFoundError):
+                    _mark_unhealthy(backend.storage_type)
+                last_error = e
+                continue
+            yield first_chunk
+            async for chunk in chunks:
+                yield chunk
+            return
+        raise last_error or FileNotFoundError(file_path)
+
+    async def get_size(self, file_path: str) -> int:
+        last_error: Optional[Exception] = None
+        for backend in self._read_order():
+            try:
+                return await backend.get_size(file_path)
+            except Exception as e:
+                if not isinstance(e, FileNotFoundError):
+                    _mark_unhealthy(backend.storage_type)
+                last_error = e
+        raise last_error or FileNotFoundError(file_path)
+
+    async def exists(self, file_path: str) -> bool:
+        for backend in self._read_order():
+            try:
+                if await backend.exists(file_path):
+                    return True
+            except Exception:
+                _mark_unhealthy(backend.storage_type)
+        return False
+
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        return self.primary.create_presigned_upload(file_path, content_type, expires)
+    
+    async def register_direct_upload(self, file_path: str):
+        # The client wrote to the primary only: let the reconciler copy it to the replicas
+        await self.primary.register_direct_upload(file_path)
+        await record_lag([(r.storage_type, "direct upload") for r in self.replicas], file_path, "save")
+    
+    def get_url(self, file_path: str, is_internal: bool = False) -> str:
+        return self.primary.get_url(file_path, is_internal)
+
+    @property
+    def storage_type(self) -> str:
+        return self.primary.storage_type
+
+
+# ---------- lag table ----------
+
+async def record_lag(entries: List[tuple], file_path: str, operation: str, host: Optional[str] = None):
+    """Upsert lag rows for (storage_type, error) pairs of one file. Never raises."""
+    await record_lags([(storage_type, file_path, error) for storage_type, error in entries], operation, host)
+
+
+async def record_lags(rows: List[tuple], operation: str, host: Optional[str] = None):
+    """Upsert lag rows for (storage_type, file_path, error) triples in one session. Never raises: uploads must not fail on bookkeeping."""
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StorageReplicaLag).where(
+                    StorageReplicaLag.storage_type.in_({storage_type for storage_type, _, _ in rows}),
+                    StorageReplicaLag.file_path.in_({file_path for _, file_path, _ in rows}),
+                )
+            )
+            existing = {(lag.storage_type, lag.file_path): lag for lag in result.scalars().all()}
+            for storage_type, file_path, error in rows:
+                lag = existing.get((storage_type, file_path))
+                if lag is None:
+                    lag = existing[(storage_type, file_path)] = StorageReplicaLag(
+                        storage_type=storage_type, file_path=file_path, attempts=0)
+                    db.add(lag)
+                lag.operation = operation
+                lag.last_error = (error or "")[:500]
+                lag.next_attempt_at = datetime.utcnow()
+                lag.host = host
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to record replica lag for {len(rows)} copies: {e}")
+
+
+async def clear_lag(storage_type: str, file_path: str):
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                select(StorageReplicaLag).where(
+                    StorageReplicaLag.storage_type == storage_type,
+                    StorageReplicaLag.file_path == file_path,
+                    StorageReplicaLag.operation == "save",
+                )
+            )
+            lag = result.scalar_one_or_none()
+            if lag:
+                await db.delete(lag)
+                await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to clear replica lag for {file_path}: {e}")
+
+
+async def reconcile_replicas():
+    """Retry lagging copies (scheduled every minute by the backup scheduler)."""
+    replicated = await get_replicated_backend()
+    if replicated is None:
+        return
+
+    from app.services.storage.transfer import copy_object
+    backends = {b.storage_type: b for b in replicated.backends}
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(StorageReplicaLag)
+            .where(
+                StorageReplicaLag.next_attempt_at <= datetime.utcnow(),
+                # Spooled uploads are drained by spool.drain_spool
+                StorageReplicaLag.operation != "spool",
+            )
+            .order_by(StorageReplicaLag.next_attempt_at)
+            .limit(RECONCILE_BATCH_SIZE)
+        )
+        lags = result.scalars().all()
+        if not lags:
+            return
+
+        repaired = 0
+        for lag in lags:
+            target = backends.get(lag.storage_type)
+            if target is None:
+                # Backend no longer part of the replica set
+                await db.delete(lag)
+                continue
+            try:
+                if lag.operation == "delete":
+                    results = await target.delete_many([lag.file_path])
+                    if not results.get(lag.file_path):
+                        raise RuntimeError("delete failed")
+                else:
+                    source = await _find_healthy_copy(replicated, lag.storage_type, lag.file_path)
+                    if source is None:
+                        # No copy left anywhere (deleted since): nothing to repair
+                        await db.delete(lag)
+                        continue
+                    await copy_object(source, target, lag.file_path)
+                await db.delete(lag)
+                repaired += 1
+            except Exception as e:
+                lag.attempts += 1
+                lag.last_error = str(e)[:500]
+                backoff = min(timedelta(minutes=2 ** min(lag.attempts, 10)), RECONCILE_MAX_BACKOFF)
+                lag.next_attempt_at = datetime.utcnow() + backoff
+                logger.warning(f"Replica reconcile failed ({lag.operation} {lag.storage_type}:{lag.file_path}, "
+                               f"attempt {lag.attempts}): {e}")
+        await db.commit()
+        logger.info(f"Replica reconcile: {repaired}/{len(lags)} lagging copies repaired")
+
+
+async def _find_healthy_copy(replicated: ReplicatedStorage, lagging_type: str, file_path: str) -> Optional[StorageBackend]:
+    for backend in replicated._read_order():
+        if backend.storage_type == lagging_type:
+            continue
+        try:
+            if await backend.exists(file_path):
+                return backend
+        except Exception:
+            continue
+    return None
+
+
+# ---------- factory ----------
+
+def get_replica_types() -> List[str]:
+    return [t.strip().lower() for t in (settings.storage_replicas or "").split(",") if t.strip()]
+
+
+async def wrap_with_replication(backend: StorageBackend) -> StorageBackend:
+    """Wrap the active backend with its replicas when STORAGE_REPLICAS is set."""
+    replica_types = [t for t in get_replica_types() if t != backend.storage_type]
+    if not replica_types:
+        return backend
+
+    from app.services.settings import get_storage_type
+    if backend.storage_type != (await get_storage_type()).lower():
+        # Records of a non-active backend are read from that backend only
+        return backend
+
+    from app.services.storage import build_storage_backend
+    replicas = []
+    for storage_type in replica_types:
+        try:
+            replicas.append(await build_storage_backend(storage_type))
+        except Exception as e:
+            logger.error(f"Storage replica '{storage_type}' unavailable: {e}")
+    return ReplicatedStorage(backend, replicas) if replicas else backend
+
+
+async def get_replicated_backend() -> Optional[ReplicatedStorage]:
+    if not get_replica_types():
+        return None
+    from app.services.settings import get_storage_type
+    from app.services.storage import build_storage_backend
+    backend = await wrap_with_replication(await build_storage_backend(await get_storage_type()))
+    return backend if isinstance(backend, ReplicatedStorage) else None
@@ -22,8 +22,9 @@ Configuration is done via:
 import boto3
 from botocore.config import Config
 from botocore.exceptions import ClientError
-from typing import Optional
-from app.services.storage.base import StorageBackend
+import asyncio
+from typing import AsyncIterator, Dict, Iterable, List, Optional
+from app.services.storage.base import StorageBackend, ByteRange, unique_paths, batched
 from app.config import get_settings
 import logging
 
@@ -192,7 +193,9 @@ class S3CompatibleStorage(StorageBackend):
             }
             content_type = content_types.get(ext, 'application/octet-stream')
             
-            self.client.put_object(
+            await self._run_blocking(
+                "put_object",
+                self.client.put_object,
                 Bucket=self.bucket,
                 Key=key,
                 Body=content,
@@ -237,19 +240,13 @@ class S3CompatibleStorage(StorageBackend):
             }
             content_type = content_types.get(ext, 'application/octet-stream')
             
-            import asyncio
-            from functools import partial
-            loop = asyncio.get_event_loop()
-            
-            await loop.run_in_executor(
-                None,
-                partial(
-                    self.client.upload_file,
-                    Filename=local_path,
-                    Bucket=self.bucket,
-                    Key=key,
-                    ExtraArgs={'ContentType': content_type}
-                )
+            await self._run_blocking(
+                "upload_file",
+                self.client.upload_file,
+                Filename=local_path,
+                Bucket=self.bucket,
+                Key=key,
+                ExtraArgs={'ContentType': content_type}
             )
             
             logger.info(f"Saved file (from path) to S3-compatible storage ({self.provider}): {key}")
@@ -268,7 +265,9 @@ class S3CompatibleStorage(StorageBackend):
         """
         try:
             key = f"images/{file_path}"
-            self.client.delete_object(
+            await self._run_blocking(
+                "delete_object",
+                self.client.delete_object,
                 Bucket=self.bucket,
                 Key=key,
             )
@@ -278,6 +277,34 @@ class S3CompatibleStorage(StorageBackend):
             logger.error(f"Error deleting file from S3-compatible storage {file_path}: {e}")
             return False
     
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        """Delete files with DeleteObjects, up to 1000 keys per request."""
+        paths = unique_paths(file_paths)
+        batches = await asyncio.gather(*(self._delete_batch(batch) for batch in batched(paths)))
+        results = {}
+        for batch_result in batches:
+            results.update(batch_result)
+        return results
+    
+    async def _delete_batch(self, paths: List[str]) -> Dict[str, bool]:
+        try:
+            response = await self._run_blocking(
+                "delete_objects",
+                self.client.delete_objects,
+                Bucket=self.bucket,
+                Delete={"Objects": [{"Key": f"images/{p}"} for p in paths], "Quiet": True},
+            )
+        except Exception as e:
+            logger.error(f"Error bulk deleting {len(paths)} files from S3-compatible storage: {e}")
+            return {p: False for p in paths}
+        
+        # Quiet mode: only failures are reported
+        failed = {err.get("Key") for err in response.get("Errors", [])}
+        for err in response.get("Errors", []):
+            logger.error(f"Error deleting {err.get('Key')} from S3-compatible storage: {err.get('Code')} {err.get('Message')}")
+        logger.info(f"Bulk deleted {len(paths) - len(failed)}/{len(paths)} files from S3-compatible storage")
+        return {p: f"images/{p}" not in failed for p in paths}
+    
     async def exists(self, file_path: str) -> bool:
         """
         Check if file exists in S3-compatible storage.
@@ -287,7 +314,9 @@ class S3CompatibleStorage(StorageBackend):
         """
         try:
             key = f"images/{file_path}"
-            self.client.head_object(
+            await self._run_blocking(
+                "head_object",
+                self.client.head_object,
                 Bucket=self.bucket,
                 Key=key,
             )
@@ -295,6 +324,52 @@ class S3CompatibleStorage(StorageBackend):
         except ClientError:
             return False
     
+    @staticmethod
+    def _is_not_found(error: ClientError) -> bool:
+        code = str(error.response.get("Error", {}).get("Code", ""))
+        return code in ("NoSuchKey", "404", "NotFound")
+    
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        """Stream an object via GetObject, passing `range` through as an HTTP Range header."""
+        key = f"images/{file_path}"
+        kwargs = {"Bucket": self.bucket, "Key": key}
+        if range:
+            kwargs["Range"] = self._range_header(range)
+        try:
+            response = await self._run_blocking("get_object", self.client.get_object, **kwargs)
+        except ClientError as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(file_path)
+            raise
+        async for chunk in self._stream_body(response["Body"]):
+            yield chunk
+    
+    async def get_size(self, file_path: str) -> int:
+        """Return the object size from HeadObject."""
+        key = f"images/{file_path}"
+        try:
+            response = await self._run_blocking(
+                "head_object",
+                self.client.head_object,
+                Bucket=self.bucket,
+                Key=key,
+            )
+        except ClientError as e:
+            if self._is_not_found(e):
+                raise FileNotFoundError(file_path)
+            raise
+        return int(response["ContentLength"])
+    
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        """Presigned PUT URL (SigV4, Content-Type is signed)."""
+        url = self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": self.bucket, "Key": f"images/{file_path}", "ContentType": content_type},
+            ExpiresIn=expires,
+            HttpMethod="PUT",
+        )
+        return {"method": "PUT", "url": url, "headers": {"Content-Type": content_type}}
+    
     def get_url(self, file_path: str, is_internal: bool = False) -> str:
         """
         Get the URL for a file.
@@ -0,0 +1,267 @@
+"""
+Local Spool for Degraded Cloud Storage
+
+SpooledStorage sits in front of a cloud backend and consults its circuit breaker
+(see breaker.py):
+
+- save/save_from_path go to the bucket while it is healthy. When the breaker is open,
+  the call fails, or save() exceeds STORAGE_BREAKER_CALL_TIMEOUT, the upload is written
+  to the local spool instead and recorded in storage_replica_lag (operation "spool").
+- Reads serve spooled files from disk until they have been pushed to the bucket.
+- drain_spool() (scheduled every minute) uploads spooled files once the bucket
+  recovers, then removes them from the spool. Spool records carry the host that
+  spooled the file (STORAGE_SPOOL_HOST, default the hostname): each host only drains
+  its own, so hosts with separate spool directories leave each other's records alone.
+
+Records keep the cloud storage_type and file_path, so nothing changes for callers
+once a file has been drained.
+
+Config (.env):
+- STORAGE_SPOOL_ENABLED / STORAGE_SPOOL_PATH / STORAGE_SPOOL_HOST
+- STORAGE_BREAKER_FAILURE_THRESHOLD / STORAGE_BREAKER_RESET_TIMEOUT / STORAGE_BREAKER_CALL_TIMEOUT
+"""
+import asyncio
+import logging
+import os
+import socket
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Dict, Iterable, Optional
+
+from sqlalchemy import select, delete, or_, update
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.storage_replica import StorageReplicaLag
+from app.services.storage.base import StorageBackend, ByteRange, unique_paths
+from app.services.storage.breaker import CLOSED, get_breaker
+from app.services.storage.local import LocalStorage
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+SPOOL_OPERATION = "spool"
+DRAIN_BATCH_SIZE = 100
+DRAIN_MAX_BACKOFF = timedelta(minutes=30)
+SPOOL_HOST = settings.storage_spool_host or socket.gethostname()
+
+
+class SpooledStorage(StorageBackend):
+    """Cloud backend guarded by a circuit breaker, spilling writes to local disk."""
+
+    def __init__(self, inner: StorageBackend):
+        self.inner = inner
+        self.breaker = get_breaker(inner.storage_type)
+        self.spool = LocalStorage(root=os.path.join(settings.storage_spool_path, inner.storage_type))
+
+    # ---------- writes ----------
+
+    async def save(self, content: bytes, filename: str, date_path: Optional[str] = None) -> str:
+        timeout = settings.storage_breaker_call_timeout or None
+        if self.breaker.allow():
+            try:
+                file_path = await asyncio.wait_for(self.inner.save(content, filename, date_path), timeout)
+                self.breaker.record_success()
+                return file_path
+            except asyncio.CancelledError:
+                # A half-open probe must not stay in flight forever
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self.breaker.record_failure(e)
+                logger.warning(f"{self.storage_type} save failed, spooling {filename} locally: {e!r}")
+        file_path = await self.spool.save(content, filename, date_path)
+        await self._record_spooled(file_path, self.breaker.last_error)
+        return file_path
+
+    async def save_from_path(self, local_path: str, filename: str, date_path: Optional[str] = None) -> str:
+        # Large files (videos, merged chunks) are not cut off by the call timeout
+        if self.breaker.allow():
+            try:
+                file_path = await self.inner.save_from_path(local_path, filename, date_path)
+                self.breaker.record_success()
+                return file_path
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self.breaker.record_failure(e)
+                logger.warning(f"{self.storage_type} save failed, spooling {filename} locally: {e!r}")
+        file_path = await self.spool.save_from_path(local_path, filename, date_path)
+        await self._record_spooled(file_path, self.breaker.last_error)
+        return file_path
+
+    async def _record_spooled(self, file_path: str, error: Optional[str]):
+        from app.services.storage.replicated import record_lag
+        await record_lag([(self.storage_type, error or "circuit open")], file_path, SPOOL_OPERATION, host=SPOOL_HOST)
+
+    async def delete(self, file_path: str) -> bool:
+        results = await self.delete_many([file_path])
+        return results.get(file_path, False)
+
+    async def delete_many(self, file_paths: Iterable[str]) -> Dict[str, bool]:
+        paths = unique_paths(file_paths)
+        spooled = {p for p in paths if self._is_spooled(p)}
+        if spooled:
+            await self.spool.delete_many(spooled)
+            await _forget_spooled(self.storage_type, spooled)
+
+        results = {p: p in spooled for p in paths}
+        if self.breaker.allow():
+            try:
+                remote = await self.inner.delete_many(paths)
+                self.breaker.record_success()
+                for path, ok in remote.items():
+                    results[path] = results[path] or ok
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception as e:
+                self.breaker.record_failure(e)
+                logger.error(f"{self.storage_type} bulk delete failed: {e}")
+        return results
+
+    # ---------- reads ----------
+
+    def _is_spooled(self, file_path: str) -> bool:
+        try:
+            self.spool._resolve_read_path(file_path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    async def open_read(self, file_path: str, range: Optional[ByteRange] = None) -> AsyncIterator[bytes]:
+        source = self.spool if self._is_spooled(file_path) else self.inner
+        async for chunk in source.open_read(file_path, range):
+            yield chunk
+
+    async def get_size(self, file_path: str) -> int:
+        if self._is_spooled(file_path):
+            return await self.spool.get_size(file_path)
+        return await self.inner.get_size(file_path)
+
+    async def exists(self, file_path: str) -> bool:
+        return self._is_spooled(file_path) or await self.inner.exists(file_path)
+
+    def create_presigned_upload(self, file_path: str, content_type: str, expires: int) -> dict:
+        if self.breaker.state != CLOSED:
+            # Clients fall back to uploading through the server, which spools
+            raise NotImplementedError(f"{self.storage_type} storage is degraded, direct uploads are disabled")
+        return self.inner.create_presigned_upload(file_path, content_type, expires)
+    
+    async def register_direct_upload(self, file_path: str):
+        await self.inner.register_direct_upload(file_path)
+    
+    def get_url(self, file_path: str, is_internal: bool = False) -> str:
+        if self._is_spooled(file_path):
+            # Not in the bucket yet: serve through the backend proxy
+            return f"/img/images/{file_path}"
+        return self.inner.get_url(file_path, is_internal)
+
+    @property
+    def storage_type(self) -> str:
+        return self.inner.storage_type
+
+
+def wrap_with_spool(backend: StorageBackend) -> StorageBackend:
+    """Guard a cloud backend with the circuit breaker and spool when STORAGE_SPOOL_ENABLED is set."""
+    if not settings.storage_spool_enabled or backend.storage_type == "local":
+        return backend
+    return SpooledStorage(backend)
+
+
+async def _forget_spooled(storage_type: str, file_paths: Iterable[str]):
+    try:
+        async with AsyncSessionLocal() as db:
+            await db.execute(
+                delete(StorageReplicaLag).where(
+                    StorageReplicaLag.storage_type == storage_type,
+                    StorageReplicaLag.operation == SPOOL_OPERATION,
+                    StorageReplicaLag.file_path.in_(list(file_paths)),
+                )
+            )
+            await db.commit()
+    except Exception as e:
+        logger.error(f"Failed to clear spool records: {e}")
+
+
+async def drain_spool():
+    """Push spooled uploads to their bucket (scheduled every minute by the backup scheduler)."""
+    from app.models.image import Image
+    from app.services.storage import build_storage_backend
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(
+            select(StorageReplicaLag)
+            .where(
+                StorageReplicaLag.operation == SPOOL_OPERATION,
+                # Rows without a host predate host tracking
+                or_(StorageReplicaLag.host == SPOOL_HOST, StorageReplicaLag.host.is_(None)),
+                StorageReplicaLag.next_attempt_at <= datetime.utcnow(),
+            )
+            .order_by(StorageReplicaLag.next_attempt_at)
+            .limit(DRAIN_BATCH_SIZE)
+        )
+        entries = result.scalars().all()
+        if not entries:
+            return
+
+        backends: Dict[str, SpooledStorage] = {}
+        drained = 0
+        for entry in entries:
+            storage = backends.get(entry.storage_type)
+            if storage is None:
+                try:
+                    storage = backends[entry.storage_type] = SpooledStorage(
+                        await build_storage_backend(entry.storage_type))
+                except Exception as e:
+                    logger.error(f"Spool drain: cannot build {entry.storage_type} backend: {e}")
+                    continue
+            if not storage._is_spooled(entry.file_path):
+                if entry.host == SPOOL_HOST:
+                    # Deleted (or drained by another worker) since it was spooled
+                    await db.delete(entry)
+                else:
+                    # Legacy row, possibly spooled on another host: leave it to that host
+                    entry.next_attempt_at = datetime.utcnow() + DRAIN_MAX_BACKOFF
+                continue
+            # Legacy row whose file is in our spool: ours from now on
+            entry.host = SPOOL_HOST
+            if not storage.breaker.allow():
+                continue
+
+            directory, _, filename = entry.file_path.rpartition("/")
+            try:
+                local_path = storage.spool._resolve_read_path(entry.file_path)
+                await storage.inner.save_from_path(local_path, filename, directory or None)
+                storage.breaker.record_success()
+            except asyncio.CancelledError:
+                storage.breaker.release()
+                raise
+            except Exception as e:
+                storage.breaker.record_failure(e)
+                entry.attempts += 1
+                entry.last_error = str(e)[:500]
+                backoff = min(timedelta(minutes=2 ** min(entry.attempts, 10)), DRAIN_MAX_BACKOFF)
+                entry.next_attempt_at = datetime.utcnow() + backoff
+                logger.warning(f"Spool drain failed for {entry.storage_type}:{entry.file_path} "
+                               f"(attempt {entry.attempts}): {e}")
+                continue
+
+            url = storage.inner.get_url(entry.file_path)
+            if url.startswith("http"):
+                # Uploaded while spooled with the proxy URL: switch to the direct URL
+                await db.execute(
+                    update(Image)
+                    .where(
+                        Image.storage_type == entry.storage_type,
+                        Image.file_path == entry.file_path,
+                        Image.storage_url.is_(None),
+                    )
+                    .values(storage_url=url)
+                )
+            await db.delete(entry)
+            await db.commit()
+            await storage.spool.delete(entry.file_path)
+            drained += 1
+        await db.commit()
+        logger.info(f"Spool drain: {drained}/{len(entries)} spooled uploads pushed to cloud storage")
@@ -0,0 +1,98 @@
+"""
+Object copy between storage backends (used by storage migration and replica reconcile).
+
+Objects are streamed through a temp file, so memory stays bounded for any object size.
+"""
+import asyncio
+import hashlib
+import os
+import posixpath
+import tempfile
+import time
+from typing import Optional
+
+import aiofiles
+
+from app.config import get_settings
+from app.services.storage.base import StorageBackend
+
+settings = get_settings()
+
+TRANSFER_TEMP_DIR = os.path.join(settings.upload_path, "temp_transfer")
+
+
+class TransferError(Exception):
+    """Raised when a copied object does not match its source."""
+    pass
+
+
+class BandwidthLimiter:
+    """Token bucket shared by all transfers of a job."""
+
+    def __init__(self, bytes_per_second: int):
+        self.rate = bytes_per_second
+        self.tokens = float(bytes_per_second)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def consume(self, amount: int):
+        async with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.rate, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= amount
+            if self.tokens < 0:
+                # Hold the lock while sleeping so waiters are served in order
+                await asyncio.sleep(-self.tokens / self.rate)
+                self.updated = time.monotonic()
+                self.tokens = 0
+
+
+async def copy_object(
+    source: StorageBackend,
+    target: StorageBackend,
+    path: str,
+    limiter: Optional[BandwidthLimiter] = None,
+    verify_checksum: bool = False,
+) -> int:
+    """
+    Copy one object source -> target under the same relative path.
+    Always checks the target size; with verify_checksum also reads it back and compares SHA256.
+    Returns the number of bytes copied.
+    """
+    os.makedirs(TRANSFER_TEMP_DIR, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=TRANSFER_TEMP_DIR)
+    os.close(fd)
+    try:
+        hasher = hashlib.sha256()
+        size = 0
+        async with aiofiles.open(temp_path, "wb") as f:
+            async for chunk in source.open_read(path):
+                if limiter:
+                    await limiter.consume(len(chunk))
+                hasher.update(chunk)
+                size += len(chunk)
+                await f.write(chunk)
+
+        folder, filename = posixpath.split(path)
+        saved_path = await target.save_from_path(temp_path, filename, folder or None)
+        if saved_path != path:
+            raise TransferError(f"Target stored object at unexpected path: {saved_path}")
+
+        target_size = await target.get_size(path)
+        if target_size != size:
+            raise TransferError(f"Size mismatch after upload: source={size}, target={target_size}")
+
+        if verify_checksum:
+            target_hasher = hashlib.sha256()
+            async for chunk in target.open_read(path):
+                target_hasher.update(chunk)
+            if target_hasher.digest() != hasher.digest():
+                raise TransferError("SHA256 mismatch after upload")
+
+        return size
+    finally:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
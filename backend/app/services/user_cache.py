@@ -0,0 +1,158 @@
+"""
+Authenticated User Cache
+
+get_current_user_optional() answers most requests without touching the database:
+
+- users: user id -> detached User row, kept USER_CACHE_TTL seconds (LRU bounded).
+  The dependency merges the copy into the request session without a SELECT, so
+  endpoints can still modify and commit the user as before.
+- access tokens: token -> verified payload, kept until the token's exp, so the
+  signature is verified once per token and process.
+
+Every change to a user the dependency hands out (profile, watermark, password,
+admin edits, VIP from payments / activation codes, email verification) must call
+invalidate_user() after committing. It drops the entry here and publishes the id on
+Redis (users:changed) so the other workers drop it too. A worker clears the whole
+cache whenever its listener (re)connects; without a listener the TTL bounds staleness.
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+
+from sqlalchemy import select
+
+from app.config import get_settings
+from app.database import AsyncSessionLocal
+from app.models.user import User
+from app.redis import get_shared_redis
+from app.utils.security import decode_token
+
+settings = get_settings()
+logger = logging.getLogger(__name__)
+
+USER_CHANNEL = "users:changed"
+MAX_USERS = 10000
+MAX_TOKENS = 20000
+
+# user id -> (monotonic expiry, detached User)
+_users: "OrderedDict[int, tuple]" = OrderedDict()
+# token -> (exp epoch seconds, payload)
+_tokens: "OrderedDict[str, tuple]" = OrderedDict()
+_worker_id = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+_sync_task: Optional[asyncio.Task] = None
+
+
+def verify_token(token: str) -> Optional[dict]:
+    """decode_token() with the result cached until the token expires."""
+    now = time.time()
+    cached = _tokens.get(token)
+    if cached is not None:
+        if now < cached[0]:
+            return cached[1]
+        del _tokens[token]
+
+    payload = decode_token(token)
+    exp = payload.get("exp") if payload else None
+    if isinstance(exp, (int, float)) and now < exp:
+        _tokens[token] = (exp, payload)
+        if len(_tokens) > MAX_TOKENS:
+            # Insertion order: drop the oldest entries
+            _tokens.popitem(last=False)
+    return payload
+
+
+async def get_cached_user(user_id: int) -> Optional[User]:
+    """Detached User for the id (from cache or a fresh load), None if it does not exist."""
+    now = time.monotonic()
+    cached = _users.get(user_id)
+    if cached is not None:
+        if now < cached[0]:
+            _users.move_to_end(user_id)
+            return cached[1]
+        del _users[user_id]
+
+    async with AsyncSessionLocal() as db:
+        result = await db.execute(select(User).where(User.id == user_id))
+        user = result.scalar_one_or_none()
+    if user is None:
+        return None
+    _users[user_id] = (now + settings.user_cache_ttl, user)
+    if len(_users) > MAX_USERS:
+        _users.popitem(last=False)
+    return user
+
+
+async def invalidate_user(user_id: Optional[int]):
+    """Call after committing a change to the user: drops it here and on the other workers."""
+    if not user_id:
+        return
+    _users.pop(user_id, None)
+
+    client = get_shared_redis()
+    if client is None:
+        return
+    try:
+        await client.publish(USER_CHANNEL, json.dumps({"origin": _worker_id, "id": user_id}))
+    except Exception as e:
+        logger.warning(f"Failed to publish user change: {e}")
+
+
+def _handle_user_message(data: str):
+    try:
+        message = json.loads(data)
+        user_id = int(message["id"])
+    except (ValueError, KeyError, TypeError):
+        return
+    if message.get("origin") != _worker_id:
+        _users.pop(user_id, None)
+
+
+async def _user_sync_loop():
+    """Drop users changed by other workers (reconnects with backoff)."""
+    backoff = 1
+    while True:
+        client = get_shared_redis()
+        if client is None:
+            return
+        pubsub = client.pubsub()
+        try:
+            await pubsub.subscribe(USER_CHANNEL)
+            # Changes published while we were not listening are lost: start empty
+            _users.clear()
+            backoff = 1
+            async for message in pubsub.listen():
+                if message.get("type") == "message":
+                    _handle_user_message(message["data"])
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.warning(f"User cache listener disconnected: {e}, retrying in {backoff}s")
+        finally:
+            try:
+                await pubsub.close()
+            except Exception:
+                pass
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 60)
+
+
+async def start_user_cache_sync():
+    global _sync_task
+    if _sync_task is None and get_shared_redis() is not None:
+        _sync_task = asyncio.create_task(_user_sync_loop())
+
+
+async def stop_user_cache_sync():
+    global _sync_task
+    if _sync_task:
+        _sync_task.cancel()
+        try:
+            await _sync_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _sync_task = None
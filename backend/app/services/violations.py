@@ -0,0 +1,134 @@
+"""
+Violation Counters and Batched Violation Logging
+
+Auto-ban decisions read sliding-window counters in Redis instead of running
+COUNT(*) over violation_logs for every violation:
+
+- one counter per (violation type, user or IP) and 24 h bucket; the window count is
+  the current bucket plus the previous one weighted by how much of it still
+  overlaps the window (sliding window counter)
+- one pipelined round trip per violation (INCR + EXPIRE + GET)
+
+violation_logs rows only feed the admin UI. They are buffered in memory and
+inserted in batches by a background writer (every FLUSH_INTERVAL seconds, or as
+soon as BATCH_SIZE rows are waiting). The buffer is bounded: under a flood the
+oldest unwritten rows are dropped, so enforcement cost stays constant.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Optional
+
+from sqlalchemy import insert
+
+from app.database import AsyncSessionLocal
+from app.models.blacklist import ViolationLog
+from app.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+VIOLATION_WINDOW = 86400
+FLUSH_INTERVAL = 2.0
+BATCH_SIZE = 500
+MAX_BUFFERED = 20000
+
+_buffer: deque = deque(maxlen=MAX_BUFFERED)
+_dropped = 0
+_wakeup = asyncio.Event()
+_writer_task: Optional[asyncio.Task] = None
+
+
+async def count_violation(violation_type: str, ip: str, user_id: Optional[int]) -> Optional[int]:
+    """
+    Count one violation and return the number in the last 24 h for the user (or IP).
+    Returns None when Redis is not available.
+    """
+    redis = get_redis()
+    if not redis:
+        return None
+    subject = f"user:{user_id}" if user_id else f"ip:{ip}"
+    now = time.time()
+    bucket = int(now // VIOLATION_WINDOW)
+    current_key = f"violations:{violation_type}:{subject}:{bucket}"
+
+    pipe = redis.pipeline()
+    pipe.incr(current_key)
+    pipe.expire(current_key, VIOLATION_WINDOW * 2)
+    pipe.get(f"violations:{violation_type}:{subject}:{bucket - 1}")
+    current, _, previous = await pipe.execute()
+
+    overlap = 1 - (now / VIOLATION_WINDOW - bucket)
+    return int(current) + int(int(previous or 0) * overlap)
+
+
+def enqueue_violation(row: dict):
+    """Queue a violation_logs row for the batch writer."""
+    global _dropped
+    if len(_buffer) == _buffer.maxlen:
+        _dropped += 1
+        if _dropped % 1000 == 1:
+            logger.warning(f"Violation log buffer full, {_dropped} rows dropped so far")
+    _buffer.append(row)
+    if len(_buffer) >= BATCH_SIZE:
+        _wakeup.set()
+
+
+def is_writer_running() -> bool:
+    return _writer_task is not None
+
+
+async def flush_violations():
+    """Insert every buffered row (batches of BATCH_SIZE)."""
+    while _buffer:
+        batch = [_buffer.popleft() for _ in range(min(BATCH_SIZE, len(_buffer)))]
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(ViolationLog), batch)
+                await db.commit()
+        except Exception as e:
+            # One bad row (e.g. an image deleted meanwhile) must not lose the batch
+            logger.warning(f"Batch insert of {len(batch)} violation logs failed, retrying row by row: {e}")
+            await _insert_rows(batch)
+
+
+async def _insert_rows(rows: list):
+    for row in rows:
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(insert(ViolationLog), [row])
+                await db.commit()
+        except Exception as e:
+            logger.error(f"Dropping violation log {row.get('violation_type')} for {row.get('ip_address')}: {e}")
+
+
+async def _writer_loop():
+    while True:
+        try:
+            await asyncio.wait_for(_wakeup.wait(), FLUSH_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        _wakeup.clear()
+        try:
+            await flush_violations()
+        except Exception as e:
+            logger.error(f"Violation log writer error: {e}")
+
+
+async def start_violation_writer():
+    global _writer_task
+    if _writer_task is None:
+        _writer_task = asyncio.create_task(_writer_loop())
+
+
+async def stop_violation_writer():
+    """Stop the writer and flush what is left."""
+    global _writer_task
+    if _writer_task:
+        _writer_task.cancel()
+        try:
+            await _writer_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _writer_task = None
+    await flush_violations()
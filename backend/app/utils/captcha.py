@@ -1,20 +1,37 @@
 """
 Captcha Service
 Generates and validates image captchas for security-sensitive operations.
+
+Images are pre-rendered into a per-worker pool by a background task on a single
+rendering thread, so GET /auth/captcha only pops one and binds its text to the
+captcha_id. When the pool runs dry, requests wait for the same thread: captcha
+traffic never uses more than one core and never blocks the event loop.
 """
+import asyncio
 import random
 import string
 import base64
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from io import BytesIO
 from typing import Optional, Tuple
 from PIL import Image, ImageDraw, ImageFont, ImageFilter
 import logging
 
+from app.config import get_settings
+
+settings = get_settings()
 logger = logging.getLogger(__name__)
 
 # In-memory captcha storage (use Redis in production for distributed systems)
 _captcha_store: dict = {}
 
+# Pre-rendered (text, data URI) pairs
+_pool: deque = deque()
+_refill_needed = asyncio.Event()
+_render_executor: Optional[ThreadPoolExecutor] = None
+_refill_task: Optional[asyncio.Task] = None
+
 
 def generate_captcha_text(length: int = 4) -> str:
     """Generate random captcha text (letters and numbers, excluding confusing chars)."""
@@ -29,13 +46,12 @@ def generate_captcha_image(text: str, width: int = 150, height: int = 50) -> byt
     image = Image.new('RGB', (width, height), color=(255, 255, 255))
     draw = ImageDraw.Draw(image)
     
-    # Add gradient background
+    # Add gradient background (one color per row)
     for y in range(height):
         r = 240 + random.randint(-10, 10)
         g = 240 + random.randint(-10, 10)
         b = 250 + random.randint(-5, 5)
-        for x in range(width):
-            draw.point((x, y), fill=(r, g, b))
+        draw.line([(0, y), (width - 1, y)], fill=(r, g, b))
     
     # Try to use a font, fallback to default
     font_size = 32
@@ -117,17 +133,70 @@ def generate_captcha_image(text: str, width: int = 150, height: int = 50) -> byt
     return buffer.getvalue()
 
 
-def create_captcha(captcha_id: str) -> Tuple[str, str]:
-    """
-    Create a new captcha and store it.
-    Returns: (captcha_id, base64_image)
-    """
+def render_captcha() -> Tuple[str, str]:
+    """Render a new captcha. Returns: (text, base64 data URI)"""
     text = generate_captcha_text()
-    image_bytes = generate_captcha_image(text)
-    
+    base64_image = base64.b64encode(generate_captcha_image(text)).decode('utf-8')
+    return text.upper(), f"data:image/png;base64,{base64_image}"
+
+
+async def _render_off_loop() -> Tuple[str, str]:
+    global _render_executor
+    if _render_executor is None:
+        _render_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="captcha_")
+    return await asyncio.get_running_loop().run_in_executor(_render_executor, render_captcha)
+
+
+async def take_captcha() -> Tuple[str, str]:
+    """A pre-rendered (text, data URI) pair, each handed out once."""
+    if _pool:
+        item = _pool.popleft()
+    else:
+        item = await _render_off_loop()
+    if len(_pool) < settings.captcha_pool_size // 2:
+        _refill_needed.set()
+    return item
+
+
+async def _refill_loop():
+    while True:
+        try:
+            while len(_pool) < settings.captcha_pool_size:
+                _pool.append(await _render_off_loop())
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Captcha pool refill failed: {e}")
+            await asyncio.sleep(5)
+            continue
+        _refill_needed.clear()
+        await _refill_needed.wait()
+
+
+async def start_captcha_pool():
+    global _refill_task
+    if _refill_task is None and settings.captcha_pool_size > 0:
+        _refill_task = asyncio.create_task(_refill_loop())
+
+
+async def stop_captcha_pool():
+    global _refill_task, _render_executor
+    if _refill_task:
+        _refill_task.cancel()
+        try:
+            await _refill_task
+        except (asyncio.CancelledError, Exception):
+            pass
+        _refill_task = None
+    if _render_executor is not None:
+        _render_executor.shutdown(wait=False)
+        _render_executor = None
+
+
+def _remember_captcha(captcha_id: str, text: str):
     # Store captcha (expires after 5 minutes - handled by cleanup or Redis TTL)
     _captcha_store[captcha_id] = {
-        'text': text.upper(),
+        'text': text,
         'created_at': __import__('time').time()
     }
     
@@ -139,10 +208,16 @@ def create_captcha(captcha_id: str) -> Tuple[str, str]:
     ]
     for k in expired_keys:
         del _captcha_store[k]
-    
-    # Return base64 encoded image
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
-    return captcha_id, f"data:image/png;base64,{base64_image}"
+
+
+def create_captcha(captcha_id: str) -> Tuple[str, str]:
+    """
+    Create a new captcha and store it.
+    Returns: (captcha_id, base64_image)
+    """
+    text, image_data = render_captcha()
+    _remember_captcha(captcha_id, text)
+    return captcha_id, image_data
 
 
 def verify_captcha(captcha_id: str, user_input: str) -> bool:
@@ -174,23 +249,21 @@ def verify_captcha(captcha_id: str, user_input: str) -> bool:
 
 async def create_captcha_redis(captcha_id: str) -> Tuple[str, str]:
     """
-    Create captcha using Redis for storage (for distributed systems).
+    Bind a pre-rendered captcha to captcha_id, stored in Redis (for distributed systems).
     Falls back to in-memory if Redis is not available.
     """
     from app.redis import get_redis
     
+    text, image_data = await take_captcha()
+    
     redis = get_redis()
     if not redis:
-        return create_captcha(captcha_id)
-    
-    text = generate_captcha_text()
-    image_bytes = generate_captcha_image(text)
-    
-    # Store in Redis with 5 minute expiry
-    await redis.setex(f"captcha:{captcha_id}", 300, text.upper())
+        _remember_captcha(captcha_id, text)
+    else:
+        # Store in Redis with 5 minute expiry
+        await redis.setex(f"captcha:{captcha_id}", 300, text)
     
-    base64_image = base64.b64encode(image_bytes).decode('utf-8')
-    return captcha_id, f"data:image/png;base64,{base64_image}"
+    return captcha_id, image_data
 
 
 async def verify_captcha_redis(captcha_id: str, user_input: str) -> bool:
@@ -1,9 +1,11 @@
 """
 Date path utility for generating date-based folder paths.
-Used for organizing uploaded images into YYYY/MM/DD folder structure.
+Used for organizing uploaded images into YYYY/MM/DD folder structure,
+optionally fanned out by a hash prefix (see get_storage_dir).
 """
 from datetime import datetime
 from typing import Optional
+import hashlib
 import pytz
 import logging
 
@@ -12,6 +14,11 @@ logger = logging.getLogger(__name__)
 # Default timezone fallback
 DEFAULT_TIMEZONE = "Asia/Shanghai"
 
+# Storage layouts (STORAGE_LAYOUT in .env)
+LAYOUT_DATE = "date"            # 2025/12/14/abc123.png
+LAYOUT_HASH = "hash"            # 3f/a2/abc123.png
+LAYOUT_DATE_HASH = "date_hash"  # 2025/12/14/3f/abc123.png
+
 
 async def get_date_path(dt: Optional[datetime] = None) -> str:
     """
@@ -58,6 +65,36 @@ async def get_date_path(dt: Optional[datetime] = None) -> str:
         return datetime.now().strftime("%Y/%m/%d")
 
 
+def get_hash_prefix(filename: str, levels: int = 2) -> str:
+    """
+    Hash fan-out prefix for a filename, two hex chars per level (e.g. "3f/a2").
+    Spreads files evenly over 256^levels directories.
+    """
+    digest = hashlib.md5(filename.encode("utf-8")).hexdigest()
+    return "/".join(digest[i * 2:i * 2 + 2] for i in range(levels))
+
+
+async def get_storage_dir(filename: str, dt: Optional[datetime] = None) -> str:
+    """
+    Directory (relative to the storage root) for a new upload, per the STORAGE_LAYOUT setting.
+    The same relative path is used as the local path and the cloud object key, so the
+    layout applies to every backend. Existing file_path values are stored as-is and
+    stay readable whatever the layout is.
+    
+    Returns:
+        "YYYY/MM/DD" (date), "ab/cd" (hash) or "YYYY/MM/DD/ab" (date_hash)
+    """
+    from app.config import get_settings
+    layout = (get_settings().storage_layout or LAYOUT_DATE).lower()
+    
+    if layout == LAYOUT_HASH:
+        return get_hash_prefix(filename, levels=2)
+    date_path = await get_date_path(dt)
+    if layout == LAYOUT_DATE_HASH:
+        return f"{date_path}/{get_hash_prefix(filename, levels=1)}"
+    return date_path
+
+
 def get_date_path_sync(dt: Optional[datetime] = None, timezone_name: str = None) -> str:
     """
     Synchronous version of get_date_path for use in non-async contexts.
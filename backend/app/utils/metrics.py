@@ -0,0 +1,38 @@
+"""
+Helpers shared by the per-backend / per-provider pools (storage I/O executors,
+moderation limiters): latency percentiles for their stats and parsing of their
+"name=value,..." override settings.
+"""
+import logging
+from typing import Callable, Dict, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def percentile(sorted_samples: list, q: float) -> float:
+    """Nearest-rank percentile (q in 0..1) of already sorted samples, 0.0 when empty."""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, int(q * len(sorted_samples)))
+    return sorted_samples[index]
+
+
+def parse_overrides(value: str, convert: Callable[[str], T], label: str) -> Dict[str, T]:
+    """
+    Parse a "name=value,..." setting into {name: convert(value)}.
+
+    Names are lower-cased; items without "=" are skipped and items whose value
+    convert rejects (ValueError) are logged as "Invalid <label>" and skipped.
+    """
+    overrides = {}
+    for item in (value or "").split(","):
+        if "=" not in item:
+            continue
+        name, _, raw = item.partition("=")
+        try:
+            overrides[name.strip().lower()] = convert(raw.strip())
+        except ValueError:
+            logger.warning(f"Invalid {label}: {item}")
+    return overrides
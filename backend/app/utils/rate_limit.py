@@ -1,8 +1,12 @@
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from fastapi import Request
-from typing import Optional
-from app.redis import get_redis
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+import math
+import time
+from app.redis import get_redis, FakeRedis
 
 limiter = Limiter(key_func=get_remote_address)
 
@@ -29,7 +33,16 @@ def get_real_ip(request: Request) -> str:
     - X-Real-IP: Nginx real IP header
     - CF-Connecting-IP: Cloudflare connecting IP
     - True-Client-IP: Akamai/Cloudflare Enterprise
+
+    Resolved once per request (memoized on request.state).
     """
+    ip = getattr(request.state, "real_ip", None)
+    if ip is None:
+        ip = request.state.real_ip = _resolve_real_ip(request)
+    return ip
+
+
+def _resolve_real_ip(request: Request) -> str:
     if not _ip_header_cache["trust_proxy"]:
         # Don't trust proxy headers, use direct connection
         if request.client:
@@ -83,32 +96,152 @@ async def refresh_ip_header_settings():
     update_ip_header_cache(header, trust_proxy)
 
 
+# ---------- GCRA multi-window limiter ----------
+#
+# Each window is a GCRA (generic cell rate algorithm) bucket: `limit` requests may
+# burst, then one more every seconds/limit. Its only state is the theoretical
+# arrival time (TAT, epoch ms) stored under rate_limit:{key}:{window name}, with a
+# TTL that ends when the bucket is full again.
+#
+# All windows of a key are checked and updated together in one call (a Lua script
+# on Redis, its registered Python twin on FakeRedis): a request is counted only
+# when every window allows it.
+
+@dataclass(frozen=True, slots=True)
+class RateWindow:
+    name: str
+    limit: int
+    seconds: int
+
+
+@dataclass(frozen=True, slots=True)
+class RateLimitResult:
+    allowed: bool
+    # Name of the window that refused the request ("" when allowed)
+    window: str
+    # Requests left in the tightest window (after this one, when allowed)
+    remaining: int
+    # Seconds until the refusing window accepts a request (0 when allowed)
+    retry_after: int
+
+
+# KEYS: one per window. ARGV: now_ms, cost, peek ("1"/"0"), then limit and window_ms per key.
+# Returns {refusing window index (0 = allowed), remaining, retry_after_ms}.
+_GCRA_SCRIPT = """
+local now = tonumber(ARGV[1])
+local cost = tonumber(ARGV[2])
+local peek = ARGV[3] == "1"
+local new_tats = {}
+local remaining = -1
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[2 + i * 2])
+    local window = tonumber(ARGV[3 + i * 2])
+    if limit <= 0 then
+        return {i, 0, window}
+    end
+    local interval = window / limit
+    local tat = tonumber(redis.call("GET", key) or now)
+    if tat < now then
+        tat = now
+    end
+    local new_tat = tat + interval * cost
+    if new_tat - window > now then
+        return {i, 0, math.ceil(new_tat - window - now)}
+    end
+    local left = math.floor((window - (new_tat - now)) / interval)
+    if remaining < 0 or left < remaining then
+        remaining = left
+    end
+    new_tats[i] = new_tat
+end
+if not peek then
+    for i, key in ipairs(KEYS) do
+        redis.call("SET", key, tostring(new_tats[i]), "PX", math.max(1, math.ceil(new_tats[i] - now)))
+    end
+end
+return {0, remaining, 0}
+"""
+
+def _window_keys(key: str, windows: Sequence[RateWindow]) -> list:
+    return [f"rate_limit:{key}:{w.name}" for w in windows]
+
+
+async def _gcra_in_process(redis, keys: list, args: list) -> list:
+    """_GCRA_SCRIPT for FakeRedis (same arguments and reply)."""
+    now, cost, peek = float(args[0]), int(args[1]), str(args[2]) == "1"
+    new_tats = []
+    remaining = -1
+    for index, key in enumerate(keys, start=1):
+        limit, window = int(args[1 + index * 2]), float(args[2 + index * 2])
+        if limit <= 0:
+            return [index, 0, window]
+        interval = window / limit
+        stored = await redis.get(key)
+        tat = max(float(stored) if stored is not None else now, now)
+        new_tat = tat + interval * cost
+        if new_tat - window > now:
+            return [index, 0, math.ceil(new_tat - window - now)]
+        left = math.floor((window - (new_tat - now)) / interval)
+        if remaining < 0 or left < remaining:
+            remaining = left
+        new_tats.append(new_tat)
+    if not peek:
+        for key, new_tat in zip(keys, new_tats):
+            await redis.set(key, repr(new_tat), px=max(1, math.ceil(new_tat - now)))
+    return [0, remaining, 0]
+
+
+FakeRedis.register_lua(_GCRA_SCRIPT, _gcra_in_process)
+
+# Registered script per Redis client (EVALSHA with automatic reload on NOSCRIPT)
+_gcra_scripts = {}
+
+
+async def hit_rate_limit(
+    key: str,
+    windows: Sequence[RateWindow],
+    cost: int = 1,
+    peek: bool = False,
+) -> RateLimitResult:
+    """
+    Check (and unless peek, count) one request against every window of a key.
+    Windows are reported in the order given when several refuse.
+    """
+    redis = get_redis()
+    if not redis or not windows:
+        return RateLimitResult(True, "", min((w.limit for w in windows), default=0), 0)
+
+    script = _gcra_scripts.get(id(redis))
+    if script is None:
+        script = _gcra_scripts[id(redis)] = redis.register_script(_GCRA_SCRIPT)
+    args = [time.time() * 1000, cost, "1" if peek else "0"]
+    for window in windows:
+        args += [window.limit, window.seconds * 1000]
+    refused, remaining, retry_ms = (int(v) for v in await script(keys=_window_keys(key, windows), args=args))
+
+    if refused:
+        return RateLimitResult(False, windows[refused - 1].name, 0, max(1, math.ceil(retry_ms / 1000)))
+    return RateLimitResult(True, "", max(0, remaining), 0)
+
+
+async def reset_rate_limit(key: str, windows: Sequence[RateWindow]):
+    """Forget all recorded requests of a key."""
+    redis = get_redis()
+    if redis:
+        await redis.delete(*_window_keys(key, windows))
+
+
 async def check_rate_limit(
     key: str,
     limit: int,
     window_seconds: int,
 ) -> tuple[bool, int, int]:
     """
-    Check rate limit using Redis.
-    Returns: (is_allowed, current_count, remaining)
+    Single-window check.
+    Returns: (is_allowed, used, remaining)
     """
-    redis = get_redis()
-    if not redis:
-        return True, 0, limit
-
-    redis_key = f"rate_limit:{key}"
-    
-    # Use Redis pipeline for atomic operations
-    pipe = redis.pipeline()
-    pipe.incr(redis_key)
-    pipe.expire(redis_key, window_seconds)
-    results = await pipe.execute()
-    
-    current_count = results[0]
-    remaining = max(0, limit - current_count)
-    is_allowed = current_count <= limit
-
-    return is_allowed, current_count, remaining
+    result = await hit_rate_limit(key, [RateWindow("window", limit, window_seconds)])
+    return result.allowed, limit - result.remaining, result.remaining
 
 
 async def get_upload_rate_limit_key(request: Request, user_id: Optional[int] = None) -> str:
@@ -118,51 +251,43 @@ async def get_upload_rate_limit_key(request: Request, user_id: Optional[int] = N
     return f"upload:ip:{get_real_ip(request)}"
 
 
+# Failed logins: 5 per 15 minutes per IP, then one more every 3 minutes
+LOGIN_ATTEMPT_WINDOWS = (RateWindow("failed", 5, 900),)
+
+
 async def check_login_attempts(ip: str) -> tuple[bool, int]:
     """
     Check failed login attempts for an IP.
     Returns: (is_blocked, attempts_count)
     """
-    redis = get_redis()
-    if not redis:
-        return False, 0
-
-    key = f"login_attempts:{ip}"
-    attempts = await redis.get(key)
-    
-    if attempts is None:
-        return False, 0
-    
-    attempts = int(attempts)
-    # Block if more than 5 failed attempts in 15 minutes
-    return attempts >= 5, attempts
+    result = await hit_rate_limit(f"login_attempts:{ip}", LOGIN_ATTEMPT_WINDOWS, peek=True)
+    limit = LOGIN_ATTEMPT_WINDOWS[0].limit
+    if not result.allowed:
+        return True, limit
+    # remaining already accounts for the attempt being checked
+    return False, limit - result.remaining - 1
 
 
 async def record_failed_login(ip: str):
     """Record a failed login attempt."""
-    redis = get_redis()
-    if not redis:
-        return
-
-    key = f"login_attempts:{ip}"
-    pipe = redis.pipeline()
-    pipe.incr(key)
-    pipe.expire(key, 900)  # 15 minutes
-    await pipe.execute()
+    await hit_rate_limit(f"login_attempts:{ip}", LOGIN_ATTEMPT_WINDOWS)
 
 
 async def clear_login_attempts(ip: str):
     """Clear failed login attempts after successful login."""
-    redis = get_redis()
-    if not redis:
-        return
+    await reset_rate_limit(f"login_attempts:{ip}", LOGIN_ATTEMPT_WINDOWS)
+
 
-    key = f"login_attempts:{ip}"
-    await redis.delete(key)
+# Negative cache: IPs recently found not blacklisted (ip -> monotonic deadline).
+# Per process, so another worker's add_to_blacklist() takes effect here within the TTL.
+NOT_BLACKLISTED_TTL = 5
+NOT_BLACKLISTED_MAX_ENTRIES = 10000
+_not_blacklisted: "OrderedDict[str, float]" = OrderedDict()
 
 
 async def add_to_blacklist(ip: str, duration_seconds: int = 3600):
     """Add IP to temporary blacklist."""
+    _not_blacklisted.pop(ip, None)
     redis = get_redis()
     if not redis:
         return
@@ -173,9 +298,22 @@ async def add_to_blacklist(ip: str, duration_seconds: int = 3600):
 
 async def is_blacklisted(ip: str) -> bool:
     """Check if IP is blacklisted."""
+    now = time.monotonic()
+    deadline = _not_blacklisted.get(ip)
+    if deadline is not None and deadline > now:
+        return False
+
     redis = get_redis()
     if not redis:
         return False
 
     key = f"blacklist:{ip}"
-    return await redis.exists(key) > 0
+    if await redis.exists(key) > 0:
+        _not_blacklisted.pop(ip, None)
+        return True
+
+    _not_blacklisted[ip] = now + NOT_BLACKLISTED_TTL
+    _not_blacklisted.move_to_end(ip)
+    if len(_not_blacklisted) > NOT_BLACKLISTED_MAX_ENTRIES:
+        _not_blacklisted.popitem(last=False)
+    return False
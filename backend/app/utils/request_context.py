@@ -0,0 +1,39 @@
+"""
+Request-scoped memoization of client identity checks.
+
+The security middleware and the auth dependencies both need the client IP, its
+blacklist status and the bearer token payload. Each is resolved once per request
+and kept on request.state, which every Request object built for the same ASGI
+scope shares.
+"""
+from typing import Optional
+
+from fastapi import Request
+
+from app.services.user_cache import verify_token
+from app.utils.rate_limit import get_real_ip, is_blacklisted
+
+# Paths that never need the blacklist check: static assets, image/file serving, health
+BLACKLIST_EXEMPT_PREFIXES = ("/assets/", "/uploads/", "/img/", "/api/health", "/favicon")
+
+
+def is_blacklist_exempt(path: str) -> bool:
+    return path.startswith(BLACKLIST_EXEMPT_PREFIXES)
+
+
+async def check_ip_blacklisted(request: Request) -> bool:
+    """Whether the client IP is blacklisted (looked up once per request)."""
+    blacklisted = getattr(request.state, "ip_blacklisted", None)
+    if blacklisted is None:
+        blacklisted = request.state.ip_blacklisted = await is_blacklisted(get_real_ip(request))
+    return blacklisted
+
+
+def get_token_payload(request: Request, token: str) -> Optional[dict]:
+    """Decoded JWT payload of the request's bearer token (verified once per token)."""
+    cached = getattr(request.state, "token_payload", None)
+    if cached is not None and cached[0] == token:
+        return cached[1]
+    payload = verify_token(token)
+    request.state.token_payload = (token, payload)
+    return payload
@@ -1,9 +1,12 @@
+import asyncio
 import bcrypt
+from concurrent.futures import ThreadPoolExecutor
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
 import secrets
 import string
+import threading
 from app.config import get_settings
 
 settings = get_settings()
@@ -11,6 +14,10 @@ settings = get_settings()
 ALGORITHM = "HS256"
 
 
+class PasswordHashingBusy(Exception):
+    """The password hashing pool and its queue are full (answered with 429)."""
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     try:
         return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
@@ -20,7 +27,68 @@ def verify_password(plain_password: str, hashed_password: str) -> bool:
 
 
 def get_password_hash(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=settings.bcrypt_rounds)).decode('utf-8')
+
+
+def password_needs_rehash(hashed_password: str) -> bool:
+    """Whether a bcrypt hash was made with a different work factor than BCRYPT_ROUNDS."""
+    try:
+        # $2b$12$<salt+hash>
+        return int(hashed_password.split("$")[2]) != settings.bcrypt_rounds
+    except (AttributeError, IndexError, ValueError):
+        return False
+
+
+# bcrypt releases the GIL, so hashing threads run in parallel with the event loop
+_hash_executor: Optional[ThreadPoolExecutor] = None
+# Hashes running or waiting in the pool. Decremented when the pool finishes (or drops)
+# the job, not when the awaiting request goes away: bcrypt keeps running after a
+# client disconnects, and the bound must count that work
+_hash_pending = 0
+_hash_pending_lock = threading.Lock()
+
+
+def _hash_done(_future):
+    global _hash_pending
+    with _hash_pending_lock:
+        _hash_pending -= 1
+
+
+async def _run_hashing(func, *args):
+    global _hash_executor, _hash_pending
+    workers = max(1, settings.password_hash_workers)
+    with _hash_pending_lock:
+        if _hash_pending >= workers + settings.password_hash_max_queue:
+            raise PasswordHashingBusy()
+        _hash_pending += 1
+    try:
+        if _hash_executor is None:
+            _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="password_hash_")
+        future = _hash_executor.submit(func, *args)
+    except BaseException:
+        _hash_done(None)
+        raise
+    # Runs in the worker thread once the job finishes (or right away if it was
+    # cancelled before starting)
+    future.add_done_callback(_hash_done)
+    return await asyncio.wrap_future(future)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password() in the hashing pool. Raises PasswordHashingBusy when saturated."""
+    return await _run_hashing(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash() in the hashing pool. Raises PasswordHashingBusy when saturated."""
+    return await _run_hashing(get_password_hash, password)
+
+
+def shutdown_password_hashing():
+    global _hash_executor
+    if _hash_executor is not None:
+        _hash_executor.shutdown(wait=False)
+        _hash_executor = None
 
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -0,0 +1,81 @@
+"""
+FakeRedis 微基准 - 验证内存 Redis 替身在键数量增长时每条命令的耗时保持平稳
+
+Usage:
+    python bench_fake_redis.py
+    python bench_fake_redis.py --sizes 1000 10000 100000 --ops 50000
+
+For each key count the store is pre-filled (half the keys with a TTL), then a mix
+of the commands used on the request path (get, setex, incr + expire pipeline,
+rate-limit script, delete) is timed. Per-op latency should not grow with the key
+count. The last column repeats the run with a byte bound small enough to keep
+evicting, which must stay flat as well.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+# Run from the backend directory so the app package and .env are found
+current_dir = os.path.dirname(os.path.abspath(__file__))
+os.chdir(current_dir)
+sys.path.insert(0, current_dir)
+
+from app.redis import FakeRedis
+from app.utils import rate_limit
+
+
+async def fill(redis: FakeRedis, size: int):
+    for i in range(size):
+        if i % 2:
+            await redis.setex(f"key:{i}", 3600, "x" * 16)
+        else:
+            await redis.set(f"key:{i}", "x" * 16)
+
+
+async def run_mix(redis: FakeRedis, size: int, ops: int) -> float:
+    """Average microseconds per command over a request-path command mix."""
+    keys = [f"key:{random.randrange(size * 2)}" for _ in range(ops)]
+    script = redis.register_script(rate_limit._GCRA_SCRIPT)
+    start = time.perf_counter()
+    for n, key in enumerate(keys):
+        op = n % 5
+        if op == 0:
+            await redis.get(key)
+        elif op == 1:
+            await redis.setex(key, 300, "1")
+        elif op == 2:
+            pipe = redis.pipeline()
+            pipe.incr(key + ":n")
+            pipe.expire(key + ":n", 60)
+            await pipe.execute()
+        elif op == 3:
+            await script(keys=[key + ":rl"], args=[time.time() * 1000, 1, "0", 10, 60000])
+        else:
+            await redis.delete(key)
+    return (time.perf_counter() - start) / ops * 1e6
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="FakeRedis per-command latency at growing key counts")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 50000, 100000])
+    parser.add_argument("--ops", type=int, default=50000)
+    args = parser.parse_args()
+
+    print(f"{'keys':>10} {'us/op':>10} {'us/op (evicting)':>18}")
+    for size in args.sizes:
+        redis = FakeRedis(max_bytes=1 << 40)
+        await fill(redis, size)
+        unbounded = await run_mix(redis, size, args.ops)
+
+        # Bound below the filled size: every write evicts
+        bounded_redis = FakeRedis(max_bytes=size * 60)
+        await fill(bounded_redis, size)
+        bounded = await run_mix(bounded_redis, size, args.ops)
+        print(f"{size:>10} {unbounded:>10.2f} {bounded:>18.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
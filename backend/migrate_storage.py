@@ -0,0 +1,111 @@
+"""
+存储迁移命令行工具 - 在两个已配置的存储后端之间复制图片/文件并更新数据库记录
+
+Usage:
+    python migrate_storage.py --from local --to s3c --concurrency 8 --bandwidth 10240
+    python migrate_storage.py --resume 3
+    python migrate_storage.py --list
+
+Progress is checkpointed in storage_migration_jobs, so an interrupted run can be
+continued with --resume <job_id> (or from the admin panel).
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+# Run from the backend directory so the app package and .env are found
+current_dir = os.path.dirname(os.path.abspath(__file__))
+os.chdir(current_dir)
+sys.path.insert(0, current_dir)
+
+from sqlalchemy import select
+
+from app.database import AsyncSessionLocal, init_db
+from app.models import storage_migration as storage_migration_model  # noqa: F401 (register tables)
+from app.models.storage_migration import StorageMigrationJob
+from app.services.storage.migration import (
+    MigrationError, create_migration_job, resume_migration_job, run_migration_job, get_live_progress,
+)
+
+PROGRESS_INTERVAL = 5
+
+
+def _format_job(job: StorageMigrationJob) -> str:
+    status = job.status.value if hasattr(job.status, "value") else job.status
+    return (f"#{job.id} {job.source_type} -> {job.target_type} [{status}] "
+            f"{job.migrated_objects}/{job.total_objects} migrated, {job.failed_objects} failed, "
+            f"{job.bytes_transferred / 1024 / 1024:.1f} MB")
+
+
+async def _report_progress(job_id: int):
+    while True:
+        await asyncio.sleep(PROGRESS_INTERVAL)
+        async with AsyncSessionLocal() as db:
+            job = await db.get(StorageMigrationJob, job_id)
+            if not job:
+                return
+            live = get_live_progress(job)
+            rate = f", {live['bytes_per_second'] / 1024:.0f} KB/s, {live['objects_per_second']} obj/s" if live else ""
+            eta = f", ETA {live['eta_seconds']}s" if live.get("eta_seconds") is not None else ""
+            print(_format_job(job) + rate + eta, flush=True)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Migrate images/files between storage backends")
+    parser.add_argument("--from", dest="source", help="Source storage type (local, s3c, oss, cos)")
+    parser.add_argument("--to", dest="target", help="Target storage type (local, s3c, oss, cos)")
+    parser.add_argument("--concurrency", type=int, default=4, help="Concurrent transfers (default: 4)")
+    parser.add_argument("--bandwidth", type=int, default=None, help="Max bandwidth in KB/s (default: unlimited)")
+    parser.add_argument("--no-verify", action="store_true", help="Skip SHA256 read-back verification")
+    parser.add_argument("--images-only", action="store_true", help="Do not migrate files/videos")
+    parser.add_argument("--resume", type=int, metavar="JOB_ID", help="Resume a job from its checkpoint")
+    parser.add_argument("--list", action="store_true", help="List migration jobs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    await init_db()
+
+    async with AsyncSessionLocal() as db:
+        if args.list:
+            result = await db.execute(select(StorageMigrationJob).order_by(StorageMigrationJob.id.desc()).limit(20))
+            for job in result.scalars().all():
+                print(_format_job(job))
+            return
+
+        try:
+            if args.resume:
+                job = await resume_migration_job(db, args.resume, start=False)
+                task = asyncio.create_task(run_migration_job(job.id))
+            elif args.source and args.target:
+                job = await create_migration_job(
+                    db,
+                    source_type=args.source,
+                    target_type=args.target,
+                    concurrency=args.concurrency,
+                    max_bandwidth=args.bandwidth,
+                    verify_checksum=not args.no_verify,
+                    include_files=not args.images_only,
+                )
+                task = asyncio.create_task(run_migration_job(job.id))
+            else:
+                parser.error("either --from/--to, --resume or --list is required")
+        except MigrationError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            sys.exit(1)
+        job_id = job.id
+
+    print(f"Migration job #{job_id} started", flush=True)
+    reporter = asyncio.create_task(_report_progress(job_id))
+    try:
+        await task
+    finally:
+        reporter.cancel()
+
+    async with AsyncSessionLocal() as db:
+        print(_format_job(await db.get(StorageMigrationJob, job_id)), flush=True)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())